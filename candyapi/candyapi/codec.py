@@ -0,0 +1,52 @@
+"""
+Единый слой кодирования и декодирования json для всех представлений.
+Если установлен orjson, используется он, иначе стандартный модуль json
+"""
+import json
+from json import JSONDecodeError
+from typing import Any, Union
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.http import HttpResponse
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+def loads(data: Union[bytes, str]) -> Any:
+    """
+    Декодирует json напрямую из байтов, без промежуточной строки.
+    При невалидном json возбуждает JSONDecodeError
+    """
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+def dumps(data: Any) -> bytes:
+    """
+    Кодирует данные в json и возвращает байты
+    """
+    if orjson is not None:
+        return orjson.dumps(data, option=orjson.OPT_NON_STR_KEYS)
+    return json.dumps(data, cls=DjangoJSONEncoder).encode()
+
+
+class JsonResponse(HttpResponse):
+    """
+    Аналог django.http.JsonResponse, кодирующий данные через dumps
+    """
+
+    def __init__(self, data: dict, safe: bool = True, **kwargs):
+        if safe and not isinstance(data, dict):
+            raise TypeError(
+                "In order to allow non-dict objects to be serialized set the "
+                "safe parameter to False."
+            )
+        kwargs.setdefault("content_type", "application/json")
+        super(JsonResponse, self).__init__(content=dumps(data), **kwargs)
+
+
+__all__ = ["loads", "dumps", "JsonResponse", "JSONDecodeError"]
@@ -1,4 +1,8 @@
-from django.http import JsonResponse
+from .codec import JsonResponse
+
+# Описание ошибки для тела запроса, которое является корректным json,
+# но не объектом
+NOT_JSON_OBJECT_MESSAGE = "request body must be json object"
 
 
 class InvalidJsonResponse(JsonResponse):
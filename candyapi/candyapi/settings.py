@@ -43,6 +43,7 @@ INSTALLED_APPS = [
     "couriers.apps.CouriersConfig",
     "orders.apps.OrdersConfig",
     "utils.apps.UtilsConfig",
+    "jobs.apps.JobsConfig",
     "django_extensions"
 ]
 
@@ -93,6 +94,120 @@ DATABASES = {
 }
 
 
+# Количество объектов, добавляемых в БД одним пакетом при импорте
+# курьеров и заказов
+
+IMPORT_BATCH_SIZE = int(os.getenv("IMPORT_BATCH_SIZE", 1000))
+
+# Способ записи импортируемых данных: "orm" (bulk_create) или "copy"
+# (COPY FROM STDIN, только PostgreSQL, на других БД используется orm)
+
+IMPORT_BACKEND = os.getenv("IMPORT_BACKEND", "orm")
+
+# Максимальное количество записей в кешах регионов и интервалов
+# каждого процесса (кеши работают только при общем кеше django, 0 выключает)
+
+IDENTITY_CACHE_SIZE = int(os.getenv("IDENTITY_CACHE_SIZE", 10000))
+
+# Как часто (в секундах) кеши регионов и интервалов проверяют, не была ли
+# очищена БД другим процессом
+
+IDENTITY_CACHE_CHECK_INTERVAL = float(os.getenv("IDENTITY_CACHE_CHECK_INTERVAL", 1))
+
+# Количество фоновых потоков в каждом процессе (импорт, планирование)
+
+BACKGROUND_WORKERS = int(os.getenv("BACKGROUND_WORKERS", 2))
+
+# Параллельная валидация больших импортов в пуле процессов. Выключена,
+# если количество процессов меньше 2. Списки короче порога валидируются
+# в процессе запроса
+
+PARALLEL_VALIDATION_WORKERS = int(os.getenv("PARALLEL_VALIDATION_WORKERS", 0))
+PARALLEL_VALIDATION_THRESHOLD = int(
+    os.getenv("PARALLEL_VALIDATION_THRESHOLD", 5000)
+)
+
+
+# Cache
+# https://docs.djangoproject.com/en/3.1/topics/cache/
+# Кеш используется для данных, общих для всех воркеров gunicorn. Если
+# задан DJANGO_CACHE_DIR, кеш хранится в файлах и разделяется воркерами
+# на одном хосте, иначе используется кеш в памяти процесса. При
+# превышении DJANGO_CACHE_MAX_ENTRIES записей часть из них вытесняется
+
+CACHE_MAX_ENTRIES = int(os.getenv("DJANGO_CACHE_MAX_ENTRIES", 10000))
+
+if os.getenv("DJANGO_CACHE_DIR"):
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.filebased.FileBasedCache",
+            "LOCATION": os.getenv("DJANGO_CACHE_DIR"),
+            "OPTIONS": {"MAX_ENTRIES": CACHE_MAX_ENTRIES},
+        }
+    }
+else:
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+            "OPTIONS": {"MAX_ENTRIES": CACHE_MAX_ENTRIES},
+        }
+    }
+
+# Кеш общий для всех процессов приложения. Кеши, которые должны
+# сбрасываться из других процессов (кеши регионов и интервалов, кеши
+# результатов назначения), без общего кеша выключены
+
+SHARED_CACHE = bool(os.getenv("DJANGO_CACHE_DIR"))
+
+# Индекс свободных заказов в памяти воркеров для ускорения назначения
+
+ORDERS_ASSIGNMENT_INDEX = os.getenv("ORDERS_ASSIGNMENT_INDEX") == "True"
+
+# Дозагрузка активного развоза: после завершения заказа следующее назначение
+# добавляет в развоз заказы в пределах освободившейся грузоподъемности
+
+ORDERS_TOP_UP = os.getenv("ORDERS_TOP_UP") == "True"
+
+# Фоновый расчет следующего развоза курьера, в развозе которого осталось
+# не больше ORDERS_PLANNER_REMAINING невыполненных заказов. План хранится
+# в кеше ORDERS_PLAN_TIMEOUT секунд
+
+ORDERS_PLANNER = os.getenv("ORDERS_PLANNER") == "True"
+ORDERS_PLANNER_REMAINING = int(os.getenv("ORDERS_PLANNER_REMAINING", 1))
+ORDERS_PLAN_TIMEOUT = int(os.getenv("ORDERS_PLAN_TIMEOUT", 300))
+
+# Стратегия набора заказов в развоз: "greedy" (по умолчанию), "knapsack"
+# (точный набор, нужен numpy) или путь к классу стратегии. Для knapsack
+# задается максимальное время решения в миллисекундах, после которого
+# используется жадный набор
+
+ORDERS_PACKING_STRATEGY = os.getenv("ORDERS_PACKING_STRATEGY", "greedy")
+ORDERS_PACKING_TIME_BUDGET = int(os.getenv("ORDERS_PACKING_TIME_BUDGET", 50))
+
+# Групповая фиксация завершений заказов: завершения, пришедшие в течение
+# ORDERS_GROUP_COMMIT_WINDOW миллисекунд (но не больше
+# ORDERS_GROUP_COMMIT_MAX_SIZE), применяются одной транзакцией. 0 выключает.
+# Завершения собираются в пределах процесса, поэтому нужны многопоточные
+# воркеры gunicorn (gthread)
+
+ORDERS_GROUP_COMMIT_WINDOW = float(os.getenv("ORDERS_GROUP_COMMIT_WINDOW", 0))
+ORDERS_GROUP_COMMIT_MAX_SIZE = int(os.getenv("ORDERS_GROUP_COMMIT_MAX_SIZE", 100))
+
+# Время в секундах, в течение которого в кеше хранится, что курьеру нечего
+# назначить (запись также сбрасывается при появлении заказов в его регионах
+# и изменении курьера). 0 выключает кеш, без общего кеша (SHARED_CACHE)
+# кеш выключен
+
+ASSIGN_NEGATIVE_CACHE_TIMEOUT = int(os.getenv("ASSIGN_NEGATIVE_CACHE_TIMEOUT", 60))
+
+# Время в секундах, в течение которого в кеше хранится ответ на назначение
+# для курьера с активным развозом (сбрасывается при завершении заказов
+# и изменении курьера). 0 выключает кеш, без общего кеша
+# (SHARED_CACHE) кеш выключен
+
+ASSIGN_RESPONSE_CACHE_TIMEOUT = int(os.getenv("ASSIGN_RESPONSE_CACHE_TIMEOUT", 300))
+
+
 # Password validation
 # https://docs.djangoproject.com/en/3.1/ref/settings/#auth-password-validators
 
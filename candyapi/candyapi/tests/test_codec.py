@@ -0,0 +1,48 @@
+from datetime import datetime, timezone
+from unittest.mock import patch
+
+from django.test import SimpleTestCase
+
+from candyapi import codec
+
+
+class TestCodec(SimpleTestCase):
+
+    DATA = {"orders": [{"id": 1}, {"id": 2}], "assign_time": "2021-01-10T09:32:14.42Z"}
+
+    def testRoundTrip(self):
+        """
+        Tests data is decoded from bytes and encoded to bytes
+        """
+        encoded = codec.dumps(self.DATA)
+        self.assertIsInstance(encoded, bytes)
+        self.assertEqual(codec.loads(encoded), self.DATA)
+
+    @patch("candyapi.codec.orjson", None)
+    def testStdlibFallback(self):
+        """
+        Tests stdlib json is used when no fast backend is installed
+        """
+        self.assertEqual(codec.loads(codec.dumps(self.DATA)), self.DATA)
+        with self.assertRaises(codec.JSONDecodeError):
+            codec.loads(b"{not json")
+        self.assertEqual(
+            codec.loads(codec.dumps({"t": datetime(2021, 1, 1, tzinfo=timezone.utc)})),
+            {"t": "2021-01-01T00:00:00Z"}
+        )
+
+    def testInvalidJson(self):
+        with self.assertRaises(codec.JSONDecodeError):
+            codec.loads(b"{not json")
+
+    def testResponse(self):
+        response = codec.JsonResponse(self.DATA, status=201)
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response["Content-Type"], "application/json")
+        self.assertEqual(codec.loads(response.content), self.DATA)
+
+    def testNonDictResponse(self):
+        with self.assertRaises(TypeError):
+            codec.JsonResponse([1, 2])
+        response = codec.JsonResponse([1, 2], safe=False)
+        self.assertEqual(codec.loads(response.content), [1, 2])
@@ -18,5 +18,6 @@ from django.urls import path, include
 
 urlpatterns = [
     path("couriers", include("couriers.urls")),
-    path("orders", include("orders.urls"))
+    path("orders", include("orders.urls")),
+    path("jobs", include("jobs.urls"))
 ]
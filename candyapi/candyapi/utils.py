@@ -1,3 +1,4 @@
+from typing import Iterator, List, Sequence
 from datetime import datetime
 
 
@@ -18,3 +19,12 @@ def format_time(t: datetime) -> str:
     if t.tzname() != "UTC":
         raise WrongTimezoneError()
     return "{}{}".format(t.isoformat(timespec="microseconds")[:-10], "Z")
+
+
+def chunks(items: Sequence, size: int) -> Iterator[List]:
+    """
+    Разбивает последовательность на части длиной не более size.
+    Используется для пакетной вставки данных в БД
+    """
+    for start in range(0, len(items), size):
+        yield list(items[start:start + size])
@@ -0,0 +1,64 @@
+"""
+Пулы фоновых потоков и процессов для задач, которые не должны
+выполняться в потоке обработки запроса или нагружают одно ядро
+"""
+import multiprocessing
+from concurrent.futures import Future, ThreadPoolExecutor, ProcessPoolExecutor
+from threading import Lock
+from typing import Callable
+
+from django.conf import settings
+from django.db import connections
+
+_executor = None
+_executor_lock = Lock()
+_process_pool = None
+_process_pool_lock = Lock()
+
+
+def get_executor() -> ThreadPoolExecutor:
+    """
+    Возвращает пул потоков процесса, создавая его при первом обращении
+    (после fork воркера gunicorn)
+    """
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=settings.BACKGROUND_WORKERS,
+                thread_name_prefix="candyapi-worker"
+            )
+        return _executor
+
+
+def _run_closing_connections(func: Callable, *args, **kwargs):
+    """
+    Выполняет задачу и закрывает соединения с БД, открытые потоком
+    """
+    try:
+        return func(*args, **kwargs)
+    finally:
+        connections.close_all()
+
+
+def submit(func: Callable, *args, **kwargs) -> Future:
+    """
+    Ставит задачу в очередь пула фоновых потоков
+    """
+    return get_executor().submit(_run_closing_connections, func, *args, **kwargs)
+
+
+def get_process_pool() -> ProcessPoolExecutor:
+    """
+    Возвращает пул процессов для задач, нагружающих процессор. Процессы
+    создаются через fork, поэтому наследуют настройки django, но не
+    должны обращаться к БД
+    """
+    global _process_pool
+    with _process_pool_lock:
+        if _process_pool is None:
+            _process_pool = ProcessPoolExecutor(
+                max_workers=settings.PARALLEL_VALIDATION_WORKERS,
+                mp_context=multiprocessing.get_context("fork")
+            )
+        return _process_pool
@@ -14,3 +14,14 @@ from django.core.wsgi import get_wsgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'candyapi.settings')
 
 application = get_wsgi_application()
+
+# gunicorn импортирует приложение в каждом воркере после fork,
+# поэтому кеши регионов и интервалов прогреваются для каждого воркера,
+# а задачи импорта завершившихся воркеров отмечаются неуспешными
+from utils.cache import warm_up_identity_caches  # noqa: E402
+from orders.index import warm_up_assignment_index  # noqa: E402
+from jobs.logic import recover_import_jobs  # noqa: E402
+
+warm_up_identity_caches()
+warm_up_assignment_index()
+recover_import_jobs()
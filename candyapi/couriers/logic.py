@@ -1,12 +1,16 @@
 """
 Module contains bisnes logic for managing couriers in database
 """
-from typing import List
+from typing import Iterable, List
 
+from django.conf import settings
 from django.db import transaction
 
 from .models import Courier
-from .validators import CouriersListDataModel, CourierDataModel
+from .validators import (CouriersListDataModel,
+                         CourierDataModel,
+                         InvalidCouriersInDataError)
+from .utils import import_ndjson
 
 
 @transaction.atomic
@@ -16,10 +20,23 @@ def create_couriers_from_list(couriers: CouriersListDataModel) -> List[int]:
     чтобы гарантировать, что при ошибке ни один курьер из списка не будет
     добавлен в БД
     """
-    created_couriers = []
-    for courier in couriers.data:
-        courier_object = Courier.objects.create_courier(
-            data=CourierDataModel(**courier)
-        )
-        created_couriers.append(courier_object.courier_id)
-    return created_couriers
+    return Courier.objects.create_from_list(couriers.couriers)
+
+
+@transaction.atomic
+def import_couriers_stream(lines: Iterable[bytes]) -> List[int]:
+    """
+    Создает курьеров из потока NDJSON, валидируя и сохраняя их пакетами.
+    При ошибках в данных возбуждает InvalidCouriersInDataError, и
+    транзакция откатывается целиком, как и при обычном импорте
+    """
+    created, errors = import_ndjson(
+        lines=lines,
+        model=CourierDataModel,
+        id_field="courier_id",
+        save_batch=Courier.objects.create_from_list,
+        batch_size=settings.IMPORT_BATCH_SIZE
+    )
+    if errors:
+        raise InvalidCouriersInDataError(invalid_couriers=errors)
+    return created
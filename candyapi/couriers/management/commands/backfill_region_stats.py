@@ -0,0 +1,88 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Sum, Count
+
+from couriers.models import Courier
+from orders.models import Order, Delievery, CourierRegionStats
+
+
+class Command(BaseCommand):
+    """
+    Заполняет статистику выполненных заказов курьеров по регионам
+    (CourierRegionStats) по уже выполненным заказам. Курьеры
+    обрабатываются частями по возрастанию courier_id, каждая часть -
+    в своей транзакции, статистика части пересчитывается заново, поэтому
+    команду можно прервать и продолжить с параметром --after
+    """
+    help = "Backfills courier rating aggregates from completed orders"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--chunk-size",
+            type=int,
+            default=500,
+            help="couriers per transaction"
+        )
+        parser.add_argument(
+            "--after",
+            type=int,
+            default=None,
+            help="continue after this courier_id"
+        )
+
+    def handle(self, *args, **options):
+        last_courier_id = options["after"]
+        chunk_size = options["chunk_size"]
+        processed = 0
+        while True:
+            couriers = Courier.objects.order_by("courier_id")
+            if last_courier_id is not None:
+                couriers = couriers.filter(courier_id__gt=last_courier_id)
+            courier_ids = list(
+                couriers.values_list("courier_id", flat=True)[:chunk_size]
+            )
+            if not courier_ids:
+                break
+            rows = self.rebuild(courier_ids)
+            processed += len(courier_ids)
+            last_courier_id = courier_ids[-1]
+            self.stdout.write(
+                "{} couriers processed ({} region rows), last courier_id={}".format(
+                    processed, rows, last_courier_id
+                )
+            )
+        self.stdout.write(self.style.SUCCESS("Done"))
+
+    @staticmethod
+    @transaction.atomic
+    def rebuild(courier_ids) -> int:
+        """
+        Пересчитывает статистику курьеров по выполненным заказам. Активные
+        развозы курьеров блокируются, чтобы завершения заказов (которые
+        блокируют строку развоза) не выполнялись одновременно с пересчетом
+        """
+        list(Delievery.objects.select_for_update().filter(
+            courier_id__in=courier_ids,
+            completed=False
+        ).values_list("id", flat=True))
+        totals = Order.objects.filter(
+            delievery__courier_id__in=courier_ids,
+            delievered=True,
+            region__isnull=False
+        ).values(
+            "delievery__courier_id",
+            "region_id"
+        ).annotate(
+            completion_time_sum=Sum("completion_time"),
+            completed_count=Count("order_id")
+        ).order_by()
+        CourierRegionStats.objects.filter(courier_id__in=courier_ids).delete()
+        stats = CourierRegionStats.objects.bulk_create([
+            CourierRegionStats(
+                courier_id=total["delievery__courier_id"],
+                region_id=total["region_id"],
+                completion_time_sum=total["completion_time_sum"],
+                completed_count=total["completed_count"]
+            ) for total in totals
+        ])
+        return len(stats)
@@ -0,0 +1,88 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import Sum, Case, When, Value, IntegerField, F
+
+from couriers.models import Courier
+
+
+class Command(BaseCommand):
+    """
+    Сверяет заработок курьеров (поле earnings) с заработком, рассчитанным
+    по завершенным развозам, и выводит расхождения. Курьеры обрабатываются
+    частями по возрастанию courier_id, для каждой части заработок
+    рассчитывается одним запросом вместе с хранимым значением. С параметром
+    --fix записывает рассчитанный заработок
+    """
+    help = "Checks stored courier earnings against completed deliveries"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--chunk-size",
+            type=int,
+            default=1000,
+            help="couriers per query"
+        )
+        parser.add_argument(
+            "--fix",
+            action="store_true",
+            help="overwrite drifted earnings with recomputed values"
+        )
+
+    @staticmethod
+    def expected_earnings():
+        return Sum(
+            Case(
+                *[
+                    When(
+                        delieveries__completed=True,
+                        delieveries__transport_type=transport_type,
+                        then=Value(Courier.delievery_earnings(transport_type))
+                    ) for transport_type in Courier.EARNINGS_EFFICIENCY
+                ],
+                default=Value(0),
+                output_field=IntegerField()
+            )
+        )
+
+    def handle(self, *args, **options):
+        chunk_size = options["chunk_size"]
+        last_courier_id = None
+        checked = 0
+        drifted = []
+        while True:
+            couriers = Courier.objects.order_by("courier_id")
+            if last_courier_id is not None:
+                couriers = couriers.filter(courier_id__gt=last_courier_id)
+            rows = list(
+                couriers.annotate(
+                    expected=self.expected_earnings()
+                ).values_list("courier_id", "earnings", "expected")[:chunk_size]
+            )
+            if not rows:
+                break
+            for courier_id, earnings, expected in rows:
+                expected = expected or 0
+                if earnings != expected:
+                    drifted.append((courier_id, earnings, expected))
+                    self.stdout.write(
+                        "courier_id={}: stored {}, expected {}, drift {}".format(
+                            courier_id, earnings, expected, earnings - expected
+                        )
+                    )
+            checked += len(rows)
+            last_courier_id = rows[-1][0]
+        self.stdout.write("{} couriers checked, {} with drift".format(
+            checked, len(drifted)
+        ))
+        if not drifted:
+            return
+        if not options["fix"]:
+            raise CommandError("earnings drift found for {} couriers".format(len(drifted)))
+        for courier_id, earnings, expected in drifted:
+            # разница добавляется к текущему значению, чтобы не потерять
+            # развозы, завершенные после проверки
+            Courier.objects.filter(courier_id=courier_id).update(
+                earnings=F("earnings") + (expected - earnings)
+            )
+        self.stdout.write(self.style.SUCCESS(
+            "earnings fixed for {} couriers".format(len(drifted))
+        ))
@@ -1,8 +1,13 @@
+from typing import List
+
+from django.conf import settings
 from django.db import models, transaction
 from django.core.exceptions import ObjectDoesNotExist
 
 from .validators import CourierDataModel, CouriersListDataModel
 from utils.models import Region, Interval
+from utils.bulk_copy import bulk_insert
+from candyapi.utils import chunks
 
 
 class CourierManager(models.Manager):
@@ -16,14 +21,58 @@ class CourierManager(models.Manager):
             courier_id=data.courier_id,
             courier_type=data.courier_type,
         )
-        courier.save()
         courier.regions.set(
-            Region.objects.create_from_list(data.regions)
+            Region.objects.resolve_ids(data.regions).values()
         )
         courier.intervals.set(
-            Interval.objects.create_from_list(data.working_hours)
+            Interval.objects.resolve_strings(data.working_hours).values()
         )
         return courier
 
+    def create_from_list(self, couriers: List[CourierDataModel]) -> List[int]:
+        """
+        Пакетно создает курьеров из списка CourierDataModel и возвращает
+        список их id. На каждый пакет размером IMPORT_BATCH_SIZE выполняется
+        фиксированное количество запросов: разрешение регионов и интервалов,
+        одна вставка курьеров и по одной вставке в промежуточные таблицы
+        regions и intervals (через bulk_create или COPY, см.
+        utils.bulk_copy). Атомарность всего импорта обеспечивает вызывающий
+        код (transaction.atomic)
+        """
+        created_couriers = []
+        for batch in chunks(couriers, settings.IMPORT_BATCH_SIZE):
+            created_couriers.extend(self._create_batch(batch))
+        return created_couriers
 
-
+    def _create_batch(self, couriers: List[CourierDataModel]) -> List[int]:
+        """
+        Создает один пакет курьеров вместе со связями с регионами
+        и интервалами работы
+        """
+        region_ids = Region.objects.resolve_ids(
+            region for courier in couriers for region in courier.regions
+        )
+        interval_ids = Interval.objects.resolve_strings(
+            interval for courier in couriers for interval in courier.working_hours
+        )
+        bulk_insert([
+            self.model(
+                courier_id=courier.courier_id,
+                courier_type=courier.courier_type
+            ) for courier in couriers
+        ])
+        regions_through = self.model.regions.through
+        bulk_insert([
+            regions_through(
+                courier_id=courier.courier_id,
+                region_id=region_ids[region]
+            ) for courier in couriers for region in courier.regions
+        ])
+        intervals_through = self.model.intervals.through
+        bulk_insert([
+            intervals_through(
+                courier_id=courier.courier_id,
+                interval_id=interval_ids[interval]
+            ) for courier in couriers for interval in set(courier.working_hours)
+        ])
+        return [courier.courier_id for courier in couriers]
@@ -0,0 +1,55 @@
+# Generated by Django 3.1.7 on 2026-10-16 21:00
+
+from django.db import migrations, models
+from django.db.models import Count
+
+BASE_EARNINGS = 500
+EARNINGS_EFFICIENCY = {
+    "foot": 2,
+    "bike": 5,
+    "car": 9
+}
+
+
+def fill_earnings(apps, schema_editor):
+    """
+    Заполняет заработок курьеров по завершенным развозам
+    """
+    Courier = apps.get_model("couriers", "Courier")
+    Delievery = apps.get_model("orders", "Delievery")
+    totals = {}
+    for courier_id, transport_type, count in Delievery.objects.filter(
+            completed=True
+    ).values(
+        "courier_id", "transport_type"
+    ).annotate(
+        count=Count("id")
+    ).values_list("courier_id", "transport_type", "count").order_by():
+        totals[courier_id] = totals.get(courier_id, 0) + (
+            BASE_EARNINGS * EARNINGS_EFFICIENCY.get(transport_type, 0) * count
+        )
+    Courier.objects.bulk_update(
+        [
+            Courier(courier_id=courier_id, earnings=earnings)
+            for courier_id, earnings in totals.items()
+        ],
+        ["earnings"],
+        batch_size=1000
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('couriers', '0002_auto_20210324_0959'),
+        ('orders', '0004_courier_region_stats'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='courier',
+            name='earnings',
+            field=models.BigIntegerField(default=0),
+        ),
+        migrations.RunPython(fill_earnings, migrations.RunPython.noop),
+    ]
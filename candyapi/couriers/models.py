@@ -1,13 +1,14 @@
 from functools import reduce
 
-from django.db import models
-from django.core.exceptions import ObjectDoesNotExist
+from django.db import models, transaction
 from django.db.models.query import QuerySet
 
 from .managers import CourierManager
 from .validators import CourierPatchDataModel
 from orders.utils import construct_assign_query, fill_weight
-from orders.models import Order
+from orders.index import index_enabled, orders_released, load_free_orders
+from orders.assign_cache import regions_changed, couriers_changed
+from orders.planner import profile_changed
 from utils.models import Interval, Region
 
 
@@ -18,6 +19,9 @@ class Courier(models.Model):
         courier_id (int): идентификатор курьера
         courier_type (str): тип курьера, может быть foot, bike или car
         regions: регионы, в которых работает курьер (ссылка на таблицу с регионами)
+        earnings: заработок курьера за завершенные развозы. Увеличивается
+            при завершении развоза (см. complete_in_db) и не перезаписывается
+            при сохранении курьера
     """
     WEIGHT_MAP = {
         "foot": 10,
@@ -29,93 +33,109 @@ class Courier(models.Model):
         "bike": 5,
         "car": 9
     }
+    BASE_EARNINGS = 500
     courier_id = models.IntegerField(primary_key=True, unique=True)
     courier_type = models.CharField(max_length=4)
     regions = models.ManyToManyField(to="utils.Region", related_name="couriers")
     intervals = models.ManyToManyField(to="utils.Interval", related_name="couriers")
+    earnings = models.BigIntegerField(default=0)
 
     objects = CourierManager()
 
+    def save(self, *args, **kwargs):
+        """
+        Сохраняет курьера. Заработок изменяется только в БД при завершении
+        развоза, поэтому при обновлении существующего курьера он не
+        записывается, если не указан явно в update_fields
+        """
+        if (not self._state.adding
+                and not kwargs.get("force_insert")
+                and kwargs.get("update_fields") is None):
+            kwargs["update_fields"] = [
+                field.name for field in self._meta.concrete_fields
+                if not field.primary_key and field.name != "earnings"
+            ]
+        super().save(*args, **kwargs)
+
+    @classmethod
+    def delievery_earnings(cls, transport_type: str) -> int:
+        """
+        Возвращает заработок за завершенный развоз курьера с типом transport_type
+        """
+        return cls.BASE_EARNINGS * cls.EARNINGS_EFFICIENCY.get(transport_type)
+
+    @transaction.atomic
     def update(self, data: CourierPatchDataModel):
         """
         Обновляет данные курьера и проверяет, назначена ли курьеру активная доставка (развоз).
         Если активная доставка присутствует, проверяет, все ли заказы из доставки курьер
         может развести. Если нет, те заказы, которые курьер теперь развезти не может
-        попадают в пул свободных к выдаче
+        попадают в пул свободных к выдаче. Все изменения выполняются в одной
+        транзакции, поэтому кеши назначения и индекс заказов узнают о них
+        только после фиксации
         """
         if data.courier_type:
             self.courier_type = data.courier_type
             self.save()
         if data.working_hours:
-            intervals = Interval.objects.create_from_list(data.working_hours)
-            self.intervals.set(intervals)
+            intervals = Interval.objects.resolve_strings(data.working_hours)
+            self.intervals.set(intervals.values())
         if data.regions:
-            regions = Region.objects.create_from_list(data.regions)
-            self.regions.set(regions)
-        try:
-            active_delievery = self.delieveries.get(completed=False)
-            interval_condition = construct_assign_query(
-                list(self.intervals.all())
-            )
-            new_max_weight = self.WEIGHT_MAP.get(self.courier_type)
-            new_suitable_orders = active_delievery.orders.filter(
-                interval_condition,
-                region__couriers=self,
-                weight__lte=new_max_weight,
-            ).order_by("-weight")
-            orders_to_keep = fill_weight(new_suitable_orders, new_max_weight)
+            regions = Region.objects.resolve_ids(data.regions)
+            self.regions.set(regions.values())
+        active_delievery = self.delieveries.filter(completed=False).first()
+        if active_delievery:
+            intervals = list(self.intervals.all())
+            orders_to_keep = []
+            if intervals:
+                new_max_weight = self.WEIGHT_MAP.get(self.courier_type)
+                new_suitable_orders = active_delievery.orders.filter(
+                    construct_assign_query(intervals),
+                    region__couriers=self,
+                    weight__lte=new_max_weight,
+                ).order_by("-weight")
+                orders_to_keep = fill_weight(new_suitable_orders, new_max_weight)
+            released_orders = []
+            released_regions = set()
             for order in active_delievery.orders.filter(delievered=False):
                 if order not in orders_to_keep:
                     order.delievery = None
                     order.save()
+                    released_orders.append(order.order_id)
+                    released_regions.add(order.region_id)
+            if released_orders and index_enabled():
+                orders_released(load_free_orders(released_orders))
+            regions_changed(released_regions)
             active_delievery.refresh_from_db()
             if not active_delievery.orders.all().count():
                 active_delievery.delete()
-        except ObjectDoesNotExist:
-            pass
-        finally:
-            return self.to_dict()
+        # счетчики курьера увеличиваются после фиксации всех изменений,
+        # иначе назначение между увеличением и записью запомнило бы
+        # в кеше результат по старым данным под новым счетчиком
+        couriers_changed([self.courier_id])
+        profile_changed(self.courier_id)
+        return self.to_dict()
 
     def calculate_earnings(self) -> int:
         """
-        Рассчитывает заработок курьера
+        Возвращает заработок курьера (хранится в поле earnings)
         """
-        delieveres = self.delieveries.filter(completed=True)
-        return sum([
-            500 * self.EARNINGS_EFFICIENCY.get(delievery.transport_type)
-            for delievery in delieveres
-        ])
-
-    def _calc_mean_delievery_time(self, region_id: int) -> float:
-        """
-        Рассчитывает среднее время доставки курьера по региону с
-        переданным region_id
-        """
-        completed_orders = Order.objects.filter(
-            delievery__courier__courier_id=self.courier_id,
-            delievered=True,
-            region_id=region_id
-        )
-        mean = sum([
-            order.completion_time for order in completed_orders
-        ]) / completed_orders.count()
-        return mean
+        return self.earnings
 
     def calculate_rating(self) -> float:
         """
-        Рассчитывает рейтинг курьера. Если у курьера пока нет заверенных
-        заказов, возвращает -1
+        Рассчитывает рейтинг курьера по статистике выполненных заказов
+        в регионах (одна строка на регион). Если у курьера пока нет
+        завершенных заказов, возвращает -1
         """
-        # selects all region where courier has completed orders
-        regions_with_completed_orders = Region.objects.filter(
-            order__delievered=True,
-            order__delievery__courier_id=self.courier_id
-        )
-        if not regions_with_completed_orders.exists():
+        stats = self.region_stats.filter(
+            completed_count__gt=0
+        ).values_list("completion_time_sum", "completed_count")
+        if not stats:
             return -1
         min_mean_time = min(
-            [self._calc_mean_delievery_time(region.region_id) for
-             region in regions_with_completed_orders]
+            completion_time_sum / completed_count
+            for completion_time_sum, completed_count in stats
         )
         rating = (3600 - min(min_mean_time, 3600)) / 3600 * 5
         return round(rating, 2)
@@ -143,11 +163,11 @@ class Courier(models.Model):
         if rating >= 0:
             return {
                 **self.to_dict(),
-                "rating": self.calculate_rating(),
+                "rating": rating,
                 "earnings": self.calculate_earnings()
             }
         else:
             return {
                 **self.to_dict(),
-                "earnings": 0
+                "earnings": self.calculate_earnings()
             }
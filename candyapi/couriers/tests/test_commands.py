@@ -0,0 +1,175 @@
+from datetime import timedelta
+from importlib import import_module
+from io import StringIO
+
+from django.apps import apps
+from django.core.management import call_command, CommandError
+from django.test import TestCase
+
+from candyapi.utils import format_time
+from couriers.models import Courier
+from couriers.validators import CourierDataModel
+from orders.logic import assign, complete_order
+from orders.models import Order, CourierRegionStats
+
+
+def region_stats():
+    return set(CourierRegionStats.objects.values_list(
+        "courier_id", "region_id", "completion_time_sum", "completed_count"
+    ))
+
+
+class TestBackfillRegionStats(TestCase):
+    """
+    Tests courier rating aggregates are backfilled from completed orders
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        for courier_id in (1, 2):
+            Courier.objects.create_courier(CourierDataModel(**{
+                "courier_id": courier_id,
+                "courier_type": "foot",
+                "regions": [courier_id, courier_id + 10],
+                "working_hours": ["10:00-18:00"]
+            }))
+            Order.objects.create_from_list([
+                {
+                    "order_id": courier_id * 10 + number,
+                    "weight": 1,
+                    "region": courier_id if number % 2 else courier_id + 10,
+                    "delivery_hours": ["12:00-13:00"]
+                } for number in range(3)
+            ])
+            delievery = assign(courier_id)
+            for minutes, order in enumerate(delievery.orders.order_by("order_id"), start=1):
+                complete_order(
+                    courier_id=courier_id,
+                    order_id=order.order_id,
+                    complete_time=format_time(
+                        delievery.assigned_time + timedelta(minutes=minutes * 10)
+                    )
+                )
+
+    def testCompletionUpdatesStats(self):
+        """
+        Tests stats match completed orders and give the same rating
+        """
+        self.assertEqual(CourierRegionStats.objects.count(), 4)
+        for stats in CourierRegionStats.objects.all():
+            orders = Order.objects.filter(
+                delievery__courier_id=stats.courier_id,
+                region_id=stats.region_id,
+                delievered=True
+            )
+            self.assertEqual(stats.completed_count, orders.count())
+            self.assertEqual(
+                stats.completion_time_sum,
+                sum(order.completion_time for order in orders)
+            )
+        self.assertAlmostEqual(
+            Courier.objects.get(courier_id=1).calculate_rating(),
+            (3600 - 600) / 3600 * 5,
+            places=1
+        )
+
+    def testBackfill(self):
+        """
+        Tests backfill rebuilds stats chunk by chunk and can be resumed
+        """
+        expected = region_stats()
+        CourierRegionStats.objects.all().delete()
+        self.assertEqual(Courier.objects.get(courier_id=1).calculate_rating(), -1)
+        out = StringIO()
+        call_command("backfill_region_stats", "--chunk-size=1", "--after=1", stdout=out)
+        self.assertIn("last courier_id=2", out.getvalue())
+        self.assertEqual(
+            region_stats(),
+            {stats for stats in expected if stats[0] == 2}
+        )
+        call_command("backfill_region_stats", stdout=StringIO())
+        self.assertEqual(region_stats(), expected)
+
+    def testMigrationFillsStats(self):
+        """
+        Tests data migration rebuilds stats from completed orders
+        """
+        expected = region_stats()
+        CourierRegionStats.objects.filter(courier_id=1).delete()
+        CourierRegionStats.objects.filter(courier_id=2).update(completed_count=100)
+        migration = import_module("orders.migrations.0006_fill_courier_region_stats")
+        migration.fill_region_stats(apps, None)
+        self.assertEqual(region_stats(), expected)
+
+
+class TestCheckEarnings(TestCase):
+    """
+    Tests earnings total is kept on completion and checked against deliveries
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        Courier.objects.create_courier(CourierDataModel(**{
+            "courier_id": 1,
+            "courier_type": "bike",
+            "regions": [1],
+            "working_hours": ["10:00-18:00"]
+        }))
+        Order.objects.create_from_list([
+            {
+                "order_id": order_id,
+                "weight": 10,
+                "region": 1,
+                "delivery_hours": ["12:00-13:00"]
+            } for order_id in (1, 2)
+        ])
+        for order_id in (1, 2):
+            delievery = assign(1)
+            complete_order(
+                courier_id=1,
+                order_id=order_id,
+                complete_time=format_time(delievery.assigned_time + timedelta(minutes=10))
+            )
+
+    def testEarningsRead(self):
+        """
+        Tests earnings are stored and read without queries
+        """
+        courier = Courier.objects.get(courier_id=1)
+        with self.assertNumQueries(0):
+            self.assertEqual(courier.calculate_earnings(), 2 * 500 * 5)
+
+    def testEarningsWithoutRating(self):
+        """
+        Tests earnings are reported even when there are no rating stats
+        """
+        CourierRegionStats.objects.all().delete()
+        info = Courier.objects.get(courier_id=1).info()
+        self.assertNotIn("rating", info)
+        self.assertEqual(info["earnings"], 2 * 500 * 5)
+
+    def testSaveKeepsEarnings(self):
+        """
+        Tests saving a stale courier does not overwrite earnings
+        """
+        courier = Courier.objects.get(courier_id=1)
+        Courier.objects.filter(courier_id=1).update(earnings=100500)
+        courier.courier_type = "car"
+        courier.save()
+        courier.refresh_from_db()
+        self.assertEqual((courier.courier_type, courier.earnings), ("car", 100500))
+
+    def testCheckEarnings(self):
+        """
+        Tests drift is reported and fixed
+        """
+        out = StringIO()
+        call_command("check_earnings", stdout=out)
+        self.assertIn("1 couriers checked, 0 with drift", out.getvalue())
+        Courier.objects.filter(courier_id=1).update(earnings=100)
+        out = StringIO()
+        with self.assertRaises(CommandError):
+            call_command("check_earnings", "--chunk-size=1", stdout=out)
+        self.assertIn("courier_id=1: stored 100, expected 5000", out.getvalue())
+        call_command("check_earnings", "--fix", stdout=StringIO())
+        self.assertEqual(Courier.objects.get(courier_id=1).earnings, 5000)
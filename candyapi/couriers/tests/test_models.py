@@ -1,7 +1,8 @@
 from datetime import timedelta
 
-from django.test import TestCase
-from django.db import IntegrityError
+from django.test import TestCase, override_settings
+from django.db import IntegrityError, connection
+from django.test.utils import CaptureQueriesContext
 from django.utils import timezone
 
 from couriers.models import Courier
@@ -9,6 +10,8 @@ from couriers.validators import CourierDataModel, CourierPatchDataModel
 from orders.models import Order, Delievery
 from orders.validators import OrderDataModel, OrderListDataModel
 from orders.logic import assign, complete_order
+from couriers.logic import create_couriers_from_list
+from couriers.validators import CouriersListDataModel
 from utils.models import Region, Interval
 from candyapi.utils import format_time
 
@@ -316,3 +319,98 @@ class TestCourierStats(TestCase):
             courier.calculate_earnings(),
             500 * (2 + 9)
         )
+
+
+class TestCouriersImport(TestCase):
+    """
+    Tests bulk import of couriers
+    """
+
+    COURIERS_DATA = {
+        "data": [
+            {
+                "courier_id": 1,
+                "courier_type": "foot",
+                "regions": [1, 12, 22],
+                "working_hours": ["11:35-14:05", "09:00-11:00"]
+            },
+            {
+                "courier_id": 2,
+                "courier_type": "bike",
+                "regions": [22],
+                "working_hours": ["09:00-11:00"]
+            },
+            {
+                "courier_id": 3,
+                "courier_type": "car",
+                "regions": [12, 22, 23, 33],
+                "working_hours": []
+            },
+        ]
+    }
+
+    def testImportCouriers(self):
+        """
+        Tests couriers are created together with regions and intervals
+        """
+        created = create_couriers_from_list(
+            CouriersListDataModel(**self.COURIERS_DATA)
+        )
+        self.assertEqual(created, [1, 2, 3])
+        courier = Courier.objects.get(courier_id=1)
+        self.assertEqual(
+            {region.region_id for region in courier.regions.all()},
+            {1, 12, 22}
+        )
+        self.assertEqual(
+            {str(interval) for interval in courier.intervals.all()},
+            {"11:35-14:05", "09:00-11:00"}
+        )
+        self.assertEqual(Interval.objects.count(), 2)
+        self.assertEqual(Region.objects.count(), 5)
+
+    @staticmethod
+    def generate_couriers(count: int, first_id: int = 1) -> dict:
+        return {
+            "data": [
+                {
+                    "courier_id": courier_id,
+                    "courier_type": "bike",
+                    "regions": [courier_id % 7 + 1, courier_id % 7 + 100],
+                    "working_hours": ["09:00-{}:00".format(10 + courier_id % 5)]
+                } for courier_id in range(first_id, first_id + count)
+            ]
+        }
+
+    @override_settings(IMPORT_BATCH_SIZE=1000)
+    def testImportQueriesCount(self):
+        """
+        Tests number of queries does not depend on number of couriers
+        """
+        with CaptureQueriesContext(connection) as small_import:
+            create_couriers_from_list(
+                CouriersListDataModel(**self.generate_couriers(2))
+            )
+        Region.objects.all().delete()
+        Interval.objects.all().delete()
+        with CaptureQueriesContext(connection) as large_import:
+            create_couriers_from_list(
+                CouriersListDataModel(**self.generate_couriers(100, 100))
+            )
+        self.assertEqual(
+            len(small_import.captured_queries),
+            len(large_import.captured_queries)
+        )
+
+    def testImportExistingCourier(self):
+        """
+        Tests nothing is created if one of couriers already exists
+        """
+        create_couriers_from_list(
+            CouriersListDataModel(**{"data": self.COURIERS_DATA["data"][:1]})
+        )
+        with self.assertRaises(IntegrityError):
+            create_couriers_from_list(
+                CouriersListDataModel(**self.COURIERS_DATA)
+            )
+        self.assertEqual(Courier.objects.count(), 1)
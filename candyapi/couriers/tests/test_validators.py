@@ -1,12 +1,13 @@
 from copy import deepcopy
 
-from django.test import SimpleTestCase
+from django.test import SimpleTestCase, override_settings
 from pydantic import ValidationError
 from couriers.validators import (CourierDataModel,
                                  CouriersListDataModel,
                                  InvalidCouriersInDataError,
                                  InvalidCourierData,
                                  CourierPatchDataModel)
+from couriers.utils import validate_items
 
 
 class TestCourierDataModel(SimpleTestCase):
@@ -132,6 +133,15 @@ class CouriersListDataModelTest(SimpleTestCase):
         except ValidationError:
             self.fail("exception in couriers list data model creation")
 
+    def testParsedCouriers(self):
+        """
+        Tests validated courier models are kept in list model
+        """
+        couriers = CouriersListDataModel(**self.TEST_DATA).couriers
+        self.assertEqual(len(couriers), 3)
+        self.assertIsInstance(couriers[0], CourierDataModel)
+        self.assertEqual(couriers[1].courier_id, 2)
+
     def testExcessField(self):
         """
         Tests no extra fields allowed
@@ -183,3 +193,42 @@ class CourierPatchDataModelTest(SimpleTestCase):
         }
         patch_data = CourierPatchDataModel(**data)
         self.assertEqual(patch_data.regions, None)
+
+
+class ParallelValidationTest(SimpleTestCase):
+
+    @staticmethod
+    def generate_couriers(count: int) -> list:
+        couriers = [
+            {
+                "courier_id": courier_id,
+                "courier_type": "foot",
+                "regions": [1, 2],
+                "working_hours": ["09:00-18:00"]
+            } for courier_id in range(1, count + 1)
+        ]
+        couriers[3]["courier_type"] = "teleport"
+        couriers[17]["regions"] = [1, 1]
+        del couriers[25]["courier_id"]
+        return couriers
+
+    @override_settings(PARALLEL_VALIDATION_WORKERS=3,
+                       PARALLEL_VALIDATION_THRESHOLD=10)
+    def testSameAsSerial(self):
+        """
+        Tests parallel validation returns models and errors in original order
+        """
+        couriers = self.generate_couriers(40)
+        parsed, errors = validate_items(CourierDataModel, couriers, "courier_id")
+        with override_settings(PARALLEL_VALIDATION_WORKERS=0):
+            serial_parsed, serial_errors = validate_items(
+                CourierDataModel,
+                couriers,
+                "courier_id"
+            )
+        self.assertEqual(parsed, serial_parsed)
+        self.assertEqual(errors, serial_errors)
+        self.assertEqual(
+            [error["id"] for error in errors],
+            [4, 18, "no id provided"]
+        )
@@ -1,10 +1,11 @@
 import json
 
 from unittest.mock import patch, MagicMock
-from django.test import SimpleTestCase
+from django.test import SimpleTestCase, TestCase
 from django.test import Client
 
 from couriers.validators import InvalidCouriersInDataError
+from couriers.models import Courier
 
 
 # noinspection DuplicatedCode
@@ -66,3 +67,60 @@ class TestPostCouriers(SimpleTestCase):
         response = self.post_couriers()
         self.assertEqual(response.status_code, 400)
 
+
+class TestImportCouriers(TestCase):
+
+    COURIERS = [
+        {
+            "courier_id": 1,
+            "courier_type": "foot",
+            "regions": [1, 12, 22],
+            "working_hours": ["11:35-14:05", "09:00-11:00"]
+        },
+        {
+            "courier_id": 2,
+            "courier_type": "bike",
+            "regions": [22],
+            "working_hours": ["09:00-18:00"]
+        },
+    ]
+
+    @staticmethod
+    def post_ndjson(lines):
+        c = Client()
+        return c.post(
+            path="/couriers/import",
+            content_type="application/x-ndjson",
+            data="\n".join(lines)
+        )
+
+    def testImport(self):
+        """
+        Tests couriers are created from NDJSON stream
+        """
+        response = self.post_ndjson(
+            [json.dumps(courier) for courier in self.COURIERS]
+        )
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(
+            response.json()["couriers"],
+            [{"id": 1}, {"id": 2}]
+        )
+        self.assertEqual(Courier.objects.count(), 2)
+
+    def testImportInvalidLines(self):
+        """
+        Tests errors are reported per line and nothing is created
+        """
+        invalid_courier = {**self.COURIERS[1], "courier_type": "teleport"}
+        response = self.post_ndjson([
+            json.dumps(self.COURIERS[0]),
+            json.dumps(invalid_courier),
+            "{not json",
+        ])
+        self.assertEqual(response.status_code, 400)
+        errors = response.json()["validation_errors"]["couriers"]
+        self.assertEqual(errors[0]["id"], 2)
+        self.assertIn("courier_type", errors[0])
+        self.assertEqual(errors[1]["line"], 3)
+        self.assertEqual(Courier.objects.count(), 0)
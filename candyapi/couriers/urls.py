@@ -3,6 +3,7 @@ from django.urls import path, include
 from . import views
 
 courier_pattern = [
+    path('import', views.CouriersImportView.as_view()),
     path('<int:courier_id>', views.CourierView.as_view()),
 ]
 
@@ -1,6 +1,10 @@
-from typing import Dict
+from typing import Callable, Dict, Iterable, List, Tuple, Type
 
-from pydantic import ValidationError
+from pydantic import BaseModel, ValidationError
+
+from django.conf import settings
+
+from candyapi import codec
 
 
 def parse_errors(error: ValidationError) -> Dict:
@@ -24,3 +28,131 @@ def parse_errors(error: ValidationError) -> Dict:
     return errors
 
 
+def _validate_serial(
+        model: Type[BaseModel],
+        items: List[Dict],
+        id_field: str
+) -> Tuple[List[BaseModel], List[Dict]]:
+    """
+    Валидирует элементы списка в текущем процессе
+    """
+    parsed = []
+    errors = []
+    for item in items:
+        try:
+            parsed.append(model(**item))
+        except ValidationError as e:
+            errors.append(
+                {
+                    "id": item.get(id_field, "no id provided"),
+                    **parse_errors(e)
+                }
+            )
+    return parsed, errors
+
+
+def _validate_parallel(
+        model: Type[BaseModel],
+        items: List[Dict],
+        id_field: str
+) -> Tuple[List[BaseModel], List[Dict]]:
+    """
+    Разбивает список на части по числу процессов в пуле и валидирует
+    их параллельно. Результаты объединяются в исходном порядке
+    """
+    from candyapi.workers import get_process_pool
+
+    workers = settings.PARALLEL_VALIDATION_WORKERS
+    shard_size = -(-len(items) // workers)
+    shards = [
+        items[start:start + shard_size]
+        for start in range(0, len(items), shard_size)
+    ]
+    parsed = []
+    errors = []
+    results = get_process_pool().map(
+        _validate_serial,
+        [model] * len(shards),
+        shards,
+        [id_field] * len(shards)
+    )
+    for shard_parsed, shard_errors in results:
+        parsed.extend(shard_parsed)
+        errors.extend(shard_errors)
+    return parsed, errors
+
+
+def parallel_validation_enabled(count: int) -> bool:
+    """
+    Проверяет, будет ли список из count элементов валидироваться
+    в пуле процессов
+    """
+    return (settings.PARALLEL_VALIDATION_WORKERS > 1
+            and count >= settings.PARALLEL_VALIDATION_THRESHOLD)
+
+
+def validate_items(
+        model: Type[BaseModel],
+        items: List[Dict],
+        id_field: str
+) -> Tuple[List[BaseModel], List[Dict]]:
+    """
+    Валидирует каждый элемент списка моделью model один раз. Возвращает
+    список провалидированных моделей и список ошибок в формате
+    {"id": ..., "field": "error_msg"} для невалидных элементов.
+    Если включена параллельная валидация и список достаточно длинный,
+    валидация выполняется в пуле процессов
+    """
+    if parallel_validation_enabled(len(items)):
+        return _validate_parallel(model, items, id_field)
+    return _validate_serial(model, items, id_field)
+
+
+def import_ndjson(
+        lines: Iterable[bytes],
+        model: Type[BaseModel],
+        id_field: str,
+        save_batch: Callable[[List[BaseModel]], List[int]],
+        batch_size: int
+) -> Tuple[List[int], List[Dict]]:
+    """
+    Построчно разбирает и валидирует поток в формате NDJSON (один объект
+    json на строку) и передает провалидированные модели в save_batch
+    пакетами размером batch_size, поэтому в памяти одновременно находится
+    не больше одного пакета. После первой ошибки сохранение прекращается,
+    но валидация продолжается, чтобы вернуть все ошибки.
+    Возвращает список id сохраненных объектов и список ошибок в формате
+    validate_items
+    """
+    created = []
+    errors = []
+    batch = []
+    for line_number, line in enumerate(lines, start=1):
+        if not line.strip():
+            continue
+        try:
+            item = codec.loads(line)
+        except ValueError:
+            errors.append({
+                "line": line_number,
+                "json_error": "line is not valid json"
+            })
+            continue
+        if not isinstance(item, dict):
+            errors.append({
+                "line": line_number,
+                "json_error": "line must contain json object"
+            })
+            continue
+        parsed, item_errors = validate_items(model, [item], id_field)
+        errors.extend(item_errors)
+        if errors:
+            batch = []
+            continue
+        batch.extend(parsed)
+        if len(batch) >= batch_size:
+            created.extend(save_batch(batch))
+            batch = []
+    if batch and not errors:
+        created.extend(save_batch(batch))
+    return created, errors
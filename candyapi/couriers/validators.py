@@ -2,13 +2,13 @@ from typing import List, Dict, Optional, Any
 import re
 
 from pydantic import (BaseModel,
+                      PrivateAttr,
                       validator,
                       root_validator,
-                      ValidationError,
                       PydanticValueError,
                       PydanticTypeError)
 
-from .utils import parse_errors
+from .utils import validate_items
 
 
 class InvalidCouriersInDataError(PydanticValueError):
@@ -226,27 +226,31 @@ class CouriersListDataModel(BaseModel):
     в которое передает список этих ошибок
     """
     data: List[Dict]
+    _couriers: List[CourierDataModel] = PrivateAttr(default_factory=list)
 
     def __init__(self, **kwargs):
         """
         Валидирует всех курьеров. При ошибках вызывает
         InvalidCouriersInDataError в который передает список словарей
-        описывающих ошибки в данных курьеров
+        описывающих ошибки в данных курьеров. Провалидированные модели
+        курьеров сохраняются, чтобы не валидировать данные повторно
         """
         super(CouriersListDataModel, self).__init__(**kwargs)
-        errors = []
-        for courier in self.data:
-            try:
-                CourierDataModel(**courier)
-            except ValidationError as e:
-                errors.append(
-                    {
-                        "id": courier.get("courier_id", "no id provided"),
-                        **parse_errors(e)
-                    }
-                )
+        couriers, errors = validate_items(
+            CourierDataModel,
+            self.data,
+            "courier_id"
+        )
         if errors:
             raise InvalidCouriersInDataError(invalid_couriers=errors)
+        self._couriers = couriers
+
+    @property
+    def couriers(self) -> List[CourierDataModel]:
+        """
+        Провалидированные данные курьеров
+        """
+        return self._couriers
 
     @root_validator(pre=True)
     def validate_no_excess_fields(cls, values: Dict) -> Dict:
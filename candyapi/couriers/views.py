@@ -1,6 +1,3 @@
-import json
-from json import JSONDecodeError
-
 from pydantic import ValidationError
 
 from django.db.utils import IntegrityError
@@ -9,16 +6,16 @@ from django.views import View
 from django.views.decorators.csrf import csrf_exempt
 from django.utils.decorators import method_decorator
 from django.http.request import HttpRequest
-from django.http.response import (HttpResponse,
-                                  HttpResponseBadRequest,
-                                  JsonResponse)
+from django.http.response import HttpResponse, HttpResponseBadRequest
 
 from .validators import (CouriersListDataModel,
                          CourierDataModel,
                          InvalidCouriersInDataError,
                          CourierPatchDataModel)
-from .logic import create_couriers_from_list
+from .logic import create_couriers_from_list, import_couriers_stream
 from .models import Courier
+from candyapi import codec
+from candyapi.codec import JsonResponse, JSONDecodeError
 from candyapi.responses import (InvalidJsonResponse,
                                 ValidationErrorsResponse,
                                 DatabaseErrorResponse)
@@ -42,7 +39,7 @@ class CouriersView(View):
         Обрабатывает запрос на добавление курьеров
         """
         try:
-            data = json.loads(request.body.decode())
+            data = codec.loads(request.body)
             couriers = CouriersListDataModel(**data)
             added_couriers = create_couriers_from_list(couriers)
             return JsonResponse(
@@ -73,6 +70,39 @@ class CouriersView(View):
             return DatabaseErrorResponse("atempt to add existing courier")
 
 
+class CouriersImportView(View):
+    """
+    Обрабатывает запросы к /couriers/import. Курьеры передаются в формате
+    NDJSON (по одному объекту json на строку) и обрабатываются потоково,
+    без загрузки всего тела запроса в память
+    """
+
+    @method_decorator(csrf_exempt)
+    def dispatch(self, request, *args, **kwargs):
+        return super(CouriersImportView, self).dispatch(request, *args, **kwargs)
+
+    def post(self, request: HttpRequest) -> HttpResponse:
+        """
+        Обрабатывает запрос на потоковое добавление курьеров
+        """
+        try:
+            added_couriers = import_couriers_stream(request)
+            return JsonResponse(
+                status=201,
+                data={"couriers": [
+                    {
+                        "id": courier_id
+                    } for courier_id in added_couriers
+                ]}
+            )
+        except InvalidCouriersInDataError as e:
+            return ValidationErrorsResponse(errors={
+                "couriers": e.invalid_couriers
+            })
+        except IntegrityError:
+            return DatabaseErrorResponse("atempt to add existing courier")
+
+
 class CourierView(View):
     """
     Обрабатывает запросы к /couriers/{courier_id}
@@ -106,7 +136,7 @@ class CourierView(View):
         """
         try:
             courier = Courier.objects.get(courier_id=courier_id)
-            data = CourierPatchDataModel(**json.loads(request.body.decode()))
+            data = CourierPatchDataModel(**codec.loads(request.body))
             data = courier.update(data)
             return JsonResponse(data)
         except ValidationError as e:
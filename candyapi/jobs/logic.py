@@ -0,0 +1,203 @@
+"""
+Фоновый импорт курьеров и заказов. Задача создается в потоке запроса,
+а валидация и запись в БД выполняются в пуле фоновых потоков.
+
+Данные задачи хранятся только в памяти процесса, создавшего ее, поэтому
+после перезапуска процесса задача не может быть выполнена. При старте
+воркера такие задачи отмечаются неуспешными (см. fail_abandoned_jobs),
+чтобы клиент мог отправить импорт заново
+"""
+import logging
+import os
+import socket
+from typing import Dict, List, NamedTuple, Callable, Type
+
+from pydantic import BaseModel
+
+from django.conf import settings
+from django.db import transaction, IntegrityError, DatabaseError
+
+from .models import ImportJob
+from .validators import ImportJobDataModel
+from candyapi.utils import chunks
+from candyapi.workers import submit
+from couriers.models import Courier
+from couriers.validators import CourierDataModel
+from couriers.utils import validate_items, parallel_validation_enabled
+from orders.models import Order
+from orders.validators import OrderDataModel
+
+logger = logging.getLogger(__name__)
+
+INTERNAL_ERROR_MESSAGE = "import failed because of internal error"
+INTERRUPTED_MESSAGE = "import was interrupted by server restart, submit it again"
+
+
+class ImportKind(NamedTuple):
+    """
+    Описывает, как валидировать и сохранять объекты одного типа
+    """
+    model: Type[BaseModel]
+    id_field: str
+    save: Callable[[List[BaseModel]], List[int]]
+    database_error: str
+
+
+IMPORT_KINDS = {
+    "couriers": ImportKind(
+        model=CourierDataModel,
+        id_field="courier_id",
+        save=lambda couriers: Courier.objects.create_from_list(couriers),
+        database_error="atempt to add existing courier"
+    ),
+    "orders": ImportKind(
+        model=OrderDataModel,
+        id_field="order_id",
+        save=lambda orders: [
+            order.order_id for order in Order.objects.create_from_list(orders)
+        ],
+        database_error="attempt to add existing order"
+    ),
+}
+
+
+def submit_import(kind: str, data: ImportJobDataModel) -> ImportJob:
+    """
+    Создает задачу импорта и ставит ее в очередь фоновых потоков
+    после фиксации транзакции
+    """
+    job = ImportJob.objects.create_job(
+        kind=kind,
+        total=len(data.data),
+        worker=current_worker()
+    )
+    transaction.on_commit(lambda: submit(run_import, job.id, kind, data.data))
+    return job
+
+
+def run_import(job_id: int, kind: str, items: List[Dict]) -> None:
+    """
+    Выполняет задачу импорта: валидирует объекты, обновляя прогресс
+    задачи, и, если ошибок нет, сохраняет все объекты в одной транзакции.
+    Результат и ошибки записываются в задачу. При любой непредвиденной
+    ошибке задача отмечается неуспешной, чтобы она не осталась
+    незавершенной
+    """
+    try:
+        _run_import(job_id, kind, items)
+    except Exception:
+        logger.exception("import job %s failed", job_id)
+        ImportJob.objects.set_state(
+            job_id,
+            status=ImportJob.FAILED,
+            errors={"internal_error": INTERNAL_ERROR_MESSAGE}
+        )
+
+
+def _run_import(job_id: int, kind: str, items: List[Dict]) -> None:
+    import_kind = IMPORT_KINDS[kind]
+    ImportJob.objects.set_state(job_id, status=ImportJob.VALIDATING)
+    # прогресс обновляется после каждого пакета, но импорт, который
+    # валидируется в пуле процессов, передается в validate_items целиком
+    if parallel_validation_enabled(len(items)):
+        batch_size = len(items)
+    else:
+        batch_size = settings.IMPORT_BATCH_SIZE
+    parsed = []
+    errors = []
+    validated = 0
+    for batch in chunks(items, batch_size):
+        batch_parsed, batch_errors = validate_items(
+            import_kind.model,
+            batch,
+            import_kind.id_field
+        )
+        parsed.extend(batch_parsed)
+        errors.extend(batch_errors)
+        validated += len(batch)
+        ImportJob.objects.set_state(job_id, validated=validated)
+    if errors:
+        ImportJob.objects.set_state(
+            job_id,
+            status=ImportJob.FAILED,
+            errors={kind: errors}
+        )
+        return
+    ImportJob.objects.set_state(job_id, status=ImportJob.SAVING)
+    try:
+        with transaction.atomic():
+            created_ids = import_kind.save(parsed)
+    except IntegrityError:
+        ImportJob.objects.set_state(
+            job_id,
+            status=ImportJob.FAILED,
+            errors={"database_error": import_kind.database_error}
+        )
+        return
+    ImportJob.objects.set_state(
+        job_id,
+        status=ImportJob.DONE,
+        created_ids=created_ids
+    )
+
+
+def current_worker() -> str:
+    """
+    Возвращает идентификатор текущего процесса (hostname:pid)
+    """
+    return "{}:{}".format(socket.gethostname(), os.getpid())
+
+
+def _process_alive(pid: int) -> bool:
+    """
+    Проверяет, существует ли процесс с переданным pid
+    """
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def fail_abandoned_jobs() -> int:
+    """
+    Отмечает неуспешными незавершенные задачи, данные которых потеряны:
+    задачи процессов этого хоста, которые уже завершились (или pid которых
+    теперь принадлежит текущему процессу, то есть запустившемуся только
+    что), и задачи, созданные до появления поля worker. Задачи других
+    хостов не изменяются. Вызывается при старте воркера до приема
+    запросов. Возвращает количество отмеченных задач
+    """
+    hostname = socket.gethostname()
+    pid = os.getpid()
+    abandoned = []
+    for job_id, worker in ImportJob.objects.filter(
+            status__in=ImportJob.UNFINISHED
+    ).values_list("id", "worker"):
+        if not worker:
+            abandoned.append(job_id)
+            continue
+        job_hostname, _, job_pid = worker.rpartition(":")
+        if job_hostname != hostname:
+            continue
+        if int(job_pid) == pid or not _process_alive(int(job_pid)):
+            abandoned.append(job_id)
+    if not abandoned:
+        return 0
+    return ImportJob.objects.fail_jobs(
+        abandoned,
+        errors={"internal_error": INTERRUPTED_MESSAGE}
+    )
+
+
+def recover_import_jobs() -> None:
+    """
+    Отмечает задачи, потерянные при перезапуске, при старте воркера.
+    Если БД недоступна или не мигрирована, ничего не делает
+    """
+    try:
+        fail_abandoned_jobs()
+    except DatabaseError:
+        logger.warning("failed to check abandoned import jobs")
@@ -0,0 +1,33 @@
+from typing import Dict, List
+
+from django.db import models
+from django.utils import timezone
+
+
+class ImportJobManager(models.Manager):
+
+    def create_job(self, kind: str, total: int, worker: str = ""):
+        """
+        Создает новую задачу импорта в очереди
+        """
+        return self.create(kind=kind, total=total, worker=worker)
+
+    def set_state(self, job_id: int, **fields) -> None:
+        """
+        Обновляет поля задачи одним запросом без чтения ее из БД
+        """
+        self.filter(id=job_id).update(updated_at=timezone.now(), **fields)
+
+    def fail_jobs(self, job_ids: List[int], errors: Dict) -> int:
+        """
+        Отмечает незавершенные задачи из списка неуспешными одним запросом.
+        Возвращает количество измененных задач
+        """
+        return self.filter(
+            id__in=job_ids,
+            status__in=self.model.UNFINISHED
+        ).update(
+            updated_at=timezone.now(),
+            status=self.model.FAILED,
+            errors=errors
+        )
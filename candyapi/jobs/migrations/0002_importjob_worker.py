@@ -0,0 +1,18 @@
+# Generated by Django 3.1.7 on 2026-10-16 22:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('jobs', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='importjob',
+            name='worker',
+            field=models.CharField(default='', max_length=128),
+        ),
+    ]
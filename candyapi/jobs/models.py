@@ -0,0 +1,58 @@
+from django.db import models
+
+from .managers import ImportJobManager
+
+
+class ImportJob(models.Model):
+    """
+    Описывает задачу фонового импорта курьеров или заказов
+    поля:
+        kind: тип импортируемых объектов (couriers или orders)
+        status: состояние задачи (queued, validating, saving, done, failed)
+        total: количество объектов в импорте
+        validated: количество уже провалидированных объектов
+        created_ids: id созданных объектов
+        errors: ошибки валидации или ошибка БД
+        worker: процесс (hostname:pid), в памяти которого находятся данные
+            задачи. Если процесс завершился, задача уже не будет выполнена
+        created_at: время постановки задачи
+        updated_at: время последнего изменения задачи
+    """
+    QUEUED = "queued"
+    VALIDATING = "validating"
+    SAVING = "saving"
+    DONE = "done"
+    FAILED = "failed"
+    UNFINISHED = (QUEUED, VALIDATING, SAVING)
+
+    kind = models.CharField(max_length=8)
+    status = models.CharField(max_length=10, default=QUEUED)
+    total = models.IntegerField(default=0)
+    validated = models.IntegerField(default=0)
+    created_ids = models.JSONField(default=list)
+    errors = models.JSONField(null=True)
+    worker = models.CharField(max_length=128, default="")
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    objects = ImportJobManager()
+
+    def to_dict(self):
+        """
+        Возвращает состояние задачи импорта
+        """
+        data = {
+            "job_id": self.id,
+            "kind": self.kind,
+            "status": self.status,
+            "total": self.total,
+            "validated": self.validated,
+            self.kind: [
+                {
+                    "id": created_id
+                } for created_id in self.created_ids
+            ]
+        }
+        if self.errors is not None:
+            data["errors"] = self.errors
+        return data
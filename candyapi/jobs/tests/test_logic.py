@@ -0,0 +1,161 @@
+import os
+import socket
+import subprocess
+from unittest import mock
+
+from django.db import OperationalError
+from django.test import TestCase, override_settings
+
+from couriers.models import Courier
+from jobs import logic
+from jobs.models import ImportJob
+from jobs.logic import run_import
+
+
+class TestRunImport(TestCase):
+    """
+    Tests background import job execution
+    """
+
+    COURIERS = [
+        {
+            "courier_id": 1,
+            "courier_type": "foot",
+            "regions": [1, 12, 22],
+            "working_hours": ["11:35-14:05", "09:00-11:00"]
+        },
+        {
+            "courier_id": 2,
+            "courier_type": "bike",
+            "regions": [22],
+            "working_hours": ["09:00-18:00"]
+        },
+    ]
+
+    def run_job(self, kind, items):
+        job = ImportJob.objects.create_job(kind=kind, total=len(items))
+        run_import(job.id, kind, items)
+        job.refresh_from_db()
+        return job
+
+    def testImportCouriers(self):
+        """
+        Tests couriers are created and job is marked as done
+        """
+        job = self.run_job("couriers", self.COURIERS)
+        self.assertEqual(job.status, ImportJob.DONE)
+        self.assertEqual(job.validated, 2)
+        self.assertEqual(job.created_ids, [1, 2])
+        self.assertEqual(Courier.objects.count(), 2)
+
+    def testImportInvalidOrders(self):
+        """
+        Tests validation errors are saved in job and nothing is created
+        """
+        job = self.run_job("orders", [
+            {
+                "order_id": 1,
+                "weight": 0.5,
+                "region": 1,
+                "delivery_hours": ["10:00-11:00"]
+            },
+            {
+                "order_id": 2,
+                "weight": 100,
+                "region": 1,
+                "delivery_hours": ["10:00-11:00"]
+            },
+        ])
+        self.assertEqual(job.status, ImportJob.FAILED)
+        self.assertEqual(
+            [error["id"] for error in job.errors["orders"]],
+            [2]
+        )
+        self.assertEqual(job.to_dict()["orders"], [])
+
+    def testImportExistingCourier(self):
+        """
+        Tests database error is saved in job
+        """
+        self.run_job("couriers", self.COURIERS[:1])
+        job = self.run_job("couriers", self.COURIERS)
+        self.assertEqual(job.status, ImportJob.FAILED)
+        self.assertIn("database_error", job.errors)
+        self.assertEqual(Courier.objects.count(), 1)
+
+    def testUnexpectedError(self):
+        """
+        Tests job is marked as failed after any unexpected error
+        """
+        with mock.patch.object(
+                logic,
+                "validate_items",
+                side_effect=OperationalError("connection lost")
+        ), self.assertLogs("jobs.logic", level="ERROR"):
+            job = self.run_job("couriers", self.COURIERS)
+        self.assertEqual(job.status, ImportJob.FAILED)
+        self.assertIn("internal_error", job.errors)
+        self.assertEqual(Courier.objects.count(), 0)
+
+    @override_settings(
+        IMPORT_BATCH_SIZE=1,
+        PARALLEL_VALIDATION_WORKERS=2,
+        PARALLEL_VALIDATION_THRESHOLD=2
+    )
+    def testParallelValidationGetsWholePayload(self):
+        """
+        Tests payload validated in process pool is not split into batches
+        """
+        with mock.patch.object(
+                logic,
+                "validate_items",
+                side_effect=lambda model, items, id_field: (
+                    [model(**item) for item in items], []
+                )
+        ) as validate_mock:
+            job = self.run_job("couriers", self.COURIERS)
+        self.assertEqual(validate_mock.call_count, 1)
+        self.assertEqual(job.status, ImportJob.DONE)
+
+
+class TestFailAbandonedJobs(TestCase):
+    """
+    Tests jobs lost with a restarted worker are marked as failed
+    """
+
+    def create_job(self, worker, status=ImportJob.QUEUED):
+        job = ImportJob.objects.create_job(kind="couriers", total=1, worker=worker)
+        ImportJob.objects.set_state(job.id, status=status)
+        return job
+
+    def testFailAbandonedJobs(self):
+        """
+        Tests only unfinished jobs of dead processes on this host are failed
+        """
+        hostname = socket.gethostname()
+        finished = subprocess.Popen(["true"])
+        finished.wait()
+        own = self.create_job(logic.current_worker())
+        dead = self.create_job(
+            "{}:{}".format(hostname, finished.pid),
+            status=ImportJob.SAVING
+        )
+        legacy = self.create_job("")
+        alive = self.create_job("{}:{}".format(hostname, os.getppid()))
+        other_host = self.create_job("other-{}:1".format(hostname))
+        done = self.create_job(logic.current_worker(), status=ImportJob.DONE)
+        self.assertEqual(logic.fail_abandoned_jobs(), 3)
+        for job in (own, dead, legacy):
+            job.refresh_from_db()
+            self.assertEqual(job.status, ImportJob.FAILED)
+            self.assertEqual(
+                job.errors,
+                {"internal_error": logic.INTERRUPTED_MESSAGE}
+            )
+        for job, status in (
+                (alive, ImportJob.QUEUED),
+                (other_host, ImportJob.QUEUED),
+                (done, ImportJob.DONE)
+        ):
+            job.refresh_from_db()
+            self.assertEqual(job.status, status)
@@ -0,0 +1,54 @@
+from unittest.mock import patch, MagicMock
+
+from django.test import TestCase, Client
+
+
+class TestImportJobsViews(TestCase):
+
+    @patch("jobs.logic.submit")
+    def testSubmitAndStatus(self, submit_mock: MagicMock):
+        """
+        Tests job is created and its status is available
+        """
+        c = Client()
+        response = c.post(
+            path="/jobs/orders",
+            content_type="application/json",
+            data={"data": [{"order_id": 1}]}
+        )
+        self.assertEqual(response.status_code, 202)
+        job = response.json()
+        self.assertEqual(job["status"], "queued")
+        self.assertEqual(job["total"], 1)
+        status = c.get("/jobs/{}".format(job["job_id"])).json()
+        self.assertEqual(status["job_id"], job["job_id"])
+        self.assertEqual(status["orders"], [])
+
+    def testInvalidPayload(self):
+        """
+        Tests payload without data field is rejected
+        """
+        c = Client()
+        response = c.post(
+            path="/jobs/couriers",
+            content_type="application/json",
+            data={"stuff": []}
+        )
+        self.assertEqual(response.status_code, 400)
+
+    def testBodyNotObject(self):
+        """
+        Tests valid json which is not an object is rejected
+        """
+        for body in ("[1]", '"x"'):
+            response = Client().post(
+                path="/jobs/orders",
+                content_type="application/json",
+                data=body
+            )
+            self.assertEqual(response.status_code, 400)
+            self.assertIn("data", response.json()["validation_errors"])
+
+    def testUnknownJob(self):
+        response = Client().get("/jobs/100500")
+        self.assertEqual(response.status_code, 400)
@@ -0,0 +1,13 @@
+from django.urls import path, include
+
+from .views import ImportJobsView, ImportJobView
+
+jobs_pattern = [
+    path("couriers", ImportJobsView.as_view(kind="couriers")),
+    path("orders", ImportJobsView.as_view(kind="orders")),
+    path("<int:job_id>", ImportJobView.as_view()),
+]
+
+urlpatterns = [
+    path("/", include(jobs_pattern)),
+]
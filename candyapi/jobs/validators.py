@@ -0,0 +1,24 @@
+from typing import List, Dict
+
+from pydantic import BaseModel, root_validator
+
+
+# noinspection PyMethodParameters
+class ImportJobDataModel(BaseModel):
+    """
+    Описывает данные задачи импорта. Сами курьеры или заказы
+    валидируются в фоне при выполнении задачи
+    """
+    data: List[Dict]
+
+    @root_validator(pre=True)
+    def validate_no_excess_fields(cls, values: Dict) -> Dict:
+        """
+        Валидирует отсутствие лишних полей
+        """
+        excess_fields = set(values.keys()).difference({"data"})
+        if excess_fields:
+            raise ValueError(
+                "excess fields: {}".format(", ".join(excess_fields))
+            )
+        return values
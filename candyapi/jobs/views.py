@@ -0,0 +1,71 @@
+from pydantic import ValidationError
+
+from django.core.exceptions import ObjectDoesNotExist
+from django.views import View
+from django.views.decorators.csrf import csrf_exempt
+from django.utils.decorators import method_decorator
+from django.http import HttpRequest, HttpResponse
+
+from candyapi import codec
+from candyapi.codec import JsonResponse, JSONDecodeError
+from candyapi.responses import (InvalidJsonResponse,
+                                ValidationErrorsResponse,
+                                DatabaseErrorResponse,
+                                NOT_JSON_OBJECT_MESSAGE)
+from couriers.utils import parse_errors
+
+from .models import ImportJob
+from .validators import ImportJobDataModel
+from .logic import submit_import
+
+
+class ImportJobsView(View):
+    """
+    Обрабатывает запросы к /jobs/couriers и /jobs/orders
+    """
+    kind = None
+
+    @method_decorator(csrf_exempt)
+    def dispatch(self, request, *args, **kwargs):
+        return super(ImportJobsView, self).dispatch(request, *args, **kwargs)
+
+    def post(self, request: HttpRequest) -> HttpResponse:
+        """
+        Создает задачу фонового импорта и сразу возвращает ее id
+        """
+        try:
+            body = codec.loads(request.body)
+            if not isinstance(body, dict):
+                return ValidationErrorsResponse(errors={
+                    "data": NOT_JSON_OBJECT_MESSAGE
+                })
+            data = ImportJobDataModel(**body)
+            job = submit_import(self.kind, data)
+            return JsonResponse(status=202, data=job.to_dict())
+        except JSONDecodeError:
+            return InvalidJsonResponse()
+        except ValidationError as e:
+            errors = parse_errors(e)
+            return ValidationErrorsResponse(errors={
+                "data": {
+                    **errors
+                }
+            })
+
+
+class ImportJobView(View):
+    """
+    Обрабатывает запросы к /jobs/{job_id}
+    """
+
+    def get(self, request: HttpRequest, job_id: int) -> HttpResponse:
+        """
+        Возвращает состояние задачи импорта
+        """
+        try:
+            job = ImportJob.objects.get(id=job_id)
+            return JsonResponse(job.to_dict())
+        except ObjectDoesNotExist:
+            return DatabaseErrorResponse(
+                "job with job_id={} does not exist".format(job_id)
+            )
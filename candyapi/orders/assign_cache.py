@@ -0,0 +1,225 @@
+"""
+Кеш результатов назначения в общем кеше django (общий для воркеров
+gunicorn, см. настройку CACHES). Без общего кеша (SHARED_CACHE) изменения
+в одном воркере не сбрасывали бы записи других, поэтому кеш выключен.
+
+Для курьера с активным развозом запоминается готовый ответ на запрос
+назначения вместе со счетчиком поколений курьера. Счетчик увеличивается
+при изменении курьера и его развоза (завершение заказа), поэтому
+повторный запрос назначения отвечается из кеша без обращения к БД.
+
+Для курьера, которому нечего назначить, запоминается, что подходящих
+заказов нет, вместе со счетчиками поколений курьера и его регионов.
+Счетчик региона увеличивается, когда в регионе появляются свободные заказы
+(импорт, освобождение заказов при изменении курьера), а счетчик курьера -
+при его изменении, поэтому запись перестает действовать, как только
+курьеру может найтись заказ. Счетчики изменяются только после фиксации
+транзакции.
+
+Счетчик, которого нет в кеше (еще не создан или вытеснен), создается
+со значением текущего времени в наносекундах, поэтому не совпадает
+ни с одним значением, запомненным до вытеснения. Запись, счетчика которой
+нет в кеше, не действует
+"""
+import time
+from typing import Dict, Iterable, List, Optional
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+
+REGION_GENERATION_KEY = "orders:region-generation:{}"
+COURIER_GENERATION_KEY = "orders:courier-generation:{}"
+NOTHING_TO_ASSIGN_KEY = "orders:nothing-to-assign:{}"
+ASSIGN_RESPONSE_KEY = "orders:assign-response:{}"
+
+
+def negative_cache_enabled() -> bool:
+    return settings.SHARED_CACHE and settings.ASSIGN_NEGATIVE_CACHE_TIMEOUT > 0
+
+
+def response_cache_enabled() -> bool:
+    return settings.SHARED_CACHE and settings.ASSIGN_RESPONSE_CACHE_TIMEOUT > 0
+
+
+def _bump(key: str) -> None:
+    """
+    Увеличивает счетчик. В файловом кеше incr - это чтение и запись,
+    поэтому параллельные увеличения могут слиться в одно. Этого достаточно
+    для сброса записей: изменение фиксируется в БД до увеличения счетчика,
+    а назначение читает счетчик до чтения БД, поэтому запись со значением,
+    прочитанным до любого из слившихся увеличений, перестает действовать,
+    а прочитанное после них значение соответствует данным с обоими
+    изменениями
+    """
+    try:
+        cache.incr(key)
+    except ValueError:
+        # счетчика нет (еще не создан или вытеснен): новое значение не должно
+        # совпасть со значением, которое могло быть запомнено до вытеснения
+        if not cache.add(key, time.time_ns(), timeout=None):
+            cache.incr(key)
+
+
+def _current_generations(keys: List[str]) -> Optional[Dict[str, int]]:
+    """
+    Возвращает значения счетчиков, создавая отсутствующие. Если счетчик
+    не удалось прочитать (вытеснен сразу после создания), возвращает None
+    """
+    generations = cache.get_many(keys)
+    missing = [key for key in keys if key not in generations]
+    if not missing:
+        return generations
+    for key in missing:
+        cache.add(key, time.time_ns(), timeout=None)
+    generations.update(cache.get_many(missing))
+    if len(generations) < len(keys):
+        return None
+    return generations
+
+
+def regions_changed(region_ids: Iterable[int]) -> None:
+    """
+    Сообщает, что в регионах появились свободные заказы. Записи
+    "нечего назначить" курьеров этих регионов перестают действовать
+    после фиксации транзакции
+    """
+    if not negative_cache_enabled():
+        return
+    keys = {REGION_GENERATION_KEY.format(region_id) for region_id in region_ids}
+
+    def bump_all():
+        for key in keys:
+            _bump(key)
+
+    if keys:
+        transaction.on_commit(bump_all)
+
+
+def couriers_changed(courier_ids: Iterable[int]) -> None:
+    """
+    Сообщает об изменении курьеров или их развозов. Их записи "нечего
+    назначить" и запомненные ответы перестают действовать после фиксации
+    транзакции
+    """
+    if not negative_cache_enabled() and not response_cache_enabled():
+        return
+    keys = [COURIER_GENERATION_KEY.format(courier_id) for courier_id in courier_ids]
+
+    def bump_all():
+        for key in keys:
+            _bump(key)
+
+    if keys:
+        transaction.on_commit(bump_all)
+
+
+def courier_generations(courier) -> Optional[Dict[str, int]]:
+    """
+    Возвращает счетчики поколений курьера и его регионов по ключам кеша
+    или None, если кеш выключен или счетчики не удалось прочитать.
+    Счетчик курьера читается до чтения его регионов из БД, чтобы изменение
+    курьера во время назначения не осталось незамеченным
+    """
+    if not negative_cache_enabled():
+        return None
+    generations = _current_generations(
+        [COURIER_GENERATION_KEY.format(courier.courier_id)]
+    )
+    if generations is None:
+        return None
+    region_generations = _current_generations([
+        REGION_GENERATION_KEY.format(region_id)
+        for region_id in courier.regions.values_list("region_id", flat=True)
+    ])
+    if region_generations is None:
+        return None
+    generations.update(region_generations)
+    return generations
+
+
+def nothing_to_assign(courier_id: int) -> bool:
+    """
+    Проверяет, запомнено ли, что курьеру нечего назначить, и не изменились
+    ли с тех пор счетчики курьера и его регионов
+    """
+    if not negative_cache_enabled():
+        return False
+    generations = cache.get(NOTHING_TO_ASSIGN_KEY.format(courier_id))
+    if generations is None:
+        return False
+    current = cache.get_many(list(generations))
+    return all(
+        key in current and current[key] == value
+        for key, value in generations.items()
+    )
+
+
+def remember_nothing_to_assign(
+        courier_id: int,
+        generations: Optional[Dict[str, int]]
+) -> None:
+    """
+    Запоминает после фиксации транзакции, что курьеру нечего назначить.
+    generations - счетчики поколений, прочитанные до выбора заказов
+    (см. courier_generations)
+    """
+    if generations is None:
+        return
+    transaction.on_commit(lambda: cache.set(
+        NOTHING_TO_ASSIGN_KEY.format(courier_id),
+        generations,
+        timeout=settings.ASSIGN_NEGATIVE_CACHE_TIMEOUT
+    ))
+
+
+def courier_generation(courier_id: int) -> Optional[int]:
+    """
+    Возвращает счетчик поколений курьера или None, если кеш выключен
+    или счетчик не удалось прочитать. Должен читаться до чтения
+    данных курьера из БД
+    """
+    if not response_cache_enabled():
+        return None
+    key = COURIER_GENERATION_KEY.format(courier_id)
+    generations = _current_generations([key])
+    if generations is None:
+        return None
+    return generations[key]
+
+
+def get_assign_response(courier_id: int) -> Optional[Dict]:
+    """
+    Возвращает запомненный ответ на назначение, если с тех пор курьер
+    и его развоз не изменялись. Читает кеш одним запросом
+    """
+    if not response_cache_enabled():
+        return None
+    response_key = ASSIGN_RESPONSE_KEY.format(courier_id)
+    generation_key = COURIER_GENERATION_KEY.format(courier_id)
+    values = cache.get_many([response_key, generation_key])
+    if response_key not in values or generation_key not in values:
+        return None
+    generation, data = values[response_key]
+    if values[generation_key] != generation:
+        return None
+    return data
+
+
+def remember_assign_response(
+        courier_id: int,
+        generation: Optional[int],
+        data: Dict
+) -> None:
+    """
+    Запоминает ответ на назначение для курьера с активным развозом.
+    generation - счетчик курьера, прочитанный до назначения (см.
+    courier_generation), ответ без счетчика не запоминается
+    """
+    if not response_cache_enabled() or generation is None:
+        return
+    cache.set(
+        ASSIGN_RESPONSE_KEY.format(courier_id),
+        (generation, data),
+        timeout=settings.ASSIGN_RESPONSE_CACHE_TIMEOUT
+    )
@@ -0,0 +1,126 @@
+"""
+Групповая фиксация завершений заказов. Завершения, пришедшие в течение
+ORDERS_GROUP_COMMIT_WINDOW миллисекунд, собираются в буфере процесса
+и применяются одной транзакцией (см. logic.complete_orders) в отдельном
+потоке. Поток запроса ждет фиксации транзакции и получает результат
+своего завершения, поэтому успешный ответ, как и раньше, отправляется
+только после записи завершения в БД.
+
+Буфер общий только для потоков одного процесса, поэтому групповая фиксация
+имеет смысл только при многопоточных воркерах gunicorn (--worker-class
+gthread --threads N, см. docker-compose.yml): синхронный воркер обрабатывает
+один запрос за раз, и в транзакции всегда оказывается одно завершение
+"""
+from concurrent.futures import Future
+from threading import Condition, Lock, Thread
+from time import monotonic
+from typing import List, Optional, Tuple
+
+from django.conf import settings
+from django.db import close_old_connections
+
+from .validators import CompletionDataModel
+
+
+def group_commit_enabled() -> bool:
+    return settings.ORDERS_GROUP_COMMIT_WINDOW > 0
+
+
+class CompletionBuffer:
+    """
+    Буфер завершений заказов с потоком, который применяет накопленные
+    завершения. Окно отсчитывается от первого завершения в пустом буфере,
+    буфер применяется раньше, если в нем набралось max_size завершений
+    """
+
+    def __init__(self, window: float, max_size: int):
+        self.window = window
+        self.max_size = max_size
+        self._condition = Condition()
+        self._pending: List[Tuple[CompletionDataModel, Future]] = []
+        self._thread: Optional[Thread] = None
+
+    def submit(self, completion: CompletionDataModel) -> Future:
+        """
+        Добавляет завершение в буфер. Результат Future - None или ошибка
+        завершения (ObjectDoesNotExist или CompleteTimeError)
+        """
+        future = Future()
+        with self._condition:
+            if self._thread is None:
+                self._thread = Thread(
+                    target=self._run,
+                    name="candyapi-group-commit",
+                    daemon=True
+                )
+                self._thread.start()
+            self._pending.append((completion, future))
+            self._condition.notify()
+        return future
+
+    def _take_batch(self) -> List[Tuple[CompletionDataModel, Future]]:
+        with self._condition:
+            while not self._pending:
+                self._condition.wait()
+            deadline = monotonic() + self.window
+            while len(self._pending) < self.max_size:
+                remaining = deadline - monotonic()
+                if remaining <= 0:
+                    break
+                self._condition.wait(remaining)
+            batch = self._pending[:self.max_size]
+            self._pending = self._pending[self.max_size:]
+            return batch
+
+    def _run(self) -> None:
+        while True:
+            self.flush(self._take_batch())
+
+    @staticmethod
+    def flush(batch: List[Tuple[CompletionDataModel, Future]]) -> None:
+        """
+        Применяет завершения одной транзакцией и передает результаты
+        ожидающим запросам
+        """
+        from .logic import complete_orders
+
+        close_old_connections()
+        try:
+            results = complete_orders([completion for completion, _ in batch])
+        except Exception as e:
+            for _, future in batch:
+                future.set_exception(e)
+        else:
+            for (_, future), result in zip(batch, results):
+                future.set_result(result)
+        finally:
+            close_old_connections()
+
+
+_buffer = None
+_buffer_lock = Lock()
+
+
+def get_buffer() -> CompletionBuffer:
+    """
+    Возвращает буфер процесса, создавая его при первом обращении
+    (после fork воркера gunicorn)
+    """
+    global _buffer
+    with _buffer_lock:
+        if _buffer is None:
+            _buffer = CompletionBuffer(
+                window=settings.ORDERS_GROUP_COMMIT_WINDOW / 1000,
+                max_size=settings.ORDERS_GROUP_COMMIT_MAX_SIZE
+            )
+        return _buffer
+
+
+def complete_grouped(completion: CompletionDataModel) -> None:
+    """
+    Завершает заказ через буфер групповой фиксации и ждет фиксации.
+    Возбуждает те же ошибки, что и complete_order
+    """
+    error = get_buffer().submit(completion).result()
+    if error is not None:
+        raise error
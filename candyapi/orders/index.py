@@ -0,0 +1,342 @@
+"""
+Индекс свободных заказов в памяти процесса для быстрого подбора
+заказов курьеру. Заказы сгруппированы по регионам, а внутри региона
+разложены по временным слотам суток, поэтому поиск затрагивает только
+заказы из регионов курьера, пересекающиеся с его интервалами работы.
+
+Индекс используется только для предварительного отбора: итоговые заказы
+всегда проверяются запросом к БД по первичным ключам кандидатов, поэтому
+устаревшие записи индекса не приводят к ошибкам. Появление новых
+свободных заказов (импорт, освобождение заказов при изменении курьера)
+в других процессах отслеживается счетчиками поколений регионов в БД
+(RegionIndexGeneration). Счетчик увеличивается в той же транзакции,
+в которой появляются заказы, поэтому индекс, построенный после чтения
+счетчика, содержит все заказы, зафиксированные до этого. При изменении
+счетчика из БД перезагружаются только заказы этого региона. Параллельные
+транзакции, добавляющие заказы в одни и те же регионы, ожидают друг
+друга на строках счетчиков до фиксации
+"""
+import time
+from collections import defaultdict
+from threading import RLock
+from typing import Dict, Iterable, List, NamedTuple, Optional, Set, Tuple
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F
+
+SLOT_SECONDS = 15 * 60
+
+
+class IndexedOrder(NamedTuple):
+    """
+    Запись индекса о свободном заказе
+    """
+    order_id: int
+    region_id: int
+    weight: float
+    intervals: Tuple[Tuple[int, int], ...]
+
+
+def _slots(start: int, end: int) -> range:
+    """
+    Возвращает номера слотов, которые пересекает интервал [start, end)
+    """
+    last = max(start, end - 1)
+    return range(start // SLOT_SECONDS, last // SLOT_SECONDS + 1)
+
+
+def _overlaps(
+        order_intervals: Iterable[Tuple[int, int]],
+        intervals: Iterable[Tuple[int, int]]
+) -> bool:
+    """
+    Проверяет, пересекается ли хотя бы один интервал заказа хотя бы
+    с одним интервалом работы курьера (с тем же условием, что и
+    construct_assign_query)
+    """
+    return any(
+        order_start < end and order_end > start
+        for order_start, order_end in order_intervals
+        for start, end in intervals
+    )
+
+
+class AssignmentIndex:
+    """
+    Индекс свободных заказов: регион -> слот суток -> множество id заказов
+    """
+
+    def __init__(self):
+        self._lock = RLock()
+        self._orders: Dict[int, IndexedOrder] = {}
+        self._regions: Dict[int, Dict[int, Set[int]]] = defaultdict(
+            lambda: defaultdict(set)
+        )
+        self.generations: Dict[int, Optional[int]] = {}
+        self.loaded = False
+
+    def __len__(self):
+        return len(self._orders)
+
+    def add(self, orders: Iterable[IndexedOrder]) -> None:
+        """
+        Добавляет заказы в индекс, заменяя существующие записи
+        """
+        with self._lock:
+            for order in orders:
+                self._discard(order.order_id)
+                self._orders[order.order_id] = order
+                slots = self._regions[order.region_id]
+                for start, end in order.intervals:
+                    for slot in _slots(start, end):
+                        slots[slot].add(order.order_id)
+
+    def remove(self, order_ids: Iterable[int]) -> None:
+        """
+        Удаляет заказы из индекса
+        """
+        with self._lock:
+            for order_id in order_ids:
+                self._discard(order_id)
+
+    def _discard(self, order_id: int) -> None:
+        order = self._orders.pop(order_id, None)
+        if order is None:
+            return
+        slots = self._regions[order.region_id]
+        for start, end in order.intervals:
+            for slot in _slots(start, end):
+                slots[slot].discard(order_id)
+                if not slots[slot]:
+                    del slots[slot]
+
+    def find(
+            self,
+            region_ids: Iterable[int],
+            intervals: List[Tuple[int, int]],
+            max_weight: float
+    ) -> List[int]:
+        """
+        Возвращает id заказов из переданных регионов, подходящих по весу
+        и пересекающихся по времени с переданными интервалами
+        """
+        found = set()
+        with self._lock:
+            for region_id in region_ids:
+                slots = self._regions.get(region_id)
+                if not slots:
+                    continue
+                candidates = set()
+                for start, end in intervals:
+                    for slot in _slots(start, end):
+                        candidates.update(slots.get(slot, ()))
+                for order_id in candidates:
+                    order = self._orders[order_id]
+                    if order.weight <= max_weight and _overlaps(order.intervals, intervals):
+                        found.add(order_id)
+        return list(found)
+
+    def rebuild(self, generations: Dict[int, int]) -> None:
+        """
+        Перестраивает индекс по всем свободным заказам из БД одним запросом.
+        generations - счетчики регионов, прочитанные до загрузки заказов
+        """
+        orders = load_free_orders()
+        with self._lock:
+            self._orders.clear()
+            self._regions.clear()
+            self.add(orders)
+            self.generations = dict(generations)
+            self.loaded = True
+
+    def reload_regions(
+            self,
+            region_ids: List[int],
+            generations: Dict[int, int]
+    ) -> None:
+        """
+        Заменяет заказы переданных регионов свободными заказами из БД.
+        generations - счетчики регионов, прочитанные до загрузки заказов
+        """
+        orders = load_free_orders(region_ids=region_ids)
+        with self._lock:
+            for region_id in region_ids:
+                slots = self._regions.pop(region_id, {})
+                for order_ids in slots.values():
+                    for order_id in order_ids:
+                        self._orders.pop(order_id, None)
+                self.generations[region_id] = generations.get(region_id)
+            self.add(orders)
+
+    def advance(
+            self,
+            generations: Dict[int, int],
+            orders: Iterable[IndexedOrder] = ()
+    ) -> None:
+        """
+        Принимает счетчики регионов, увеличенные транзакцией этого процесса,
+        и ее заказы после фиксации. Заказы добавляются заново: до фиксации
+        регион мог быть перезагружен из БД другим потоком без них. Если
+        до увеличения индекс региона был актуален, он остается актуальным
+        """
+        with self._lock:
+            self.add(orders)
+            for region_id, generation in generations.items():
+                if self.generations.get(region_id) == generation - 1:
+                    self.generations[region_id] = generation
+
+    def reset(self) -> None:
+        """
+        Помечает индекс неактуальным: он будет перестроен при следующем поиске
+        """
+        with self._lock:
+            self.loaded = False
+
+
+def load_free_orders(
+        order_ids: Optional[List[int]] = None,
+        region_ids: Optional[Iterable[int]] = None
+) -> List[IndexedOrder]:
+    """
+    Загружает из БД одним запросом свободные заказы (все, только
+    с переданными id или только из переданных регионов) вместе с их
+    интервалами доставки
+    """
+    from .models import Order
+
+    rows = Order.intervals.through.objects.filter(
+        order__delievery__isnull=True,
+        order__delievered=False
+    )
+    if order_ids is not None:
+        rows = rows.filter(order_id__in=order_ids)
+    if region_ids is not None:
+        rows = rows.filter(order__region_id__in=region_ids)
+    orders = {}
+    for order_id, region_id, weight, start, end in rows.values_list(
+            "order_id",
+            "order__region_id",
+            "order__weight",
+            "interval__start",
+            "interval__end"
+    ):
+        orders.setdefault(order_id, (region_id, weight, []))[2].append((start, end))
+    return [
+        IndexedOrder(order_id, region_id, weight, tuple(order_intervals))
+        for order_id, (region_id, weight, order_intervals) in orders.items()
+    ]
+
+
+assignment_index = AssignmentIndex()
+
+
+def index_enabled() -> bool:
+    return settings.ORDERS_ASSIGNMENT_INDEX
+
+
+def _region_generations(region_ids: Optional[List[int]] = None) -> Dict[int, int]:
+    """
+    Читает одним запросом счетчики поколений регионов (всех или только
+    переданных). У регионов, в которых свободные заказы не появлялись,
+    счетчика нет
+    """
+    from .models import RegionIndexGeneration
+
+    counters = RegionIndexGeneration.objects.all()
+    if region_ids is not None:
+        counters = counters.filter(region_id__in=region_ids)
+    return dict(counters.values_list("region_id", "generation"))
+
+
+def _bump_generations(region_ids: Iterable[int]) -> Dict[int, int]:
+    """
+    Увеличивает счетчики поколений регионов в текущей транзакции
+    и возвращает их новые значения. Новый счетчик создается со значением
+    текущего времени в наносекундах, чтобы не совпасть со значением
+    счетчика, удаленного вместе с регионом. Строки счетчиков блокируются
+    в порядке region_id, чтобы параллельные транзакции не приводили
+    к взаимоблокировкам
+    """
+    from .models import RegionIndexGeneration
+
+    region_ids = sorted(set(region_ids))
+    RegionIndexGeneration.objects.bulk_create(
+        [
+            RegionIndexGeneration(region_id=region_id, generation=time.time_ns())
+            for region_id in region_ids
+        ],
+        ignore_conflicts=True
+    )
+    counters = RegionIndexGeneration.objects.filter(region_id__in=region_ids)
+    list(counters.select_for_update().order_by("region_id").values_list("region_id"))
+    counters.update(generation=F("generation") + 1)
+    return _region_generations(region_ids)
+
+
+def find_candidates(
+        region_ids: Iterable[int],
+        intervals: List[Tuple[int, int]],
+        max_weight: float
+) -> List[int]:
+    """
+    Возвращает id заказов-кандидатов. Перед поиском одним запросом
+    читаются счетчики регионов курьера, и заказы регионов, в которых
+    в других процессах появились новые свободные заказы, загружаются из БД
+    """
+    region_ids = list(region_ids)
+    if not assignment_index.loaded:
+        assignment_index.rebuild(_region_generations())
+    else:
+        generations = _region_generations(region_ids)
+        stale = [
+            region_id for region_id in region_ids
+            if assignment_index.generations.get(region_id) != generations.get(region_id)
+        ]
+        if stale:
+            assignment_index.reload_regions(stale, generations)
+    return assignment_index.find(region_ids, intervals, max_weight)
+
+
+def orders_released(orders: Iterable[IndexedOrder]) -> None:
+    """
+    Сообщает индексу о новых свободных заказах. Заказы добавляются
+    в индекс сразу (лишние кандидаты отсеиваются запросом к БД), а счетчики
+    их регионов увеличиваются в текущей транзакции, поэтому другие
+    процессы узнают о них после ее фиксации. После фиксации заказы
+    добавляются в индекс повторно, так как до нее перезагрузка региона
+    в другом потоке (rebuild, reload_regions) не видит их в БД
+    """
+    if not index_enabled():
+        return
+    orders = list(orders)
+    if not orders:
+        return
+    assignment_index.add(orders)
+    generations = _bump_generations(order.region_id for order in orders)
+    transaction.on_commit(lambda: assignment_index.advance(generations, orders))
+
+
+def orders_taken(order_ids: Iterable[int]) -> None:
+    """
+    Удаляет из индекса назначенные или завершенные заказы после
+    фиксации транзакции
+    """
+    if not index_enabled():
+        return
+    order_ids = list(order_ids)
+    transaction.on_commit(lambda: assignment_index.remove(order_ids))
+
+
+def warm_up_assignment_index() -> None:
+    """
+    Строит индекс из БД при старте воркера, если индекс включен
+    """
+    from django.db import DatabaseError
+
+    if not index_enabled():
+        return
+    try:
+        assignment_index.rebuild(_region_generations())
+    except DatabaseError:
+        assignment_index.reset()
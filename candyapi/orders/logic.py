@@ -1,14 +1,42 @@
-from typing import List, Optional
+from typing import Dict, Iterable, List, Optional
 from functools import reduce
 from datetime import datetime
 
 from dateutil import parser
 
+from django.conf import settings
+from django.core.exceptions import ObjectDoesNotExist
 from django.db import transaction
+from django.db.models import QuerySet, Sum
 
 from .models import Delievery, Order
-from .utils import construct_assign_query, fill_weight
+from .utils import (construct_assign_query,
+                    fetch_candidates,
+                    complete_in_db,
+                    Candidate)
+from .packing import get_packer
+from .assign_cache import (nothing_to_assign,
+                           remember_nothing_to_assign,
+                           courier_generations,
+                           courier_generation,
+                           couriers_changed,
+                           get_assign_response,
+                           remember_assign_response)
+from .planner import take_plan, schedule_plan
+from .validators import OrderDataModel, InvalidOrdersInData, CompletionDataModel
+from .index import (AssignmentIndex,
+                    index_enabled,
+                    find_candidates,
+                    load_free_orders,
+                    orders_taken)
 from couriers.models import Courier, Interval
+from candyapi.utils import format_time
+from couriers.utils import import_ndjson
+
+
+# Сколько раз назначение выбирает заказы заново, если часть выбранных
+# заказов уже заняли параллельные назначения
+CLAIM_ATTEMPTS = 3
 
 
 class CompleteTimeError(Exception):
@@ -23,69 +51,463 @@ class CompleteTimeError(Exception):
         )
 
 
-def select_orders(courier: Courier) -> Optional[List[Order]]:
+def _save_orders_batch(orders: List[OrderDataModel]) -> List[int]:
     """
-    Выбирает заказы, подходящие курьеру по весу, размеру, региону ии времени
-    доставки. Затем из подходящих заказов набирает те, которые курьер может развезти
+    Сохраняет пакет заказов и возвращает их id
     """
-    interval_condition = construct_assign_query(list(courier.intervals.all()))
-    max_weight = Courier.WEIGHT_MAP.get(courier.courier_type)
-    suitable_orders = Order.objects.filter(
-        interval_condition,
+    return [
+        order.order_id for order in Order.objects.create_from_list(orders)
+    ]
+
+
+@transaction.atomic
+def import_orders_stream(lines: Iterable[bytes]) -> List[int]:
+    """
+    Создает заказы из потока NDJSON, валидируя и сохраняя их пакетами.
+    При ошибках в данных возбуждает InvalidOrdersInData, и транзакция
+    откатывается целиком, как и при обычном импорте
+    """
+    created, errors = import_ndjson(
+        lines=lines,
+        model=OrderDataModel,
+        id_field="order_id",
+        save_batch=_save_orders_batch,
+        batch_size=settings.IMPORT_BATCH_SIZE
+    )
+    if errors:
+        raise InvalidOrdersInData(invalid_orders=errors)
+    return created
+
+
+def suitable_orders(
+        courier: Courier,
+        intervals: List[Interval],
+        max_weight: float
+) -> QuerySet:
+    """
+    Возвращает выборку свободных заказов из регионов курьера не тяжелее
+    max_weight, время доставки которых пересекается с интервалами работы
+    курьера intervals (не пустой список)
+    """
+    return Order.objects.filter(
+        construct_assign_query(intervals),
         delievery__isnull=True,
         delievered=False,
         weight__lte=max_weight,
         region__couriers=courier
-    ).order_by("-weight")
-    if not suitable_orders.count():
+    )
+
+
+def select_orders(
+        courier: Courier,
+        exclude: Iterable[int] = (),
+        max_weight: Optional[float] = None
+) -> Optional[List[Candidate]]:
+    """
+    Выбирает заказы, подходящие курьеру по весу, размеру, региону ии времени
+    доставки. Затем из подходящих заказов набирает те, которые курьер может развезти,
+    стратегией из настройки ORDERS_PACKING_STRATEGY.
+    Из БД выбираются только id и веса кандидатов одним запросом.
+    Заказы с id из exclude не рассматриваются. max_weight ограничивает
+    суммарный вес заказов (по умолчанию - грузоподъемность курьера)
+    """
+    intervals = list(courier.intervals.all())
+    if max_weight is None:
+        max_weight = Courier.WEIGHT_MAP.get(courier.courier_type)
+    orders = suitable_orders(courier, intervals, max_weight)
+    if exclude:
+        orders = orders.exclude(order_id__in=exclude)
+    if index_enabled():
+        # индекс сужает выборку до кандидатов, условия выше
+        # перепроверяют их по актуальным данным БД. Счетчики регионов
+        # гарантируют, что индекс содержит все свободные заказы, поэтому
+        # без кандидатов БД не запрашивается
+        candidate_ids = find_candidates(
+            region_ids=courier.regions.values_list("region_id", flat=True),
+            intervals=[(interval.start, interval.end) for interval in intervals],
+            max_weight=max_weight
+        )
+        if not candidate_ids:
+            return None
+        orders = orders.filter(order_id__in=candidate_ids)
+    packer = get_packer()
+    candidates = fetch_candidates(orders, max_weight, cutoff=packer.cutoff)
+    if not candidates:
         return None
-    orders_to_assign = fill_weight(suitable_orders, max_weight)
+    orders_to_assign = packer.pack(candidates, max_weight)
     return orders_to_assign
 
 
-@transaction.atomic
+def claim_orders(
+        courier: Courier,
+        max_weight: Optional[float] = None
+) -> Optional[List[int]]:
+    """
+    Выбирает заказы для курьера и блокирует их (см. OrderManager.claim).
+    Если часть выбранных заказов уже заняли параллельные назначения,
+    выбор повторяется без них, но не более CLAIM_ATTEMPTS раз. Возвращает
+    id заблокированных заказов из последнего выбора или None, если
+    подходящих курьеру свободных заказов нет совсем
+    """
+    claimed = []
+    skipped = set()
+    for _ in range(CLAIM_ATTEMPTS):
+        orders = select_orders(courier, exclude=skipped, max_weight=max_weight)
+        if not orders:
+            return None if not skipped else []
+        order_ids = [order.order_id for order in orders]
+        claimed = Order.objects.claim(order_ids)
+        if len(claimed) == len(order_ids):
+            break
+        skipped.update(set(order_ids).difference(claimed))
+    return claimed
+
+
 def assign(courier_id: int) -> Optional[Delievery]:
     """
     Если курьеру назначена активная доставка (разво). возвращает ее. Если
     доставка не назначена, выбирает для курьера подходящие заказы и создает
     новую доставку, назначает ее курьеру и доавляет заказы. В случае,
-    если подходящих заказов нет, возвращает None
+    если подходящих заказов нет, возвращает None. Строка курьера блокируется
+    до конца транзакции, чтобы параллельные назначения одному курьеру не
+    создали два развоза. То, что курьеру нечего назначить, запоминается
+    в кеше (см. assign_cache), и повторные запросы не обращаются к БД,
+    пока в регионах курьера не появятся свободные заказы
+    """
+    if nothing_to_assign(courier_id):
+        return None
+    return _assign(courier_id)
+
+
+@transaction.atomic
+def _assign(courier_id: int) -> Optional[Delievery]:
+    """
+    Назначает заказы курьеру в одной транзакции (см. assign)
     """
-    courier = Courier.objects.get(courier_id=courier_id)
-    if courier.delieveries.filter(completed=False).exists():
-        active_delievery = courier.delieveries.get(completed=False)
+    courier = Courier.objects.select_for_update().get(courier_id=courier_id)
+    active_delievery = courier.delieveries.filter(completed=False).first()
+    if active_delievery:
+        if settings.ORDERS_TOP_UP and active_delievery.free_weight:
+            top_up(courier, active_delievery)
         return active_delievery
+    planned = take_plan(courier_id)
+    if planned:
+        delievery = assign_planned(courier, planned)
+        if delievery:
+            return delievery
+    generations = courier_generations(courier)
     if courier.intervals.all().count() == 0:
+        remember_nothing_to_assign(courier_id, generations)
+        return None
+    for attempt in range(1, CLAIM_ATTEMPTS + 1):
+        order_ids = claim_orders(courier)
+        if order_ids is None:
+            remember_nothing_to_assign(courier_id, generations)
+            return None
+        if not order_ids:
+            return None
+        savepoint = transaction.savepoint()
+        delievery, attached = Delievery.objects.create_delievery(
+            order_ids=order_ids,
+            courier=courier,
+        )
+        # часть заказов забрало параллельное назначение: выбор повторяется,
+        # а на последней попытке остаются успешно добавленные заказы
+        if attached < len(order_ids) and (attempt < CLAIM_ATTEMPTS or not attached):
+            transaction.savepoint_rollback(savepoint)
+            continue
+        transaction.savepoint_commit(savepoint)
+        orders_taken(order_ids)
+        return delievery
+    return None
+
+
+def assign_planned(courier: Courier, order_ids: List[int]) -> Optional[Delievery]:
+    """
+    Создает развоз из заранее рассчитанного плана (см. planner). План
+    перепроверяется по текущим данным курьера: суммарный вес заказов
+    не должен превышать грузоподъемность, а условный UPDATE добавляет
+    только заказы, подходящие курьеру по региону и времени доставки.
+    Если часть заказов плана уже заняли или они больше не подходят
+    курьеру, развоз не создается и возвращается None
+    """
+    intervals = list(courier.intervals.all())
+    if not intervals:
         return None
-    orders = select_orders(courier)
-    if not orders:
+    max_weight = Courier.WEIGHT_MAP.get(courier.courier_type)
+    weights = Order.objects.filter(order_id__in=order_ids).values_list("weight", flat=True)
+    # веса заказов заданы с точностью до сотых
+    if round(sum(weights), 2) > max_weight:
         return None
-    delievery = Delievery.objects.create_delievery(
-        orders=orders,
+    savepoint = transaction.savepoint()
+    delievery, attached = Delievery.objects.create_delievery(
+        order_ids=order_ids,
         courier=courier,
+        suitable=suitable_orders(courier, intervals, max_weight)
     )
+    if attached < len(order_ids):
+        transaction.savepoint_rollback(savepoint)
+        return None
+    transaction.savepoint_commit(savepoint)
+    orders_taken(order_ids)
     return delievery
 
 
+def top_up(courier: Courier, delievery: Delievery) -> int:
+    """
+    Дозагружает активный развоз подходящими курьеру свободными заказами
+    в пределах свободной грузоподъемности, записанной при завершении
+    последнего заказа. Так как тип курьера мог измениться после
+    завершения, свободная грузоподъемность ограничивается текущей
+    грузоподъемностью курьера за вычетом веса невыполненных заказов
+    развоза. Заказы выбираются так же, как при назначении,
+    и добавляются одним запросом. Развоз остается тем же, поэтому
+    заработок за него не меняется. Свободная грузоподъемность сбрасывается
+    до завершения следующего заказа. Возвращает количество добавленных
+    заказов
+    """
+    remaining = delievery.orders.filter(delievered=False).aggregate(
+        weight=Sum("weight")
+    )["weight"] or 0
+    # веса заказов заданы с точностью до сотых
+    max_weight = min(
+        delievery.free_weight,
+        round(Courier.WEIGHT_MAP.get(courier.courier_type) - remaining, 2)
+    )
+    attached = 0
+    order_ids = claim_orders(courier, max_weight=max_weight) if max_weight > 0 else None
+    if order_ids:
+        attached = Delievery.objects.attach_orders(delievery, order_ids)
+        orders_taken(order_ids)
+        couriers_changed([courier.courier_id])
+    delievery.free_weight = None
+    delievery.save(update_fields=["free_weight"])
+    return attached
+
+
+def assign_response(courier_id: int) -> Dict:
+    """
+    Назначает заказы курьеру и возвращает данные ответа на запрос
+    назначения. Ответ для курьера с активным развозом запоминается в кеше
+    (см. assign_cache), и повторные запросы не обращаются к БД, пока
+    не изменятся курьер или его развоз
+    """
+    data = get_assign_response(courier_id)
+    if data is not None:
+        return data
+    generation = courier_generation(courier_id)
+    delievery = assign(courier_id)
+    if not delievery:
+        return {"orders": []}
+    data = {
+        "orders": [
+            {
+                "id": order_id
+            } for order_id in delievery.orders.filter(
+                delievered=False
+            ).values_list("order_id", flat=True)
+        ],
+        "assign_time": format_time(delievery.assigned_time)
+    }
+    remember_assign_response(courier_id, generation, data)
+    return data
+
+
+def match_couriers(couriers: List[Courier]) -> Dict[int, List[Candidate]]:
+    """
+    Распределяет свободные заказы между курьерами. Свободные заказы из
+    регионов всех курьеров загружаются одним запросом во временный индекс.
+    Курьеры обрабатываются по убыванию грузоподъемности, чтобы тяжелые
+    заказы, которые не могут взять пешие курьеры, доставались машинам.
+    Каждому курьеру заказы набираются стратегией из настройки
+    ORDERS_PACKING_STRATEGY и удаляются из индекса.
+    Возвращает словарь courier_id -> выбранные заказы
+    """
+    region_ids = {
+        region.region_id for courier in couriers for region in courier.regions.all()
+    }
+    free_orders = load_free_orders(region_ids=region_ids)
+    weights = {order.order_id: order.weight for order in free_orders}
+    index = AssignmentIndex()
+    index.add(free_orders)
+    packer = get_packer()
+    plan = {}
+    for courier in sorted(
+            couriers,
+            key=lambda c: (-Courier.WEIGHT_MAP.get(c.courier_type), c.courier_id)
+    ):
+        max_weight = Courier.WEIGHT_MAP.get(courier.courier_type)
+        found = index.find(
+            region_ids=[region.region_id for region in courier.regions.all()],
+            intervals=[(interval.start, interval.end) for interval in courier.intervals.all()],
+            max_weight=max_weight
+        )
+        candidates = sorted(
+            (Candidate(order_id, weights[order_id]) for order_id in found),
+            key=lambda candidate: (-candidate.weight, candidate.order_id)
+        )
+        chosen = packer.pack(candidates, max_weight)
+        index.remove(candidate.order_id for candidate in chosen)
+        plan[courier.courier_id] = chosen
+    return plan
+
+
+@transaction.atomic
+def assign_batch(courier_ids: List[int]) -> Dict[int, Optional[Delievery]]:
+    """
+    Назначает заказы сразу нескольким курьерам в одной транзакции.
+    Курьерам с активным развозом возвращается он, остальным заказы
+    распределяются по общему плану (см. match_couriers). Возвращает
+    словарь courier_id -> развоз (None, если подходящих заказов нет).
+    Строки курьеров блокируются в порядке courier_id, чтобы пересекающиеся
+    пакетные назначения не приводили к взаимоблокировкам.
+    Если хотя бы одного курьера нет, возбуждает Courier.DoesNotExist
+    """
+    couriers = {
+        courier.courier_id: courier for courier in Courier.objects.filter(
+            courier_id__in=courier_ids
+        ).select_for_update().order_by("courier_id").prefetch_related(
+            "regions",
+            "intervals"
+        )
+    }
+    missing = [
+        courier_id for courier_id in courier_ids if courier_id not in couriers
+    ]
+    if missing:
+        raise Courier.DoesNotExist(
+            "couriers with courier_id={} do not exist".format(
+                ", ".join(str(courier_id) for courier_id in missing)
+            )
+        )
+    delieveries = {courier_id: None for courier_id in courier_ids}
+    for delievery in Delievery.objects.filter(
+            courier_id__in=courier_ids,
+            completed=False
+    ):
+        delieveries[delievery.courier_id] = delievery
+    couriers_changed(courier_ids)
+    plan = match_couriers([
+        courier for courier_id, courier in couriers.items()
+        if delieveries[courier_id] is None and courier.intervals.all()
+    ])
+    # заказы, которые успели занять параллельные назначения, пропускаются
+    claimed = set(Order.objects.claim([
+        order.order_id for orders in plan.values() for order in orders
+    ]))
+    taken = []
+    for courier_id, orders in plan.items():
+        order_ids = [
+            order.order_id for order in orders if order.order_id in claimed
+        ]
+        if not order_ids:
+            continue
+        delievery, attached = Delievery.objects.create_delievery(
+            order_ids=order_ids,
+            courier=couriers[courier_id],
+        )
+        if not attached:
+            delievery.delete()
+            continue
+        delieveries[courier_id] = delievery
+        taken.extend(order_ids)
+    orders_taken(taken)
+    return delieveries
+
+
 @transaction.atomic()
 def complete_order(courier_id: int,
                    order_id: int,
                    complete_time: str) -> Order:
     """
     Завершает заказ и обновляет время последней доставки в активном развозе.
-    Если все заказы в развозе выполнены, завершает развоз
+    Если все заказы в развозе выполнены, завершает развоз, иначе записывает
+    свободную грузоподъемность курьера для дозагрузки развоза. Если развоз
+    почти выполнен, заказы следующего развоза выбираются заранее в фоне.
+    Сначала блокируется строка курьера, затем развоз и заказ проверяются
+    одним запросом с блокировкой строки развоза, изменения записываются
+    complete_in_db. Если курьера нет, возбуждает Courier.DoesNotExist,
+    если заказа нет в активном развозе курьера - Delievery.DoesNotExist
     """
-    courier = Courier.objects.get(courier_id=courier_id)
-    delievery = courier.delieveries.get(completed=False)
-    order = delievery.orders.filter(delievered=False).get(order_id=order_id)
-    if parser.isoparse(complete_time) <= delievery.last_delievery_time:
+    complete_datetime = parser.isoparse(complete_time)
+    # строка курьера блокируется раньше строки развоза, в том же порядке,
+    # что и при назначении и изменении курьера, иначе параллельные
+    # завершение и назначение могли бы заблокировать друг друга
+    courier_type = Courier.objects.select_for_update().filter(
+        courier_id=courier_id
+    ).values_list("courier_type", flat=True).first()
+    if courier_type is None:
+        raise Courier.DoesNotExist()
+    (delievery_id, last_delievery_time, transport_type,
+     weight, region_id) = (
+        Delievery.objects.select_for_update(of=("self",)).filter(
+            courier_id=courier_id,
+            completed=False,
+            orders__order_id=order_id,
+            orders__delievered=False
+        ).values_list(
+            "id",
+            "last_delievery_time",
+            "transport_type",
+            "orders__weight",
+            "orders__region_id"
+        ).get()
+    )
+    if complete_datetime <= last_delievery_time:
         raise CompleteTimeError()
-    order.complete(
-        datetime_string=complete_time,
-        start_time=delievery.last_delievery_time
+    completion_time = int((complete_datetime - last_delievery_time).total_seconds())
+    remaining = complete_in_db(
+        order_id=order_id,
+        delievery_id=delievery_id,
+        courier_id=courier_id,
+        region_id=region_id,
+        complete_time=complete_datetime,
+        completion_time=completion_time,
+        capacity=Courier.WEIGHT_MAP.get(courier_type),
+        top_up=settings.ORDERS_TOP_UP,
+        earnings=Courier.delievery_earnings(transport_type)
+    )
+    couriers_changed([courier_id])
+    orders_taken([order_id])
+    schedule_plan(courier_id, remaining)
+    return Order.from_db(
+        Order.objects.db,
+        ["order_id", "weight", "region_id", "delievered",
+         "delievery_time", "completion_time", "delievery_id"],
+        [order_id, weight, region_id, True,
+         complete_datetime, completion_time, delievery_id]
+    )
+
+
+@transaction.atomic
+def complete_orders(
+        completions: List[CompletionDataModel]
+) -> List[Optional[Exception]]:
+    """
+    Завершает заказы из списка в одной транзакции. Завершения каждого
+    курьера применяются в порядке complete_time, чтобы выполнялось условие
+    на время последней доставки. Каждое завершение выполняется в своей
+    точке сохранения, поэтому ошибка в одном из них не отменяет остальные.
+    Возвращает для каждого завершения (в порядке передачи) None или
+    возникшую ошибку (ObjectDoesNotExist или CompleteTimeError)
+    """
+    results = [None] * len(completions)
+    ordered = sorted(
+        range(len(completions)),
+        key=lambda index: (
+            completions[index].courier_id,
+            parser.isoparse(completions[index].complete_time)
+        )
     )
-    delievery.last_delievery_time = order.delievery_time
-    if not delievery.orders.filter(delievered=False).exists():
-        delievery.completed = True
-    delievery.save()
-    return order
+    for index in ordered:
+        completion = completions[index]
+        try:
+            with transaction.atomic():
+                complete_order(
+                    courier_id=completion.courier_id,
+                    order_id=completion.order_id,
+                    complete_time=completion.complete_time
+                )
+        except (ObjectDoesNotExist, CompleteTimeError) as e:
+            results[index] = e
+    return results
@@ -1,26 +1,39 @@
 from __future__ import annotations
 from typing import TYPE_CHECKING
-from typing import List, Dict
+from typing import List, Dict, Tuple, Union, Optional
 
 if TYPE_CHECKING:
-    from .models import Order
-    from couriers.models import Region
+    from .models import Order, Delievery
+    from couriers.models import Region, Courier
 
 from django.apps import apps
+from django.conf import settings
 from django.db import models
-from django.db import transaction
+from django.db import connection, transaction
 from django.utils import timezone
 from .validators import OrderDataModel, OrderListDataModel
+from .index import IndexedOrder, orders_released
+from .assign_cache import regions_changed
 
 from utils.models import Region, Interval
+from utils.bulk_copy import bulk_insert
+from candyapi.utils import chunks
 
 
 class DelieveryManager(models.Manager):
 
-    def create_delievery(self, orders: List[Order], courier: Courier):
+    def create_delievery(
+            self,
+            order_ids: List[int],
+            courier: Courier,
+            suitable: Optional[models.QuerySet] = None
+    ) -> Tuple[Delievery, int]:
         """
-        Создает новый развоз, добавляет в него заказы из переданного
-        списка и наначает его переданому курьеру
+        Создает новый развоз, наначает его переданому курьеру и одним
+        запросом UPDATE добавляет в него заказы с переданными id, которые
+        еще не входят ни в один развоз (см. attach_orders). Возвращает
+        развоз и количество добавленных заказов: если оно меньше количества
+        переданных id, часть заказов уже забрало параллельное назначение
         """
         assigned_time = timezone.now()
         delievery = self.create(
@@ -29,9 +42,27 @@ class DelieveryManager(models.Manager):
             courier=courier,
             transport_type=courier.courier_type
         )
-        for order in orders:
-            delievery.orders.add(order)
-        return delievery
+        return delievery, self.attach_orders(delievery, order_ids, suitable)
+
+    @staticmethod
+    def attach_orders(
+            delievery: Delievery,
+            order_ids: List[int],
+            suitable: Optional[models.QuerySet] = None
+    ) -> int:
+        """
+        Одним запросом UPDATE добавляет в развоз заказы с переданными id,
+        которые еще не входят ни в один развоз, и возвращает их количество.
+        Если передан suitable, добавляются только заказы из этой выборки
+        """
+        orders = apps.get_model("orders", "Order").objects.filter(
+            order_id__in=order_ids,
+            delievery__isnull=True,
+            delievered=False
+        )
+        if suitable is not None:
+            orders = orders.filter(order_id__in=suitable.values("order_id"))
+        return orders.update(delievery=delievery)
 
 
 class OrderManager(models.Manager):
@@ -40,23 +71,109 @@ class OrderManager(models.Manager):
         """
         Создает новый заказ
         """
+        region_ids = Region.objects.resolve_ids([data.region])
         order = self.create(
             order_id=data.order_id,
             weight=data.weight,
+            region_id=region_ids[data.region]
+        )
+        order.intervals.set(
+            Interval.objects.resolve_strings(data.delivery_hours).values()
         )
-        order.region = Region.objects.create_or_find(data.region)
-        intervals = Interval.objects.create_from_list(data.delivery_hours)
-        order.intervals.set(intervals)
-        order.save()
+        orders_released([self._to_indexed(data, order.region_id)])
+        regions_changed([order.region_id])
         return order
 
+    def claim(self, order_ids: List[int]) -> List[int]:
+        """
+        Блокирует до конца транзакции свободные заказы из переданного списка
+        и возвращает их id. Заказы, заблокированные другими транзакциями,
+        пропускаются (SKIP LOCKED), поэтому параллельные назначения не ждут
+        друг друга и не получают одни и те же заказы. На БД без SKIP LOCKED
+        блокировка ожидает другие транзакции, а на БД без блокировок строк
+        (SQLite) записи и так выполняются по очереди. Строки блокируются
+        в порядке id, чтобы ожидающие блокировки не приводили к взаимоблокировкам
+        """
+        orders = self.filter(
+            order_id__in=order_ids,
+            delievery__isnull=True,
+            delievered=False
+        ).order_by("order_id")
+        if connection.features.has_select_for_update_skip_locked:
+            orders = orders.select_for_update(skip_locked=True)
+        else:
+            orders = orders.select_for_update()
+        return list(orders.values_list("order_id", flat=True))
+
+    @staticmethod
+    def _to_indexed(data: OrderDataModel, region_id: int) -> IndexedOrder:
+        """
+        Создает запись индекса назначения для нового заказа
+        """
+        return IndexedOrder(
+            order_id=data.order_id,
+            region_id=region_id,
+            weight=data.weight,
+            intervals=tuple(
+                Interval.objects.interval_string_to_start_end(interval)
+                for interval in set(data.delivery_hours)
+            )
+        )
+
     @transaction.atomic()
-    def create_from_list(self, data: List[Dict]) -> List[Order]:
+    def create_from_list(
+            self,
+            data: List[Union[Dict, OrderDataModel]]
+    ) -> List[Order]:
         """
         Создает заказы из переданного списка. Обернута в transaction.atomic,
-        чтобы предотвратить частичное добавление заказов в БД при ошибках
+        чтобы предотвратить частичное добавление заказов в БД при ошибках.
+        Заказы добавляются пакетами размером IMPORT_BATCH_SIZE, количество
+        запросов на пакет не зависит от его размера. Уже провалидированные
+        модели OrderDataModel повторно не валидируются
+        """
+        orders_data = [
+            order_data if isinstance(order_data, OrderDataModel)
+            else OrderDataModel(**order_data)
+            for order_data in data
+        ]
+        orders = []
+        for batch in chunks(orders_data, settings.IMPORT_BATCH_SIZE):
+            orders.extend(self._create_batch(batch))
+        return orders
+
+    def _create_batch(self, data: List[OrderDataModel]) -> List[Order]:
+        """
+        Создает один пакет заказов: заранее разрешает все регионы и интервалы
+        пакета, добавляет заказы одной вставкой (bulk_create или COPY) с уже
+        установленным region_id и одной вставкой заполняет промежуточную
+        таблицу интервалов
         """
-        return list(map(
-            self.create_order,
-            [OrderDataModel(**order_data) for order_data in data ]
-        ))
+        region_ids = Region.objects.resolve_ids(
+            order_data.region for order_data in data
+        )
+        interval_ids = Interval.objects.resolve_strings(
+            interval for order_data in data
+            for interval in order_data.delivery_hours
+        )
+        orders = bulk_insert([
+            self.model(
+                order_id=order_data.order_id,
+                weight=order_data.weight,
+                region_id=region_ids[order_data.region]
+            ) for order_data in data
+        ])
+        intervals_through = self.model.intervals.through
+        bulk_insert([
+            intervals_through(
+                order_id=order_data.order_id,
+                interval_id=interval_ids[interval]
+            ) for order_data in data
+            for interval in set(order_data.delivery_hours)
+        ])
+        orders_released(
+            self._to_indexed(order_data, region_ids[order_data.region])
+            for order_data in data
+        )
+        regions_changed(region_ids.values())
+        return orders
@@ -0,0 +1,18 @@
+# Generated by Django 3.1.7 on 2026-10-16 20:50
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('orders', '0002_delievery_transport_type'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='delievery',
+            name='free_weight',
+            field=models.FloatField(null=True),
+        ),
+    ]
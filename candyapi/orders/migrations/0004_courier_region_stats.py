@@ -0,0 +1,30 @@
+# Generated by Django 3.1.7 on 2026-10-16 20:59
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('couriers', '0002_auto_20210324_0959'),
+        ('utils', '0001_initial'),
+        ('orders', '0003_delievery_free_weight'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CourierRegionStats',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('completion_time_sum', models.BigIntegerField(default=0)),
+                ('completed_count', models.IntegerField(default=0)),
+                ('courier', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='region_stats', to='couriers.courier')),
+                ('region', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='utils.region')),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name='courierregionstats',
+            constraint=models.UniqueConstraint(fields=('courier', 'region'), name='unique_courier_region_stats'),
+        ),
+    ]
@@ -0,0 +1,22 @@
+# Generated by Django 3.1.7 on 2026-10-16 21:15
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('utils', '0001_initial'),
+        ('orders', '0004_courier_region_stats'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RegionIndexGeneration',
+            fields=[
+                ('region', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='+', serialize=False, to='utils.region')),
+                ('generation', models.BigIntegerField()),
+            ],
+        ),
+    ]
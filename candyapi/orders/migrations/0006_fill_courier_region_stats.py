@@ -0,0 +1,48 @@
+# Generated by Django 3.1.7 on 2026-10-16 23:10
+
+from django.db import migrations
+from django.db.models import Count, Sum
+
+
+def fill_region_stats(apps, schema_editor):
+    """
+    Заполняет статистику курьеров по регионам по уже выполненным заказам.
+    Статистика пересчитывается заново, поэтому учитывает и заказы,
+    выполненные после создания таблицы
+    """
+    Order = apps.get_model("orders", "Order")
+    CourierRegionStats = apps.get_model("orders", "CourierRegionStats")
+    totals = Order.objects.filter(
+        delievered=True,
+        region__isnull=False,
+        delievery__isnull=False
+    ).values(
+        "delievery__courier_id",
+        "region_id"
+    ).annotate(
+        completion_time_sum=Sum("completion_time"),
+        completed_count=Count("order_id")
+    ).order_by()
+    CourierRegionStats.objects.all().delete()
+    CourierRegionStats.objects.bulk_create(
+        [
+            CourierRegionStats(
+                courier_id=total["delievery__courier_id"],
+                region_id=total["region_id"],
+                completion_time_sum=total["completion_time_sum"] or 0,
+                completed_count=total["completed_count"]
+            ) for total in totals
+        ],
+        batch_size=1000
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('orders', '0005_region_index_generation'),
+    ]
+
+    operations = [
+        migrations.RunPython(fill_region_stats, migrations.RunPython.noop),
+    ]
@@ -1,6 +1,3 @@
-import dateutil.parser
-from datetime import datetime
-
 from django.db import models
 
 from .managers import OrderManager, DelieveryManager
@@ -17,6 +14,9 @@ class Delievery(models.Model):
         courier: ссылка на курьера, которому назначен развоз
         completed: флаг, обозначающий завершен ли развоз
         transport_type: тип курьера на момент назначния развоза
+        free_weight: свободная грузоподъемность курьера после последнего
+            завершенного заказа (для дозагрузки развоза, см. ORDERS_TOP_UP).
+            None, если дозагружать развоз не нужно
     """
     assigned_time = models.DateTimeField()
     last_delievery_time = models.DateTimeField()
@@ -25,6 +25,7 @@ class Delievery(models.Model):
                                 on_delete=models.CASCADE)
     completed = models.BooleanField(default=False)
     transport_type = models.CharField(default="foot", max_length=4)
+    free_weight = models.FloatField(null=True)
     objects = DelieveryManager()
 
 
@@ -60,13 +61,46 @@ class Order(models.Model):
     def __str__(self):
         return "order id: {}".format(self.order_id)
 
-    def complete(self, datetime_string: str, start_time: datetime) -> None:
-        """
-        Завершает развоз
-        """
-        complete_time = dateutil.parser.isoparse(datetime_string)
-        self.delievered = True
-        self.delievery_time = complete_time
-        time_to_complete = (complete_time - start_time).total_seconds()
-        self.completion_time = time_to_complete
-        self.save()
+
+class CourierRegionStats(models.Model):
+    """
+    Суммарное время выполнения заказов курьера в регионе для расчета
+    рейтинга. Обновляется при завершении заказа (см. complete_in_db)
+    поля:
+        courier: курьер
+        region: регион выполненных заказов
+        completion_time_sum: сумма времени выполнения заказов в секундах
+        completed_count: количество выполненных заказов
+    """
+    courier = models.ForeignKey(to="couriers.Courier",
+                                related_name="region_stats",
+                                on_delete=models.CASCADE)
+    region = models.ForeignKey(to="utils.Region",
+                               related_name="+",
+                               on_delete=models.CASCADE)
+    completion_time_sum = models.BigIntegerField(default=0)
+    completed_count = models.IntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["courier", "region"],
+                name="unique_courier_region_stats"
+            )
+        ]
+
+
+class RegionIndexGeneration(models.Model):
+    """
+    Счетчик поколений свободных заказов региона для индекса свободных
+    заказов (см. orders.index). Увеличивается в транзакции, в которой
+    в регионе появляются свободные заказы
+    поля:
+        region: регион
+        generation: значение счетчика
+    """
+    region = models.OneToOneField(to="utils.Region",
+                                  primary_key=True,
+                                  related_name="+",
+                                  on_delete=models.CASCADE)
+    generation = models.BigIntegerField()
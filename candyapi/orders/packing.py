@@ -0,0 +1,117 @@
+"""
+Стратегии набора заказов в развоз из списка кандидатов.
+Стратегия выбирается настройкой ORDERS_PACKING_STRATEGY: имя одной из
+встроенных стратегий ("greedy", "knapsack") или путь к классу стратегии.
+
+greedy - жадный набор наиболее тяжелых заказов (fill_weight).
+knapsack - точное решение задачи о рюкзаке: набор заказов с максимальным
+суммарным весом, не превышающим грузоподъемность курьера. Веса
+переводятся в сотые доли килограмма, и задача решается динамическим
+программированием на numpy. Если numpy не установлен, решение не уложилось
+в отведенное время или задача слишком велика, используется жадный набор
+"""
+import math
+from time import monotonic
+from typing import List
+
+from django.conf import settings
+from django.utils.module_loading import import_string
+
+from .utils import Candidate, fill_weight
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+# Количество долей килограмма в единице веса при точном решении
+WEIGHT_SCALE = 100
+# Максимальный размер таблицы динамического программирования (ячеек)
+MAX_TABLE_SIZE = 50_000_000
+
+
+class GreedyPacker:
+    """
+    Жадный набор: заказы перебираются по убыванию веса, и берется
+    каждый, который еще помещается
+    """
+    # кандидатов, которые заведомо не поместятся, можно отбросить
+    # еще в запросе (см. fetch_candidates)
+    cutoff = True
+
+    def pack(self, candidates: List[Candidate], max_weight: float) -> List[Candidate]:
+        return fill_weight(candidates, max_weight)
+
+
+class KnapsackPacker:
+    """
+    Точный набор заказов с максимальным суммарным весом
+    """
+    cutoff = False
+
+    def __init__(self, time_budget: float = None):
+        if time_budget is None:
+            time_budget = settings.ORDERS_PACKING_TIME_BUDGET / 1000
+        self.time_budget = time_budget
+        self.fallback = GreedyPacker()
+
+    def pack(self, candidates: List[Candidate], max_weight: float) -> List[Candidate]:
+        if sum(candidate.weight for candidate in candidates) <= max_weight:
+            return list(candidates)
+        capacity = math.floor(max_weight * WEIGHT_SCALE + 1e-6)
+        if numpy is None or len(candidates) * (capacity + 1) > MAX_TABLE_SIZE:
+            return self.fallback.pack(candidates, max_weight)
+        chosen = self.solve(candidates, capacity)
+        if chosen is None:
+            return self.fallback.pack(candidates, max_weight)
+        return chosen
+
+    def solve(self, candidates: List[Candidate], capacity: int):
+        """
+        Решает задачу о рюкзаке для весов в сотых долях. reachable[i][w]
+        показывает, можно ли набрать вес w из первых i кандидатов.
+        Возвращает выбранных кандидатов или None, если время вышло
+        """
+        deadline = monotonic() + self.time_budget
+        weights = [
+            math.ceil(candidate.weight * WEIGHT_SCALE - 1e-6)
+            for candidate in candidates
+        ]
+        reachable = numpy.zeros((len(candidates) + 1, capacity + 1), dtype=bool)
+        reachable[0, 0] = True
+        count = 0
+        for count, weight in enumerate(weights, start=1):
+            row = reachable[count]
+            row[:] = reachable[count - 1]
+            if weight <= capacity:
+                row[weight:] |= reachable[count - 1, :capacity + 1 - weight]
+            if row[capacity]:
+                # грузоподъемность заполнена полностью, лучше не набрать
+                break
+            if monotonic() > deadline:
+                return None
+        weight = int(numpy.flatnonzero(reachable[count])[-1])
+        chosen = []
+        for index in range(count, 0, -1):
+            if not reachable[index - 1, weight]:
+                chosen.append(candidates[index - 1])
+                weight -= weights[index - 1]
+        chosen.reverse()
+        return chosen
+
+
+PACKERS = {
+    "greedy": GreedyPacker,
+    "knapsack": KnapsackPacker,
+}
+
+
+def get_packer():
+    """
+    Возвращает стратегию набора заказов, заданную в настройках
+    """
+    strategy = settings.ORDERS_PACKING_STRATEGY
+    packer_class = PACKERS.get(strategy)
+    if packer_class is None:
+        packer_class = import_string(strategy)
+    return packer_class()
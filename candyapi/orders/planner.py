@@ -0,0 +1,127 @@
+"""
+Фоновое планирование следующего развоза курьера.
+
+Когда курьер завершает заказ и в его развозе остается не больше
+ORDERS_PLANNER_REMAINING невыполненных заказов, в пуле фоновых потоков
+(см. candyapi.workers) для него заранее выбираются заказы следующего
+развоза. План (только id заказов) хранится в общем кеше django вместе со
+счетчиком поколений профиля курьера, который увеличивается при изменении
+курьера. Назначение берет план, если счетчик не изменился, и добавляет
+заказы в развоз условным UPDATE, который перепроверяет их по текущим
+данным курьера (см. orders.logic.assign_planned): если часть заказов уже
+заняли или они больше не подходят курьеру, план отбрасывается, и заказы
+выбираются обычным образом. Счетчик только позволяет не проверять
+устаревший план, поэтому его потеря (кеш в памяти процесса, вытеснение)
+не приводит к назначению неподходящих заказов
+"""
+import time
+from typing import List, Optional
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+
+from candyapi.workers import submit
+
+PLAN_KEY = "orders:plan:{}"
+PROFILE_GENERATION_KEY = "orders:profile-generation:{}"
+
+
+def planner_enabled() -> bool:
+    return settings.ORDERS_PLANNER
+
+
+def _profile_generation_key(courier_id: int) -> str:
+    return PROFILE_GENERATION_KEY.format(courier_id)
+
+
+def _profile_generation(courier_id: int) -> Optional[int]:
+    """
+    Возвращает счетчик поколений профиля курьера, создавая его, если
+    счетчика нет в кеше
+    """
+    key = _profile_generation_key(courier_id)
+    generation = cache.get(key)
+    if generation is None:
+        cache.add(key, time.time_ns(), timeout=None)
+        generation = cache.get(key)
+    return generation
+
+
+def profile_changed(courier_id: int) -> None:
+    """
+    Сообщает об изменении типа, регионов или графика курьера. Его план
+    перестает действовать после фиксации транзакции
+    """
+    if not planner_enabled():
+        return
+    key = _profile_generation_key(courier_id)
+
+    def bump():
+        try:
+            cache.incr(key)
+        except ValueError:
+            if not cache.add(key, time.time_ns(), timeout=None):
+                cache.incr(key)
+
+    transaction.on_commit(bump)
+
+
+def compute_plan(courier_id: int) -> Optional[List[int]]:
+    """
+    Выбирает заказы следующего развоза курьера и сохраняет их в кеше.
+    Выполняется в фоновом потоке
+    """
+    from couriers.models import Courier
+    from .logic import select_orders
+
+    generation = _profile_generation(courier_id)
+    if generation is None:
+        return None
+    try:
+        courier = Courier.objects.get(courier_id=courier_id)
+    except Courier.DoesNotExist:
+        return None
+    if not courier.intervals.exists():
+        return None
+    orders = select_orders(courier)
+    if not orders:
+        cache.delete(PLAN_KEY.format(courier_id))
+        return None
+    order_ids = [order.order_id for order in orders]
+    cache.set(
+        PLAN_KEY.format(courier_id),
+        (generation, order_ids),
+        timeout=settings.ORDERS_PLAN_TIMEOUT
+    )
+    return order_ids
+
+
+def schedule_plan(courier_id: int, remaining: int) -> None:
+    """
+    Ставит расчет плана в очередь фоновых потоков после фиксации
+    транзакции, если в развозе курьера осталось мало заказов
+    """
+    if not planner_enabled() or remaining > settings.ORDERS_PLANNER_REMAINING:
+        return
+    transaction.on_commit(lambda: submit(compute_plan, courier_id))
+
+
+def take_plan(courier_id: int) -> Optional[List[int]]:
+    """
+    Забирает из кеша план курьера, если с момента его расчета курьер
+    не изменялся. План, счетчика которого нет в кеше, не используется.
+    Кеш читается одним запросом
+    """
+    if not planner_enabled():
+        return None
+    plan_key = PLAN_KEY.format(courier_id)
+    generation_key = _profile_generation_key(courier_id)
+    values = cache.get_many([plan_key, generation_key])
+    if plan_key not in values:
+        return None
+    cache.delete(plan_key)
+    generation, order_ids = values[plan_key]
+    if generation_key not in values or values[generation_key] != generation:
+        return None
+    return order_ids
@@ -0,0 +1,266 @@
+from datetime import timedelta
+from unittest.mock import patch
+
+from django.core.cache import cache
+from django.test import TransactionTestCase, Client, override_settings
+from django.utils import timezone
+
+from couriers.models import Courier
+from couriers.validators import CourierDataModel, CourierPatchDataModel
+from orders import assign_cache
+from orders.assign_cache import nothing_to_assign
+from orders.logic import assign, assign_batch, complete_order
+from orders.models import Order
+from utils.cache import clear_identity_caches
+from candyapi.utils import format_time
+
+
+@override_settings(SHARED_CACHE=True)
+class TestNothingToAssignCache(TransactionTestCase):
+    """
+    Tests repeated empty assigns are answered from cache until orders
+    appear in courier regions or courier is changed. TransactionTestCase
+    is used because cache is filled after transaction commit
+    """
+
+    def setUp(self):
+        cache.clear()
+        clear_identity_caches()
+        Courier.objects.create_courier(CourierDataModel(**{
+            "courier_id": 1,
+            "courier_type": "foot",
+            "regions": [1, 2],
+            "working_hours": ["10:00-18:00"]
+        }))
+
+    def tearDown(self):
+        cache.clear()
+        clear_identity_caches()
+
+    @staticmethod
+    def add_order(order_id: int, region: int):
+        Order.objects.create_from_list([{
+            "order_id": order_id,
+            "weight": 1,
+            "region": region,
+            "delivery_hours": ["12:00-13:00"]
+        }])
+
+    def testRepeatedEmptyAssign(self):
+        """
+        Tests repeated empty assign does not query database
+        """
+        self.assertIsNone(assign(1))
+        with self.assertNumQueries(0):
+            self.assertIsNone(assign(1))
+
+    def testOrdersInOtherRegion(self):
+        """
+        Tests orders in other regions do not invalidate cache
+        """
+        assign(1)
+        self.add_order(1, 3)
+        with self.assertNumQueries(0):
+            self.assertIsNone(assign(1))
+
+    def testOrdersInCourierRegion(self):
+        """
+        Tests new orders in courier region invalidate cache
+        """
+        assign(1)
+        self.add_order(1, 2)
+        delievery = assign(1)
+        self.assertEqual([order.order_id for order in delievery.orders.all()], [1])
+
+    def testCourierChanged(self):
+        """
+        Tests courier update invalidates cache
+        """
+        self.add_order(1, 3)
+        assign(1)
+        Courier.objects.get(courier_id=1).update(
+            CourierPatchDataModel(regions=[3])
+        )
+        self.assertIsNotNone(assign(1))
+
+    def testCourierCounterBumpedAfterUpdate(self):
+        """
+        Tests courier counter is bumped only after courier update is
+        written, so assign can not cache old data under the new counter
+        """
+        bump = assign_cache._bump
+        seen = []
+
+        def check_courier(key):
+            if key == "orders:courier-generation:1":
+                courier = Courier.objects.get(courier_id=1)
+                seen.append((
+                    courier.courier_type,
+                    list(courier.regions.values_list("region_id", flat=True))
+                ))
+            bump(key)
+
+        with patch("orders.assign_cache._bump", side_effect=check_courier):
+            response = Client().patch(
+                "/couriers/1",
+                content_type="application/json",
+                data={"courier_type": "car", "regions": [3]}
+            )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(seen, [("car", [3])])
+
+    def testBatchAssign(self):
+        """
+        Tests batch assign invalidates cache of its couriers
+        """
+        assign(1)
+        # order is added bypassing managers, so region is not invalidated
+        self.add_order(1, 3)
+        Order.objects.filter(order_id=1).update(region_id=1)
+        self.assertIsNone(assign(1))
+        assign_batch([1])
+        self.assertIsNotNone(assign(1))
+
+    def testCounterEvicted(self):
+        """
+        Tests entry stops working when a region counter is evicted
+        """
+        assign(1)
+        self.assertTrue(nothing_to_assign(1))
+        cache.delete("orders:region-generation:2")
+        self.assertFalse(nothing_to_assign(1))
+        self.add_order(1, 2)
+        self.assertIsNotNone(assign(1))
+
+    @override_settings(SHARED_CACHE=False)
+    def testDisabledWithoutSharedCache(self):
+        """
+        Tests cache is not used without shared django cache
+        """
+        assign(1)
+        self.assertIsNone(cache.get("orders:nothing-to-assign:1"))
+
+    @override_settings(ASSIGN_NEGATIVE_CACHE_TIMEOUT=0)
+    def testDisabled(self):
+        """
+        Tests cache is not used if timeout is 0
+        """
+        assign(1)
+        self.assertIsNone(cache.get("orders:nothing-to-assign:1"))
+
+
+@override_settings(SHARED_CACHE=True)
+class TestAssignResponseCache(TransactionTestCase):
+    """
+    Tests assign response of courier with active delievery is cached
+    until delievery or courier changes
+    """
+
+    def setUp(self):
+        cache.clear()
+        clear_identity_caches()
+        Courier.objects.create_courier(CourierDataModel(**{
+            "courier_id": 1,
+            "courier_type": "foot",
+            "regions": [1],
+            "working_hours": ["10:00-18:00"]
+        }))
+        Order.objects.create_from_list([
+            {
+                "order_id": order_id,
+                "weight": 1,
+                "region": 1,
+                "delivery_hours": ["12:00-13:00"]
+            } for order_id in (1, 2)
+        ])
+
+    def tearDown(self):
+        cache.clear()
+        clear_identity_caches()
+
+    @staticmethod
+    def post_assign():
+        return Client().post(
+            path="/orders/assign",
+            content_type="application/json",
+            data={"courier_id": 1}
+        ).json()
+
+    def testRepeatedAssign(self):
+        """
+        Tests repeated assign is answered without database queries
+        """
+        first = self.post_assign()
+        with self.assertNumQueries(0):
+            self.assertEqual(self.post_assign(), first)
+
+    def testCompleteOrder(self):
+        """
+        Tests completed order disappears from cached response
+        """
+        first = self.post_assign()
+        complete_order(
+            courier_id=1,
+            order_id=1,
+            complete_time=format_time(timezone.now() + timedelta(minutes=30))
+        )
+        self.assertEqual(self.post_assign()["orders"], [{"id": 2}])
+        self.assertEqual(self.post_assign()["assign_time"], first["assign_time"])
+
+    def testCourierChanged(self):
+        """
+        Tests courier update resets cached response
+        """
+        self.post_assign()
+        Courier.objects.get(courier_id=1).update(
+            CourierPatchDataModel(regions=[2])
+        )
+        self.assertEqual(self.post_assign(), {"orders": []})
+
+    def testCourierCounterBumpedAfterRelease(self):
+        """
+        Tests courier counter is bumped only after released orders are
+        written, so a cached response can not list orders already freed
+        """
+        self.post_assign()
+        bump = assign_cache._bump
+        assigned = []
+
+        def check_orders(key):
+            if key == "orders:courier-generation:1":
+                assigned.append(list(
+                    Order.objects.filter(
+                        delievery__isnull=False
+                    ).values_list("order_id", flat=True)
+                ))
+            bump(key)
+
+        with patch("orders.assign_cache._bump", side_effect=check_orders):
+            Client().patch(
+                "/couriers/1",
+                content_type="application/json",
+                data={"regions": [2]}
+            )
+        self.assertEqual(assigned, [[]])
+        self.assertEqual(self.post_assign(), {"orders": []})
+
+    def testCounterEvicted(self):
+        """
+        Tests cached response is not used when courier counter is evicted
+        """
+        self.post_assign()
+        complete_order(
+            courier_id=1,
+            order_id=1,
+            complete_time=format_time(timezone.now() + timedelta(minutes=30))
+        )
+        cache.delete("orders:courier-generation:1")
+        self.assertEqual(self.post_assign()["orders"], [{"id": 2}])
+
+    @override_settings(SHARED_CACHE=False)
+    def testDisabledWithoutSharedCache(self):
+        """
+        Tests response is not cached without shared django cache
+        """
+        self.post_assign()
+        self.assertIsNone(cache.get("orders:assign-response:1"))
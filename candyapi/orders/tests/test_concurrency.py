@@ -0,0 +1,233 @@
+import threading
+from datetime import timedelta
+from time import sleep
+from unittest import mock, skipUnless
+
+from django.core.cache import cache
+from django.db import connection, connections, transaction, OperationalError
+from django.test import TestCase, TransactionTestCase
+
+from couriers.models import Courier
+from couriers.validators import CourierDataModel
+from orders.logic import assign, claim_orders, complete_order, CLAIM_ATTEMPTS
+from orders.models import Delievery, Order
+from utils.cache import clear_identity_caches
+from candyapi.utils import format_time
+
+
+def create_couriers(count: int, courier_type: str = "foot"):
+    for courier_id in range(1, count + 1):
+        Courier.objects.create_courier(CourierDataModel(**{
+            "courier_id": courier_id,
+            "courier_type": courier_type,
+            "regions": [1],
+            "working_hours": ["10:00-18:00"]
+        }))
+
+
+def create_orders(count: int, weight: float):
+    Order.objects.create_from_list([
+        {
+            "order_id": order_id,
+            "weight": weight,
+            "region": 1,
+            "delivery_hours": ["12:00-13:00"]
+        } for order_id in range(1, count + 1)
+    ])
+
+
+class TestClaimOrders(TestCase):
+    """
+    Tests orders are reselected if part of them was claimed by others
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        create_couriers(1)
+        create_orders(4, 5)
+
+    def testReselectWithoutTakenOrders(self):
+        """
+        Tests orders taken by concurrent assignment are replaced by others
+        """
+        courier = Courier.objects.get(courier_id=1)
+        claim = Order.objects.claim
+        calls = []
+
+        def lose_first_order(order_ids):
+            calls.append(list(order_ids))
+            claimed = claim(order_ids)
+            return claimed[1:] if len(calls) == 1 else claimed
+
+        with mock.patch.object(Order.objects, "claim", side_effect=lose_first_order):
+            claimed = claim_orders(courier)
+        self.assertEqual(calls, [[1, 2], [2, 3]])
+        self.assertEqual(claimed, [2, 3])
+
+    def testAttemptsAreLimited(self):
+        """
+        Tests claimed part is used when every attempt loses orders
+        """
+        courier = Courier.objects.get(courier_id=1)
+        with mock.patch.object(
+                Order.objects,
+                "claim",
+                side_effect=lambda order_ids: list(order_ids)[1:]
+        ) as claim_mock:
+            claimed = claim_orders(courier)
+        self.assertEqual(claim_mock.call_count, CLAIM_ATTEMPTS)
+        self.assertEqual(len(claimed), 1)
+
+
+class TestLostRace(TestCase):
+    """
+    Tests assignment detects orders taken between claim and attach
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        create_couriers(1)
+        create_orders(4, 5)
+
+    def testRetryAfterLostRace(self):
+        """
+        Tests delievery is created again if some orders were not attached
+        """
+        claim = Order.objects.claim
+        calls = []
+
+        def lose_race(order_ids):
+            calls.append(list(order_ids))
+            claimed = claim(order_ids)
+            if len(calls) == 1:
+                # concurrent assignment takes first order before attach
+                Order.objects.filter(order_id=claimed[0]).update(delievered=True)
+            return claimed
+
+        with mock.patch.object(Order.objects, "claim", side_effect=lose_race):
+            delievery = assign(1)
+        self.assertEqual(calls, [[1, 2], [2, 3]])
+        self.assertEqual(Delievery.objects.count(), 1)
+        self.assertEqual(
+            [order.order_id for order in delievery.orders.order_by("order_id")],
+            [2, 3]
+        )
+
+
+class TestConcurrentAssign(TransactionTestCase):
+    """
+    Stress test of concurrent assignment: every order fills a courier
+    completely, so an order assigned twice would leave an empty delievery
+    """
+    COURIERS = 8
+    ORDERS = 5
+
+    def setUp(self):
+        cache.clear()
+        clear_identity_caches()
+        create_couriers(self.COURIERS)
+        create_orders(self.ORDERS, 10)
+
+    def tearDown(self):
+        cache.clear()
+        clear_identity_caches()
+
+    def assign_all(self, threads: int) -> None:
+        courier_ids = list(range(1, self.COURIERS + 1))
+        errors = []
+
+        def worker():
+            try:
+                while True:
+                    try:
+                        courier_id = courier_ids.pop()
+                    except IndexError:
+                        return
+                    while True:
+                        try:
+                            assign(courier_id)
+                            break
+                        except OperationalError:
+                            # sqlite locks whole database for writes
+                            sleep(0.01)
+            except Exception as e:
+                errors.append(e)
+            finally:
+                connections.close_all()
+
+        workers = [threading.Thread(target=worker) for _ in range(threads)]
+        for thread in workers:
+            thread.start()
+        for thread in workers:
+            thread.join()
+        self.assertEqual(errors, [])
+
+    def testNoDoubleAssign(self):
+        """
+        Tests every order is assigned once under concurrent assignment
+        """
+        self.assign_all(threads=4)
+        deliveries = list(Delievery.objects.all())
+        self.assertEqual(len(deliveries), self.ORDERS)
+        for delievery in deliveries:
+            self.assertEqual(delievery.orders.count(), 1)
+        self.assertEqual(
+            len({delievery.courier_id for delievery in deliveries}),
+            self.ORDERS
+        )
+
+
+@skipUnless(connection.vendor == "postgresql", "requires row locks")
+class TestCompletionLockOrder(TransactionTestCase):
+    """
+    Tests completion of the last order does not deadlock with an assign
+    that holds the courier row and then writes the delievery row (top up)
+    """
+
+    def setUp(self):
+        create_couriers(1)
+        create_orders(1, 5)
+
+    def testCompleteDuringAssign(self):
+        delievery = assign(1)
+        locked = threading.Event()
+        errors = []
+
+        def assigner():
+            # the same lock order as _assign with top up
+            try:
+                with transaction.atomic():
+                    Courier.objects.select_for_update().get(courier_id=1)
+                    locked.set()
+                    # let completion reach its locks
+                    sleep(0.5)
+                    Delievery.objects.filter(id=delievery.id).update(free_weight=None)
+            except Exception as e:
+                errors.append(e)
+            finally:
+                connections.close_all()
+
+        def completer():
+            try:
+                locked.wait(5)
+                complete_order(
+                    courier_id=1,
+                    order_id=1,
+                    complete_time=format_time(
+                        delievery.assigned_time + timedelta(minutes=10)
+                    )
+                )
+            except Exception as e:
+                errors.append(e)
+            finally:
+                connections.close_all()
+
+        workers = [threading.Thread(target=assigner), threading.Thread(target=completer)]
+        for thread in workers:
+            thread.start()
+        for thread in workers:
+            thread.join()
+        self.assertEqual(errors, [])
+        delievery.refresh_from_db()
+        self.assertTrue(delievery.completed)
+        self.assertEqual(Courier.objects.get(courier_id=1).earnings, 1000)
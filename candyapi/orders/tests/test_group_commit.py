@@ -0,0 +1,119 @@
+from datetime import timedelta
+from unittest import mock
+
+from django.core.cache import cache
+from django.core.exceptions import ObjectDoesNotExist
+from django.db import OperationalError
+from django.test import TransactionTestCase, Client, override_settings
+
+from candyapi.utils import format_time
+from couriers.models import Courier
+from couriers.validators import CourierDataModel
+from orders import group_commit, logic
+from orders.group_commit import CompletionBuffer
+from orders.logic import assign
+from orders.models import Order
+from orders.validators import CompletionDataModel
+from utils.cache import clear_identity_caches
+
+
+class TestGroupCommit(TransactionTestCase):
+    """
+    Tests completions collected in a window are applied in one transaction
+    """
+
+    def setUp(self):
+        cache.clear()
+        clear_identity_caches()
+        Courier.objects.create_courier(CourierDataModel(**{
+            "courier_id": 1,
+            "courier_type": "foot",
+            "regions": [1],
+            "working_hours": ["10:00-18:00"]
+        }))
+        Order.objects.create_from_list([
+            {
+                "order_id": order_id,
+                "weight": 1,
+                "region": 1,
+                "delivery_hours": ["12:00-13:00"]
+            } for order_id in (1, 2, 3)
+        ])
+        self.start = assign(1).assigned_time
+
+    def tearDown(self):
+        group_commit._buffer = None
+        cache.clear()
+        clear_identity_caches()
+
+    def completion(self, order_id, minutes):
+        return CompletionDataModel(
+            courier_id=1,
+            order_id=order_id,
+            complete_time=format_time(self.start + timedelta(minutes=minutes))
+        )
+
+    def testResultPerCompletion(self):
+        """
+        Tests every waiter gets its own result from one batch
+        """
+        buffer = CompletionBuffer(window=0.2, max_size=3)
+        with mock.patch.object(
+                logic,
+                "complete_orders",
+                side_effect=logic.complete_orders
+        ) as complete_mock:
+            futures = [
+                buffer.submit(self.completion(2, 20)),
+                buffer.submit(self.completion(100500, 30)),
+                buffer.submit(self.completion(1, 10)),
+            ]
+            results = [future.result(timeout=5) for future in futures]
+        self.assertEqual(complete_mock.call_count, 1)
+        self.assertIsNone(results[0])
+        self.assertIsInstance(results[1], ObjectDoesNotExist)
+        self.assertIsNone(results[2])
+        self.assertEqual(
+            set(Order.objects.filter(delievered=True).values_list("order_id", flat=True)),
+            {1, 2}
+        )
+
+    def testBatchErrorReachesEveryWaiter(self):
+        """
+        Tests failed transaction is reported to every waiting request
+        """
+        buffer = CompletionBuffer(window=0.2, max_size=2)
+        with mock.patch.object(
+                logic,
+                "complete_orders",
+                side_effect=OperationalError("database is locked")
+        ):
+            futures = [
+                buffer.submit(self.completion(1, 10)),
+                buffer.submit(self.completion(2, 20)),
+            ]
+            for future in futures:
+                with self.assertRaises(OperationalError):
+                    future.result(timeout=5)
+        self.assertFalse(Order.objects.filter(delievered=True).exists())
+
+    @override_settings(ORDERS_GROUP_COMMIT_WINDOW=1)
+    def testCompletionView(self):
+        """
+        Tests POST /orders/complete answers after group commit
+        """
+        response = Client().post(
+            path="/orders/complete",
+            content_type="application/json",
+            data=self.completion(1, 10).dict()
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json(), {"order_id": 1})
+        self.assertTrue(Order.objects.get(order_id=1).delievered)
+        response = Client().post(
+            path="/orders/complete",
+            content_type="application/json",
+            data=self.completion(2, 5).dict()
+        )
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(Order.objects.get(order_id=2).delievered)
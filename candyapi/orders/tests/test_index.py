@@ -0,0 +1,248 @@
+import json
+from unittest.mock import patch
+
+from django.conf import settings
+from django.db import connection
+from django.test import (SimpleTestCase,
+                         TestCase,
+                         TransactionTestCase,
+                         override_settings)
+
+from couriers.models import Courier
+from couriers.validators import CourierDataModel, CourierPatchDataModel
+from orders import index
+from orders.index import (AssignmentIndex,
+                          IndexedOrder,
+                          assignment_index,
+                          find_candidates,
+                          load_free_orders)
+from orders.logic import assign
+from orders.models import Delievery, Order, RegionIndexGeneration
+
+
+class TestAssignmentIndex(SimpleTestCase):
+
+    def setUp(self):
+        self.index = AssignmentIndex()
+        self.index.add([
+            IndexedOrder(1, 1, 5, ((36000, 39600),)),
+            IndexedOrder(2, 1, 15, ((36000, 39600),)),
+            IndexedOrder(3, 2, 5, ((36000, 39600),)),
+            IndexedOrder(4, 1, 5, ((50400, 54000), (72000, 75600))),
+            IndexedOrder(5, 1, 5, ((39600, 43200),)),
+        ])
+
+    def testFind(self):
+        """
+        Tests orders are found by region, weight and intersecting intervals
+        """
+        found = self.index.find([1], [(37800, 51000)], 10)
+        self.assertEqual(set(found), {1, 4, 5})
+
+    def testIntervalsMustIntersect(self):
+        """
+        Tests intervals which only touch each other do not match
+        """
+        found = self.index.find([1], [(32400, 36000)], 10)
+        self.assertEqual(found, [])
+
+    def testRemove(self):
+        self.index.remove([1, 4])
+        self.assertEqual(set(self.index.find([1, 2], [(0, 86400)], 50)), {2, 3, 5})
+        self.assertEqual(len(self.index), 3)
+
+
+@override_settings(ORDERS_ASSIGNMENT_INDEX=True)
+class TestAssignWithIndex(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        courier = Courier.objects.create_courier(
+            data=CourierDataModel(**{
+                "courier_id": 42,
+                "courier_type": "foot",
+                "regions": [1, 12, 22],
+                "working_hours": ["11:00-14:00", "05:00-09:00"]
+            }),
+        )
+        cls.courier_id = courier.courier_id
+
+    def setUp(self):
+        # forces index rebuild from test database
+        assignment_index.reset()
+        test_orders_files_path = settings.BASE_DIR / "orders" / "tests" / "test_orders.json"
+        with open(test_orders_files_path, "r") as f:
+            Order.objects.create_from_list(json.load(f)["orders"])
+
+    def testSimpleAssign(self):
+        """
+        Tests index selects the same orders as database query
+        """
+        delievery = assign(self.courier_id)
+        self.assertEqual(
+            {order.order_id for order in delievery.orders.all()},
+            {7, 3, 6}
+        )
+
+    def testCandidatesFromIndex(self):
+        """
+        Tests only orders found by index are assigned
+        """
+        with patch("orders.logic.find_candidates", return_value=[3, 100500]):
+            delievery = assign(self.courier_id)
+        self.assertEqual(
+            [order.order_id for order in delievery.orders.all()],
+            [3]
+        )
+
+    def testReleasedOrdersAssignedAgain(self):
+        """
+        Tests orders released by courier update get back to index
+        """
+        assign(self.courier_id)
+        courier = Courier.objects.get(courier_id=self.courier_id)
+        courier.update(CourierPatchDataModel(**{"regions": [100]}))
+        other = Courier.objects.create_courier(
+            data=CourierDataModel(**{
+                "courier_id": 43,
+                "courier_type": "foot",
+                "regions": [1, 12, 22],
+                "working_hours": ["11:00-14:00", "05:00-09:00"]
+            }),
+        )
+        delievery = assign(other.courier_id)
+        self.assertEqual(
+            {order.order_id for order in delievery.orders.all()},
+            {7, 3, 6}
+        )
+
+    def testNothingFoundByIndex(self):
+        """
+        Tests database is not scanned when index finds no candidates
+        """
+        with patch("orders.logic.find_candidates", return_value=[]), \
+                patch("orders.logic.fetch_candidates") as fetch_mock:
+            self.assertIsNone(assign(self.courier_id))
+        fetch_mock.assert_not_called()
+
+    def testForeignRelease(self):
+        """
+        Tests orders released in another process reload only their region
+        """
+        find_candidates([1], [(0, 86400)], 50)
+        Order.objects.create_from_list([{
+            "order_id": 100,
+            "weight": 1,
+            "region": 1,
+            "delivery_hours": ["12:00-13:00"]
+        }])
+        # another process: order is in database, but not in local index
+        assignment_index.remove([100])
+        with patch("orders.index.load_free_orders", wraps=load_free_orders) as load_mock:
+            self.assertIn(100, find_candidates([1, 12], [(0, 86400)], 50))
+        load_mock.assert_called_once_with(region_ids=[1])
+
+    def testLocalReleaseKeepsIndex(self):
+        """
+        Tests orders released in this process do not reload index
+        """
+        find_candidates([12], [(0, 86400)], 50)
+        with patch("django.db.transaction.on_commit", side_effect=lambda func: func()):
+            Order.objects.create_from_list([{
+                "order_id": 100,
+                "weight": 1,
+                "region": 12,
+                "delivery_hours": ["12:00-13:00"]
+            }])
+        with patch("orders.index.load_free_orders") as load_mock:
+            self.assertIn(100, find_candidates([12], [(0, 86400)], 50))
+        load_mock.assert_not_called()
+
+    def testReloadBeforeCommit(self):
+        """
+        Tests orders released by a transaction stay in index when another
+        thread reloads their region before the transaction commits
+        """
+        find_candidates([12], [(0, 86400)], 50)
+        generations = index._region_generations([12])
+        callbacks = []
+        with patch("django.db.transaction.on_commit", side_effect=callbacks.append):
+            Order.objects.create_from_list([{
+                "order_id": 100,
+                "weight": 1,
+                "region": 12,
+                "delivery_hours": ["12:00-13:00"]
+            }])
+        # another thread does not see uncommitted order in database
+        uncommitted = [order for order in load_free_orders(region_ids=[12])
+                       if order.order_id != 100]
+        with patch("orders.index.load_free_orders", return_value=uncommitted):
+            assignment_index.reload_regions([12], generations)
+        self.assertNotIn(100, assignment_index.find([12], [(0, 86400)], 50))
+        for callback in callbacks:
+            callback()
+        with patch("orders.index.load_free_orders") as load_mock:
+            self.assertIn(100, find_candidates([12], [(0, 86400)], 50))
+        load_mock.assert_not_called()
+
+
+@override_settings(ORDERS_ASSIGNMENT_INDEX=True)
+class TestPatchWithIndex(TransactionTestCase):
+    """
+    Tests courier update outside of test transaction releases orders
+    """
+
+    def setUp(self):
+        assignment_index.reset()
+        Courier.objects.create_courier(CourierDataModel(**{
+            "courier_id": 1,
+            "courier_type": "car",
+            "regions": [1],
+            "working_hours": ["10:00-18:00"]
+        }))
+
+    def tearDown(self):
+        assignment_index.reset()
+
+    def create_order(self, order_id: int, weight: float):
+        Order.objects.create_from_list([{
+            "order_id": order_id,
+            "weight": weight,
+            "region": 1,
+            "delivery_hours": ["12:00-13:00"]
+        }])
+
+    def testPatchReleasesOrders(self):
+        """
+        Tests region counter is bumped in the update transaction, empty
+        delievery is deleted and courier gets suitable orders again
+        """
+        self.create_order(1, 40)
+        first = assign(1)
+        generation = RegionIndexGeneration.objects.get(region_id=1).generation
+        in_transaction = []
+
+        def bump(region_ids):
+            in_transaction.append(connection.in_atomic_block)
+            return bump_generations(region_ids)
+
+        bump_generations = index._bump_generations
+        with patch("orders.index._bump_generations", side_effect=bump):
+            response = self.client.patch(
+                "/couriers/1",
+                data=json.dumps({"courier_type": "foot"}),
+                content_type="application/json"
+            )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(in_transaction, [True])
+        self.assertGreater(
+            RegionIndexGeneration.objects.get(region_id=1).generation,
+            generation
+        )
+        self.assertFalse(Delievery.objects.filter(id=first.id).exists())
+        self.create_order(2, 5)
+        delievery = assign(1)
+        self.assertEqual(
+            [order.order_id for order in delievery.orders.all()],
+            [2]
+        )
@@ -1,17 +1,23 @@
 import json
 from datetime import timedelta
-from django.test import TestCase
+from unittest import mock
+from django.db import connection
+from django.test import TestCase, override_settings
 from django.conf import settings
 from django.utils import timezone
 from django.core.exceptions import ObjectDoesNotExist
 
 from couriers.models import Courier, Region, Interval
-from couriers.validators import CourierDataModel
-from orders.models import Order
+from couriers.validators import CourierDataModel, CourierPatchDataModel
+from orders.models import Order, Delievery
 from orders.validators import OrderDataModel
 from orders.logic import (assign,
+                          assign_batch,
                           complete_order,
+                          import_orders_stream,
                           CompleteTimeError)
+from orders.validators import InvalidOrdersInData
+from orders.utils import fetch_candidates, fill_weight, cut_candidates, Candidate
 from candyapi.utils import format_time
 
 
@@ -62,6 +68,20 @@ class TestLogic(TestCase):
             {7, 3, 6}
         )
 
+    @override_settings(ORDERS_PACKING_STRATEGY="knapsack")
+    def testKnapsackAssign(self):
+        """
+        Tests assigning with knapsack packing does not overload courier
+        and loads him not less than greedy packing
+        """
+        greedy_weight = sum(
+            order.weight for order in Order.objects.filter(order_id__in=[7, 3, 6])
+        )
+        delievery = assign(self.courier_id)
+        weight = sum(order.weight for order in delievery.orders.all())
+        self.assertLessEqual(weight, Courier.WEIGHT_MAP["foot"])
+        self.assertGreaterEqual(weight, greedy_weight)
+
     def testNoSuitableOrders(self):
         """
         Tests no delevery is created when no suitable orders for courier found
@@ -99,6 +119,29 @@ class TestLogic(TestCase):
             format_time(complete_time)
         )
 
+    def testCompleteOrderQueries(self):
+        """
+        Tests completion takes fixed number of queries
+        """
+        delievery = assign(self.courier_id)
+        order_id = delievery.orders.first().order_id
+        # savepoint and release, locking selects of courier and
+        # delievery, and writes (without postgres the region stats row
+        # is created by a second query)
+        expected = 5 if connection.vendor == "postgresql" else 9
+        with self.assertNumQueries(expected):
+            order = complete_order(
+                order_id=order_id,
+                courier_id=self.courier_id,
+                complete_time=format_time(delievery.assigned_time + timedelta(minutes=30))
+            )
+        stored = Order.objects.get(order_id=order_id)
+        self.assertEqual(
+            (order.weight, order.region_id, order.completion_time, order.delievery_id),
+            (stored.weight, stored.region_id, stored.completion_time, stored.delievery_id)
+        )
+        self.assertAlmostEqual(order.completion_time, 30 * 60, delta=1)
+
     def testCompleteAllOrders(self):
         """
         Tests delievery is completed after all orders is completed
@@ -230,5 +273,284 @@ class TestLogic(TestCase):
             )
 
 
+class TestAssignBatch(TestCase):
+    """
+    Tests assigning orders to several couriers at once
+    """
 
+    @classmethod
+    def setUpTestData(cls):
+        for courier_id, courier_type, regions in (
+                (42, "foot", [12]),
+                (43, "car", [12]),
+                (44, "foot", [100500])
+        ):
+            Courier.objects.create_courier(CourierDataModel(**{
+                "courier_id": courier_id,
+                "courier_type": courier_type,
+                "regions": regions,
+                "working_hours": ["11:00-14:00"]
+            }))
+        test_orders_files_path = settings.BASE_DIR / "orders" / "tests" / "test_orders.json"
+        with open(test_orders_files_path, "r") as f:
+            Order.objects.create_from_list(json.load(f)["orders"])
+
+    def testBatchAssign(self):
+        """
+        Tests orders are distributed between couriers without overlaps
+        """
+        delieveries = assign_batch([42, 43, 44])
+        self.assertIsNone(delieveries[44])
+        assigned = {
+            courier_id: {order.order_id for order in delievery.orders.all()}
+            for courier_id, delievery in delieveries.items() if delievery
+        }
+        # car is matched first and takes the heavy order
+        self.assertIn(4, assigned[43])
+        self.assertFalse(assigned[43] & assigned.get(42, set()))
+        for courier_id, order_ids in assigned.items():
+            courier = Courier.objects.get(courier_id=courier_id)
+            self.assertLessEqual(
+                sum(Order.objects.get(order_id=order_id).weight for order_id in order_ids),
+                Courier.WEIGHT_MAP[courier.courier_type]
+            )
+            self.assertEqual(delieveries[courier_id].courier_id, courier_id)
+
+    def testActiveDelieveryReturned(self):
+        """
+        Tests active delievery is returned and its orders are not reassigned
+        """
+        delievery = assign(42)
+        delieveries = assign_batch([43, 42])
+        self.assertEqual(delieveries[42].id, delievery.id)
+        self.assertFalse(
+            {order.order_id for order in delievery.orders.all()}
+            & {order.order_id for order in delieveries[43].orders.all()}
+        )
+
+    def testMissingCourier(self):
+        """
+        Tests nothing is assigned if one of couriers does not exist
+        """
+        with self.assertRaises(ObjectDoesNotExist):
+            assign_batch([42, 100500])
+        self.assertFalse(Order.objects.filter(delievery__isnull=False).exists())
+
+
+class TestCandidates(TestCase):
+    """
+    Tests single query candidates selection with running weight cutoff
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        weights = [10, 9, 8, 6, 4, 3, 2, 1.5, 1]
+        Order.objects.create_from_list([
+            {
+                "order_id": order_id,
+                "weight": weight,
+                "region": 1,
+                "delivery_hours": ["10:00-12:00", "11:00-13:00"]
+            } for order_id, weight in enumerate(weights, start=1)
+        ])
+
+    def suitable(self):
+        # both intervals of every order overlap with this condition
+        return Order.objects.filter(
+            intervals__start__lt=13 * 3600,
+            intervals__end__gt=10 * 3600
+        )
+
+    def testNoDuplicates(self):
+        """
+        Tests orders matching several intervals are selected once
+        """
+        candidates = fetch_candidates(self.suitable(), 100, cutoff=False)
+        self.assertEqual(
+            [candidate.order_id for candidate in candidates],
+            list(range(1, 10))
+        )
+
+    def testCutoff(self):
+        """
+        Tests candidates which can not fit are dropped and greedy
+        selection result does not change
+        """
+        candidates = fetch_candidates(self.suitable(), 20)
+        # 10 + 9 taken, 1 kg left
+        self.assertEqual(
+            [candidate.order_id for candidate in candidates],
+            [1, 2, 9]
+        )
+        self.assertEqual(
+            fill_weight(candidates, 20),
+            fill_weight(fetch_candidates(self.suitable(), 20, cutoff=False), 20)
+        )
 
+    def testFallbackWithoutWindowFunctions(self):
+        """
+        Tests cutoff is done in python if database does not support
+        window functions
+        """
+        expected = fetch_candidates(self.suitable(), 25)
+        with mock.patch.object(connection.features, "supports_over_clause", False):
+            self.assertEqual(fetch_candidates(self.suitable(), 25), expected)
+
+    def testCutCandidates(self):
+        """
+        Tests cut_candidates keeps everything greedy selection can take
+        """
+        candidates = [Candidate(1, 5), Candidate(2, 4), Candidate(3, 3), Candidate(4, 1)]
+        for max_weight in range(0, 15):
+            self.assertEqual(
+                fill_weight(cut_candidates(candidates, max_weight), max_weight),
+                fill_weight(candidates, max_weight)
+            )
+
+
+class TestImportStream(TestCase):
+    """
+    Tests streaming import of orders in NDJSON format
+    """
+
+    @staticmethod
+    def order_lines(count: int):
+        for order_id in range(1, count + 1):
+            yield json.dumps({
+                "order_id": order_id,
+                "weight": 1.5,
+                "region": order_id % 3 + 1,
+                "delivery_hours": ["10:00-12:00"]
+            }).encode() + b"\n"
+
+    @override_settings(IMPORT_BATCH_SIZE=4)
+    def testImport(self):
+        """
+        Tests orders are saved in batches from stream
+        """
+        created = import_orders_stream(self.order_lines(10))
+        self.assertEqual(created, list(range(1, 11)))
+        self.assertEqual(Order.objects.count(), 10)
+
+    def testImportWithErrors(self):
+        """
+        Tests nothing is saved if stream contains invalid orders
+        """
+        lines = list(self.order_lines(3))
+        lines.insert(1, b'{"order_id": 42, "weight": 100}\n')
+        with self.assertRaises(InvalidOrdersInData) as context:
+            import_orders_stream(lines)
+        self.assertEqual(
+            [error["id"] for error in context.exception.invaid_orders],
+            [42]
+        )
+        self.assertEqual(Order.objects.count(), 0)
+
+
+@override_settings(ORDERS_TOP_UP=True)
+class TestTopUp(TestCase):
+    """
+    Tests active delievery is topped up after orders are completed
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        Courier.objects.create_courier(CourierDataModel(**{
+            "courier_id": 1,
+            "courier_type": "foot",
+            "regions": [1],
+            "working_hours": ["10:00-18:00"]
+        }))
+        Order.objects.create_from_list([
+            {
+                "order_id": order_id,
+                "weight": weight,
+                "region": 1,
+                "delivery_hours": ["12:00-13:00"]
+            } for order_id, weight in ((1, 6), (2, 4), (3, 5), (4, 1.5))
+        ])
+
+    def complete(self, order_id: int, delievery):
+        delievery.refresh_from_db()
+        complete_order(
+            courier_id=1,
+            order_id=order_id,
+            complete_time=format_time(delievery.last_delievery_time + timedelta(minutes=10))
+        )
+        delievery.refresh_from_db()
+
+    def testTopUp(self):
+        """
+        Tests freed capacity is filled on next assign in the same delievery
+        """
+        delievery = assign(1)
+        self.assertEqual({order.order_id for order in delievery.orders.all()}, {1, 2})
+        self.complete(1, delievery)
+        self.assertEqual(delievery.free_weight, 6)
+        topped_up = assign(1)
+        self.assertEqual(topped_up.id, delievery.id)
+        self.assertEqual(
+            {order.order_id for order in topped_up.orders.filter(delievered=False)},
+            {2, 3}
+        )
+        self.assertIsNone(topped_up.free_weight)
+        # capacity is recorded again only after next completion
+        self.complete(2, delievery)
+        self.assertEqual(delievery.free_weight, 5)
+        assign(1)
+        self.assertEqual(
+            {order.order_id for order in delievery.orders.filter(delievered=False)},
+            {3, 4}
+        )
+
+    def testTopUpLimitedByCurrentCapacity(self):
+        """
+        Tests top up does not exceed capacity of changed courier type
+        """
+        Courier.objects.filter(courier_id=1).update(courier_type="car")
+        Order.objects.create_from_list([
+            {
+                "order_id": 5,
+                "weight": 40,
+                "region": 1,
+                "delivery_hours": ["12:00-13:00"]
+            }
+        ])
+        delievery = assign(1)
+        self.complete(5, delievery)
+        self.assertEqual(delievery.free_weight, 40)
+        Courier.objects.get(courier_id=1).update(
+            CourierPatchDataModel(courier_type="foot")
+        )
+        assign(1)
+        undelievered = delievery.orders.filter(delievered=False)
+        self.assertLessEqual(sum(order.weight for order in undelievered), 10)
+        self.assertEqual({order.order_id for order in undelievered}, {1, 2})
+
+    def testEarningsUnchanged(self):
+        """
+        Tests topped up delievery is paid once
+        """
+        delievery = assign(1)
+        self.complete(1, delievery)
+        assign(1)
+        for order_id in (2, 3):
+            self.complete(order_id, delievery)
+        self.assertTrue(delievery.completed)
+        self.assertEqual(Delievery.objects.count(), 1)
+        courier = Courier.objects.get(courier_id=1)
+        self.assertEqual(courier.calculate_earnings(), 500 * 2)
+
+    @override_settings(ORDERS_TOP_UP=False)
+    def testTopUpDisabled(self):
+        """
+        Tests delievery is not changed when top up is disabled
+        """
+        delievery = assign(1)
+        self.complete(1, delievery)
+        self.assertIsNone(delievery.free_weight)
+        assign(1)
+        self.assertEqual(
+            {order.order_id for order in delievery.orders.filter(delievered=False)},
+            {2}
+        )
@@ -1,8 +1,12 @@
 from django.test import TestCase
-from django.db import IntegrityError
+from django.db import IntegrityError, connection
+from django.test.utils import CaptureQueriesContext
 
-from orders.models import Order
+from couriers.models import Courier
+from couriers.validators import CourierDataModel
+from orders.models import Order, Delievery
 from orders.validators import OrderDataModel, OrderListDataModel
+from utils.models import Interval
 
 
 # noinspection DuplicatedCode
@@ -86,3 +90,92 @@ class OrderModelTest(TestCase):
         with self.assertRaises(IntegrityError):
             Order.objects.create_from_list(OrderListDataModel(**order_data_2).data)
 
+
+    @staticmethod
+    def generate_orders(count: int, first_id: int = 1) -> list:
+        return [
+            {
+                "order_id": order_id,
+                "weight": 1 + order_id % 10,
+                "region": order_id % 4 + 1,
+                "delivery_hours": ["10:00-{}:00".format(11 + order_id % 3)]
+            } for order_id in range(first_id, first_id + count)
+        ]
+
+    def testCreateOrdersRelations(self):
+        """
+        Tests bulk created orders have regions and intervals set
+        """
+        Order.objects.create_from_list(self.generate_orders(12))
+        order = Order.objects.get(order_id=5)
+        self.assertEqual(order.region_id, 2)
+        self.assertEqual(
+            [str(interval) for interval in order.intervals.all()],
+            ["10:00-13:00"]
+        )
+        self.assertEqual(Interval.objects.count(), 3)
+
+    def testCreateOrdersQueriesCount(self):
+        """
+        Tests number of queries does not depend on number of orders in batch
+        """
+        with CaptureQueriesContext(connection) as small_import:
+            Order.objects.create_from_list(self.generate_orders(3))
+        Interval.objects.all().delete()
+        with CaptureQueriesContext(connection) as large_import:
+            Order.objects.create_from_list(self.generate_orders(100, 100))
+        self.assertEqual(
+            len(small_import.captured_queries),
+            len(large_import.captured_queries)
+        )
+
+
+class DelieveryModelTest(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.courier = Courier.objects.create_courier(CourierDataModel(**{
+            "courier_id": 1,
+            "courier_type": "car",
+            "regions": [1],
+            "working_hours": ["10:00-18:00"]
+        }))
+        Order.objects.create_from_list([
+            {
+                "order_id": order_id,
+                "weight": 1,
+                "region": 1,
+                "delivery_hours": ["12:00-13:00"]
+            } for order_id in range(1, 21)
+        ])
+
+    def testCreateDelievery(self):
+        """
+        Tests orders are attached with constant number of queries
+        """
+        with self.assertNumQueries(2):
+            delievery, attached = Delievery.objects.create_delievery(
+                order_ids=list(range(1, 21)),
+                courier=self.courier
+            )
+        self.assertEqual(attached, 20)
+        self.assertEqual(delievery.orders.count(), 20)
+
+    def testOrdersOfOtherDelieveryNotAttached(self):
+        """
+        Tests orders already assigned to another delievery are not taken
+        """
+        first, _ = Delievery.objects.create_delievery(
+            order_ids=[1, 2],
+            courier=self.courier
+        )
+        second, attached = Delievery.objects.create_delievery(
+            order_ids=[2, 3],
+            courier=self.courier
+        )
+        self.assertEqual(attached, 1)
+        self.assertEqual(
+            [order.order_id for order in first.orders.order_by("order_id")],
+            [1, 2]
+        )
+        self.assertEqual([order.order_id for order in second.orders.all()], [3])
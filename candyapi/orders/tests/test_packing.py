@@ -0,0 +1,73 @@
+from unittest import mock, skipIf
+
+from django.test import SimpleTestCase, override_settings
+
+from orders import packing
+from orders.packing import GreedyPacker, KnapsackPacker, get_packer
+from orders.utils import Candidate
+
+
+def candidates(*weights):
+    return [
+        Candidate(order_id, weight)
+        for order_id, weight in enumerate(sorted(weights, reverse=True), start=1)
+    ]
+
+
+class TestPacking(SimpleTestCase):
+    """
+    Tests packing strategies
+    """
+
+    @skipIf(packing.numpy is None, "numpy is not installed")
+    def testKnapsackFillsBetter(self):
+        """
+        Tests knapsack finds the best filling greedy misses
+        """
+        items = candidates(30, 25, 25, 0.01)
+        greedy = GreedyPacker().pack(items, 50)
+        knapsack = KnapsackPacker().pack(items, 50)
+        self.assertAlmostEqual(sum(item.weight for item in greedy), 30.01)
+        self.assertEqual(sorted(item.order_id for item in knapsack), [2, 3])
+
+    @skipIf(packing.numpy is None, "numpy is not installed")
+    def testKnapsackNeverOverloads(self):
+        """
+        Tests fixed point weights never exceed capacity
+        """
+        items = candidates(0.33, 0.33, 0.34, 4.01, 5.99, 3.3)
+        for max_weight in (1, 5, 10, 15):
+            chosen = KnapsackPacker().pack(items, max_weight)
+            self.assertLessEqual(sum(item.weight for item in chosen), max_weight + 1e-9)
+            self.assertGreaterEqual(
+                sum(item.weight for item in chosen),
+                sum(item.weight for item in GreedyPacker().pack(items, max_weight)) - 1e-9
+            )
+
+    def testKnapsackTakesAllIfFits(self):
+        """
+        Tests all candidates are taken without solving if they fit
+        """
+        items = candidates(1, 2, 3)
+        self.assertEqual(KnapsackPacker().pack(items, 10), items)
+
+    def testFallbackToGreedy(self):
+        """
+        Tests greedy is used without numpy or when time is out
+        """
+        items = candidates(30, 25, 25, 0.01)
+        greedy = GreedyPacker().pack(items, 50)
+        with mock.patch.object(packing, "numpy", None):
+            self.assertEqual(KnapsackPacker().pack(items, 50), greedy)
+        if packing.numpy is not None:
+            self.assertEqual(KnapsackPacker(time_budget=-1).pack(items, 50), greedy)
+
+    def testGetPacker(self):
+        """
+        Tests packing strategy is taken from settings
+        """
+        self.assertIsInstance(get_packer(), GreedyPacker)
+        with override_settings(ORDERS_PACKING_STRATEGY="knapsack"):
+            self.assertIsInstance(get_packer(), KnapsackPacker)
+        with override_settings(ORDERS_PACKING_STRATEGY="orders.packing.GreedyPacker"):
+            self.assertIsInstance(get_packer(), GreedyPacker)
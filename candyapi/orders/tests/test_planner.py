@@ -0,0 +1,139 @@
+from datetime import timedelta
+from unittest import mock
+
+from django.core.cache import cache
+from django.test import TransactionTestCase, override_settings
+
+from couriers.models import Courier
+from couriers.validators import CourierDataModel, CourierPatchDataModel
+from orders import logic
+from orders.logic import assign, complete_order
+from orders.models import Order
+from orders.planner import take_plan
+from utils.cache import clear_identity_caches
+from utils.models import Region
+from candyapi.utils import format_time
+
+
+def run_now(func, *args, **kwargs):
+    return func(*args, **kwargs)
+
+
+@override_settings(ORDERS_PLANNER=True)
+@mock.patch("orders.planner.submit", side_effect=run_now)
+class TestPlanner(TransactionTestCase):
+    """
+    Tests next delievery is planned in background when active delievery
+    is almost completed. TransactionTestCase is used because planning
+    starts after transaction commit
+    """
+
+    def setUp(self):
+        cache.clear()
+        clear_identity_caches()
+        for courier_id in (1, 2):
+            Courier.objects.create_courier(CourierDataModel(**{
+                "courier_id": courier_id,
+                "courier_type": "foot",
+                "regions": [1],
+                "working_hours": ["10:00-18:00"]
+            }))
+        Order.objects.create_from_list([
+            {
+                "order_id": order_id,
+                "weight": 5,
+                "region": 1,
+                "delivery_hours": ["12:00-13:00"]
+            } for order_id in range(1, 7)
+        ])
+        self.delievery = assign(1)
+
+    def tearDown(self):
+        cache.clear()
+        clear_identity_caches()
+
+    def complete_all(self):
+        for order in self.delievery.orders.order_by("order_id"):
+            self.delievery.refresh_from_db()
+            complete_order(
+                courier_id=1,
+                order_id=order.order_id,
+                complete_time=format_time(
+                    self.delievery.last_delievery_time + timedelta(minutes=10)
+                )
+            )
+
+    def testPlannedAssign(self, submit_mock):
+        """
+        Tests assign after completion uses plan without selecting orders
+        """
+        self.complete_all()
+        self.assertEqual(submit_mock.call_count, 2)
+        with mock.patch.object(logic, "select_orders") as select_mock:
+            delievery = assign(1)
+        select_mock.assert_not_called()
+        self.assertEqual(
+            {order.order_id for order in delievery.orders.all()},
+            {3, 4}
+        )
+
+    def testPlanResetByCourierUpdate(self, submit_mock):
+        """
+        Tests plan is not used after courier was changed
+        """
+        self.complete_all()
+        Courier.objects.get(courier_id=1).update(
+            CourierPatchDataModel(courier_type="bike")
+        )
+        self.assertIsNone(take_plan(1))
+        delievery = assign(1)
+        self.assertEqual(
+            {order.order_id for order in delievery.orders.all()},
+            {3, 4, 5}
+        )
+
+    def testPlannedOrdersTaken(self, submit_mock):
+        """
+        Tests orders are selected again if planned orders were taken
+        """
+        self.complete_all()
+        assign(2)
+        delievery = assign(1)
+        self.assertEqual(
+            {order.order_id for order in delievery.orders.all()},
+            {5, 6}
+        )
+
+    def testPlanRevalidated(self, submit_mock):
+        """
+        Tests planned orders are checked against current courier data
+        even if plan generation was not changed
+        """
+        self.complete_all()
+        # regions are changed bypassing Courier.update, plan stays valid
+        Courier.objects.get(courier_id=1).regions.set([Region.objects.create_region(2)])
+        with mock.patch.object(logic, "take_plan", return_value=[3, 4]):
+            self.assertIsNone(assign(1))
+        self.assertFalse(
+            Order.objects.filter(order_id__in=[3, 4], delievery__isnull=False).exists()
+        )
+
+    def testPlanOverweight(self, submit_mock):
+        """
+        Tests plan heavier than courier capacity is not used
+        """
+        self.complete_all()
+        with mock.patch.object(logic, "take_plan", return_value=[3, 4, 5]):
+            delievery = assign(1)
+        self.assertEqual(
+            {order.order_id for order in delievery.orders.all()},
+            {3, 4}
+        )
+
+    def testPlanWithoutGeneration(self, submit_mock):
+        """
+        Tests plan is not used when profile counter is evicted
+        """
+        self.complete_all()
+        cache.delete("orders:profile-generation:1")
+        self.assertIsNone(take_plan(1))
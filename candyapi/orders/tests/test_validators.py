@@ -92,6 +92,14 @@ class TestOrderListDataModel(SimpleTestCase):
         orders_data = OrderListDataModel(**self.TEST_DATA)
         self.assertEqual(len(orders_data.data), 3)
 
+    def testParsedOrders(self):
+        """
+        Tests validated order models are kept in list model
+        """
+        orders = OrderListDataModel(**self.TEST_DATA).orders
+        self.assertEqual([order.order_id for order in orders], [42, 45, 13])
+        self.assertIsInstance(orders[0], OrderDataModel)
+
     def testInvalidSchema(self):
         """
         Tests there is only data field
@@ -136,3 +144,15 @@ class TestCompletionDataModel(SimpleTestCase):
         self.assertEqual(data_model.courier_id, 2)
         self.assertEqual(data_model.order_id, 33)
         self.assertEqual(data_model.complete_time, "2021-01-10T10:33:01.42Z")
+
+    def testNonexistentDate(self):
+        """
+        Tests complete_time matching the format but not being a real date
+        is rejected
+        """
+        with self.assertRaises(ValidationError):
+            CompletionDataModel(**{
+                "courier_id": 2,
+                "order_id": 33,
+                "complete_time": "2021-02-30T10:00:00.00Z"
+            })
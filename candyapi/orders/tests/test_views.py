@@ -0,0 +1,158 @@
+from datetime import timedelta
+
+from django.test import TestCase, Client
+
+from couriers.models import Courier
+from couriers.validators import CourierDataModel
+from orders.models import Order
+from orders.logic import assign
+from candyapi.utils import format_time
+
+
+class TestAssignBatchView(TestCase):
+    """
+    Tests POST /orders/assign/batch
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        for courier_id, regions in ((1, [1]), (2, [2])):
+            Courier.objects.create_courier(CourierDataModel(**{
+                "courier_id": courier_id,
+                "courier_type": "foot",
+                "regions": regions,
+                "working_hours": ["10:00-18:00"]
+            }))
+        Order.objects.create_from_list([
+            {
+                "order_id": 1,
+                "weight": 2,
+                "region": 1,
+                "delivery_hours": ["12:00-13:00"]
+            }
+        ])
+
+    def post(self, data):
+        return Client().post(
+            path="/orders/assign/batch",
+            content_type="application/json",
+            data=data
+        )
+
+    def testAssignBatch(self):
+        """
+        Tests response contains assign result for every courier
+        """
+        response = self.post({"courier_ids": [1, 2]})
+        self.assertEqual(response.status_code, 200)
+        couriers = response.json()["couriers"]
+        self.assertEqual([courier["courier_id"] for courier in couriers], [1, 2])
+        self.assertEqual(couriers[0]["orders"], [{"id": 1}])
+        self.assertIn("assign_time", couriers[0])
+        self.assertEqual(couriers[1], {"courier_id": 2, "orders": []})
+
+    def testInvalidData(self):
+        """
+        Tests invalid courier_ids and unknown couriers are rejected
+        """
+        self.assertEqual(self.post({"courier_ids": ["1"]}).status_code, 400)
+        self.assertEqual(self.post({"courier_ids": [1, 1]}).status_code, 400)
+        self.assertEqual(self.post({"courier_ids": [1, 3]}).status_code, 400)
+        self.assertFalse(Order.objects.filter(delievery__isnull=False).exists())
+
+
+class TestCompletionBatchView(TestCase):
+    """
+    Tests POST /orders/complete/batch
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        Courier.objects.create_courier(CourierDataModel(**{
+            "courier_id": 1,
+            "courier_type": "foot",
+            "regions": [1],
+            "working_hours": ["10:00-18:00"]
+        }))
+        Order.objects.create_from_list([
+            {
+                "order_id": order_id,
+                "weight": 1,
+                "region": 1,
+                "delivery_hours": ["12:00-13:00"]
+            } for order_id in (1, 2, 3)
+        ])
+
+    def testCompleteBatch(self):
+        """
+        Tests completions are applied in time order with result per item
+        """
+        delievery = assign(1)
+        start = delievery.assigned_time
+        response = Client().post(
+            path="/orders/complete/batch",
+            content_type="application/json",
+            data={"data": [
+                {
+                    "courier_id": 1,
+                    "order_id": 2,
+                    "complete_time": format_time(start + timedelta(minutes=20))
+                },
+                {
+                    "courier_id": 1,
+                    "order_id": 1,
+                    "complete_time": format_time(start + timedelta(minutes=10))
+                },
+                {
+                    "courier_id": 1,
+                    "order_id": 100500,
+                    "complete_time": format_time(start + timedelta(minutes=30))
+                },
+                {
+                    "courier_id": 1,
+                    "order_id": 3,
+                    "complete_time": "yesterday"
+                },
+                {
+                    "courier_id": 1,
+                    "order_id": 3,
+                    "complete_time": "2021-02-30T10:00:00.00Z"
+                },
+            ]}
+        )
+        self.assertEqual(response.status_code, 200)
+        results = response.json()["results"]
+        self.assertEqual(results[0], {"order_id": 2})
+        self.assertEqual(results[1], {"order_id": 1})
+        self.assertEqual(results[2]["order_id"], 100500)
+        self.assertIn("error", results[2])
+        self.assertIn("complete_time", results[3]["validation_error"])
+        self.assertIn("complete_time", results[4]["validation_error"])
+        self.assertEqual(
+            set(Order.objects.filter(delievered=True).values_list("order_id", flat=True)),
+            {1, 2}
+        )
+
+    def testInvalidBatch(self):
+        """
+        Tests request without completions is rejected
+        """
+        response = Client().post(
+            path="/orders/complete/batch",
+            content_type="application/json",
+            data={"data": []}
+        )
+        self.assertEqual(response.status_code, 400)
+
+    def testBodyNotObject(self):
+        """
+        Tests valid json which is not an object is rejected
+        """
+        for body in ("[1]", '"x"'):
+            response = Client().post(
+                path="/orders/complete/batch",
+                content_type="application/json",
+                data=body
+            )
+            self.assertEqual(response.status_code, 400)
+            self.assertIn("data", response.json()["validation_errors"])
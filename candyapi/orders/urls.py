@@ -1,10 +1,18 @@
 from django.urls import path, include
 
-from .views import OrdersView, AssignView, CompletionView
+from .views import (OrdersView,
+                    OrdersImportView,
+                    AssignView,
+                    AssignBatchView,
+                    CompletionView,
+                    CompletionBatchView)
 
 assignment_pattern = [
+    path("import", OrdersImportView.as_view()),
     path("assign", AssignView.as_view()),
-    path("complete", CompletionView.as_view())
+    path("assign/batch", AssignBatchView.as_view()),
+    path("complete", CompletionView.as_view()),
+    path("complete/batch", CompletionBatchView.as_view())
 ]
 
 urlpatterns = [
@@ -1,10 +1,12 @@
-from typing import List
+from datetime import datetime
+from typing import List, NamedTuple, Optional
 from functools import reduce
 
-from django.db.models import Q
+from django.db import connection
+from django.db.models import Q, QuerySet, Sum, Count, F
 
 from utils.models import Interval
-from .models import Order
+from .models import Order, Delievery, CourierRegionStats
 
 
 def construct_assign_query(intervals: List[Interval]) -> List:
@@ -27,7 +29,8 @@ def fill_weight(orders: List[Order], max_weight: float) -> List[Order]:
     Использует жадный алгоритм для выбора из списка подходящих
     заказов тех, который назначаютсяя курьеру. На вход получает список
     подходящих заказов, отсортированный по весу и максимальный допустимый вес
-    Приоритет отдается наиболее тяжелым заказам
+    Приоритет отдается наиболее тяжелым заказам. Элементами списка могут
+    быть как заказы, так и кандидаты Candidate
     """
     sum_weight = 0
     orders_to_assign = []
@@ -38,3 +41,221 @@ def fill_weight(orders: List[Order], max_weight: float) -> List[Order]:
         sum_weight += order.weight
     return orders_to_assign
 
+
+class Candidate(NamedTuple):
+    """
+    Заказ-кандидат на назначение: только id и вес
+    """
+    order_id: int
+    weight: float
+
+
+# Допуск при сравнении сумм весов с плавающей точкой
+WEIGHT_EPSILON = 1e-6
+
+CUTOFF_SQL = """
+WITH candidates AS ({candidates}),
+running AS (
+    SELECT order_id, weight, SUM(weight) OVER (
+        ORDER BY weight DESC, order_id ROWS UNBOUNDED PRECEDING
+    ) AS running_weight
+    FROM candidates
+)
+SELECT order_id, weight FROM running
+WHERE running_weight <= %s OR weight <= %s - (
+    SELECT COALESCE(MAX(running_weight), 0) FROM running
+    WHERE running_weight <= %s
+)
+ORDER BY weight DESC, order_id
+"""
+
+
+def cut_candidates(candidates: List[Candidate], max_weight: float) -> List[Candidate]:
+    """
+    Отбрасывает кандидатов (отсортированных по убыванию веса), которые
+    жадный алгоритм fill_weight не сможет взять. Первые кандидаты, чья
+    нарастающая сумма весов не превышает max_weight, берутся всегда.
+    После них остается свободным max_weight минус их сумма, и остальные
+    кандидаты тяжелее этого остатка никогда не поместятся
+    """
+    running_weight = 0
+    prefix = []
+    for candidate in candidates:
+        if running_weight + candidate.weight > max_weight + WEIGHT_EPSILON:
+            break
+        running_weight += candidate.weight
+        prefix.append(candidate)
+    free_weight = max_weight - running_weight + WEIGHT_EPSILON
+    return prefix + [
+        candidate for candidate in candidates[len(prefix):]
+        if candidate.weight <= free_weight
+    ]
+
+
+def fetch_candidates(
+        orders: QuerySet,
+        max_weight: float,
+        cutoff: bool = True
+) -> List[Candidate]:
+    """
+    Одним запросом выбирает из переданной выборки заказов пары
+    (order_id, weight) без дубликатов (при нескольких подходящих интервалах),
+    отсортированные по убыванию веса. При cutoff=True отбрасывает заказы,
+    которые не поместятся при жадном наборе (см. cut_candidates): на БД
+    с поддержкой оконных функций это делается в том же запросе через
+    нарастающую сумму весов, на остальных - после выборки
+    """
+    candidates = orders.values_list(
+        "order_id",
+        "weight"
+    ).distinct().order_by("-weight", "order_id")
+    if not cutoff:
+        return [Candidate(*row) for row in candidates]
+    if not connection.features.supports_over_clause:
+        return cut_candidates([Candidate(*row) for row in candidates], max_weight)
+    sql, params = candidates.query.sql_with_params()
+    with connection.cursor() as cursor:
+        cursor.execute(
+            CUTOFF_SQL.format(candidates=sql),
+            [
+                *params,
+                max_weight + WEIGHT_EPSILON,
+                max_weight + WEIGHT_EPSILON,
+                max_weight + WEIGHT_EPSILON
+            ]
+        )
+        return [Candidate(*row) for row in cursor.fetchall()]
+
+
+COMPLETE_SQL = """
+WITH completed_order AS (
+    UPDATE {order} SET delievered = TRUE,
+        delievery_time = %(complete_time)s,
+        completion_time = %(completion_time)s
+    WHERE order_id = %(order_id)s AND delievery_id = %(delievery_id)s
+        AND NOT delievered
+    RETURNING order_id
+), region_stats AS (
+    INSERT INTO {stats} (courier_id, region_id, completion_time_sum, completed_count)
+    SELECT %(courier_id)s, %(region_id)s, %(completion_time)s, 1
+    FROM completed_order WHERE %(region_id)s IS NOT NULL
+    ON CONFLICT (courier_id, region_id) DO UPDATE SET
+        completion_time_sum = {stats}.completion_time_sum + EXCLUDED.completion_time_sum,
+        completed_count = {stats}.completed_count + 1
+), remaining AS (
+    SELECT COUNT(*) AS count, COALESCE(SUM(weight), 0) AS weight FROM {order}
+    WHERE delievery_id = %(delievery_id)s AND NOT delievered
+        AND order_id <> %(order_id)s
+), courier_earnings AS (
+    UPDATE {courier} SET earnings = earnings + %(earnings)s
+    FROM remaining, completed_order
+    WHERE courier_id = %(courier_id)s AND remaining.count = 0
+)
+UPDATE {delievery} SET last_delievery_time = %(complete_time)s,
+    completed = remaining.count = 0,
+    free_weight = CASE
+        WHEN remaining.count = 0 THEN NULL
+        WHEN NOT %(top_up)s THEN free_weight
+        WHEN %(capacity)s - remaining.weight > 0
+            THEN ROUND(CAST(%(capacity)s - remaining.weight AS NUMERIC), 2)
+        ELSE NULL
+    END
+FROM remaining, completed_order
+WHERE id = %(delievery_id)s
+RETURNING remaining.count
+"""
+
+
+def complete_in_db(
+        order_id: int,
+        delievery_id: int,
+        courier_id: int,
+        region_id: Optional[int],
+        complete_time: datetime,
+        completion_time: int,
+        capacity: float,
+        top_up: bool,
+        earnings: int
+) -> int:
+    """
+    Отмечает заказ выполненным, добавляет время его выполнения в статистику
+    курьера по региону и обновляет развоз: время последней доставки,
+    признак завершения и свободную грузоподъемность (если включена
+    дозагрузка). Если развоз завершен, к заработку курьера добавляется
+    earnings. Проверки должны быть выполнены заранее, строка развоза -
+    заблокирована. На PostgreSQL выполняется одним запросом
+    UPDATE ... RETURNING, на остальных БД - несколькими запросами через ORM.
+    Возвращает количество оставшихся невыполненных заказов развоза. Если
+    заказ уже выполнен или не входит в развоз, возбуждает Order.DoesNotExist
+    """
+    courier_model = Delievery._meta.get_field("courier").related_model
+    if connection.vendor == "postgresql":
+        with connection.cursor() as cursor:
+            cursor.execute(
+                COMPLETE_SQL.format(
+                    courier=connection.ops.quote_name(courier_model._meta.db_table),
+                    order=connection.ops.quote_name(Order._meta.db_table),
+                    delievery=connection.ops.quote_name(Delievery._meta.db_table),
+                    stats=connection.ops.quote_name(CourierRegionStats._meta.db_table)
+                ),
+                {
+                    "order_id": order_id,
+                    "delievery_id": delievery_id,
+                    "courier_id": courier_id,
+                    "region_id": region_id,
+                    "complete_time": complete_time,
+                    "completion_time": completion_time,
+                    "capacity": capacity,
+                    "top_up": top_up,
+                    "earnings": earnings
+                }
+            )
+            row = cursor.fetchone()
+        if row is None:
+            raise Order.DoesNotExist()
+        return row[0]
+    completed = Order.objects.filter(
+        order_id=order_id,
+        delievery_id=delievery_id,
+        delievered=False
+    ).update(
+        delievered=True,
+        delievery_time=complete_time,
+        completion_time=completion_time
+    )
+    if not completed:
+        raise Order.DoesNotExist()
+    if region_id is not None:
+        stats_updated = CourierRegionStats.objects.filter(
+            courier_id=courier_id,
+            region_id=region_id
+        ).update(
+            completion_time_sum=F("completion_time_sum") + completion_time,
+            completed_count=F("completed_count") + 1
+        )
+        if not stats_updated:
+            CourierRegionStats.objects.create(
+                courier_id=courier_id,
+                region_id=region_id,
+                completion_time_sum=completion_time,
+                completed_count=1
+            )
+    remaining = Order.objects.filter(
+        delievery_id=delievery_id,
+        delievered=False
+    ).aggregate(weight=Sum("weight"), count=Count("order_id"))
+    fields = {
+        "last_delievery_time": complete_time,
+        "completed": not remaining["count"]
+    }
+    if not remaining["count"]:
+        fields["free_weight"] = None
+    elif top_up:
+        free_weight = round(capacity - remaining["weight"], 2)
+        fields["free_weight"] = free_weight if free_weight > 0 else None
+    Delievery.objects.filter(id=delievery_id).update(**fields)
+    if not remaining["count"]:
+        courier_model.objects.filter(courier_id=courier_id).update(
+            earnings=F("earnings") + earnings
+        )
+    return remaining["count"]
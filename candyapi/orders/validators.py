@@ -1,7 +1,9 @@
 from typing import List, Dict, Optional, Any
 import re
 
+from dateutil import parser
 from pydantic import (BaseModel,
+                      PrivateAttr,
                       PydanticTypeError,
                       PydanticValueError,
                       validator,
@@ -9,7 +11,7 @@ from pydantic import (BaseModel,
                       ValidationError)
 
 from couriers.validators import validate_time_intervals
-from couriers.utils import parse_errors
+from couriers.utils import parse_errors, validate_items
 
 
 class InvalidOrderData(PydanticTypeError):
@@ -132,22 +134,21 @@ class OrderListDataModel(BaseModel):
     о невалидных полях в заказах
     """
     data: List[Dict]
+    _orders: List[OrderDataModel] = PrivateAttr(default_factory=list)
 
     def __init__(self, **kwargs):
         super(OrderListDataModel, self).__init__(**kwargs)
-        errors = []
-        for order in self.data:
-            try:
-                OrderDataModel(**order)
-            except ValidationError as e:
-                errors.append(
-                    {
-                        "id": order.get("order_id", "no id provided"),
-                        **parse_errors(e)
-                    }
-                )
+        orders, errors = validate_items(OrderDataModel, self.data, "order_id")
         if errors:
             raise InvalidOrdersInData(invalid_orders=errors)
+        self._orders = orders
+
+    @property
+    def orders(self) -> List[OrderDataModel]:
+        """
+        Провалидированные данные заказов
+        """
+        return self._orders
 
     @root_validator(pre=True)
     def validate_no_excess_fields(cls, values: Dict) -> Dict:
@@ -192,6 +193,41 @@ class AssignDataModel(BaseModel):
         return values
 
 
+# noinspection PyMethodParameters
+class AssignBatchDataModel(BaseModel):
+    """
+    Описывает структуру данных для назначения заказов нескольким курьерам
+    """
+
+    courier_ids: Any
+
+    @validator("courier_ids", always=True)
+    def validate_courier_ids(cls, v: List[int]) -> List[int]:
+        """Валидирует список courier_ids"""
+        if not v:
+            raise ValueError("courier_ids is required")
+        if type(v) != list:
+            raise ValueError("courier_ids must be list of integers")
+        for courier_id in v:
+            if type(courier_id) != int:
+                raise ValueError("courier_ids must be list of integers")
+            if courier_id < 0 or courier_id > 9223372036854775807:
+                raise ValueError("courier_id out of allowed range")
+        if len(set(v)) != len(v):
+            raise ValueError("courier_ids must be unique")
+        return v
+
+    @root_validator(pre=True)
+    def validate_excess_fields(cls, values: Dict) -> Dict:
+        """Валидирует отсутствие лишних полей"""
+        excess_fields = set(values.keys()).difference({"courier_ids"})
+        if excess_fields:
+            raise AssignExcessFieldError(
+                excess="excess fields: {}".format(", ".join(excess_fields))
+            )
+        return values
+
+
 # noinspection PyMethodParameters
 class CompletionDataModel(BaseModel):
     """
@@ -231,6 +267,11 @@ class CompletionDataModel(BaseModel):
         pattern = r"\d\d\d\d-\d\d-\d\dT\d\d:\d\d:\d\d\.\d{1,6}Z"
         if not re.fullmatch(pattern, v):
             raise ValueError("Invalid complete_time string")
+        # строка может соответствовать шаблону, но не быть датой (2021-02-30)
+        try:
+            parser.isoparse(v)
+        except ValueError:
+            raise ValueError("Invalid complete_time string")
         return v
 
     @root_validator(pre=True)
@@ -245,3 +286,60 @@ class CompletionDataModel(BaseModel):
                 "excess fields: {}".format(", ".join(excess_fields))
             )
         return values
+
+
+# noinspection PyMethodParameters
+class CompletionBatchDataModel(BaseModel):
+    """
+    Описывает список завершений заказов. Каждое завершение валидируется
+    отдельно: некорректные завершения не мешают применить остальные
+    """
+    data: List[Any]
+    _completions: List[Optional[CompletionDataModel]] = PrivateAttr(default_factory=list)
+    _errors: Dict[int, Dict] = PrivateAttr(default_factory=dict)
+
+    def __init__(self, **kwargs):
+        super(CompletionBatchDataModel, self).__init__(**kwargs)
+        for index, item in enumerate(self.data):
+            try:
+                if not isinstance(item, dict):
+                    raise TypeError("completion must be object")
+                self._completions.append(CompletionDataModel(**item))
+            except ValidationError as e:
+                self._completions.append(None)
+                self._errors[index] = parse_errors(e)
+            except TypeError as e:
+                self._completions.append(None)
+                self._errors[index] = {"data": str(e)}
+
+    @property
+    def completions(self) -> List[Optional[CompletionDataModel]]:
+        """
+        Провалидированные завершения в порядке передачи (None на месте
+        некорректных)
+        """
+        return self._completions
+
+    @property
+    def errors(self) -> Dict[int, Dict]:
+        """
+        Ошибки валидации по номерам завершений в списке
+        """
+        return self._errors
+
+    @validator("data")
+    def validate_data(cls, v: List) -> List:
+        """Валидирует непустой список завершений"""
+        if not v:
+            raise ValueError("data must contain at least one completion")
+        return v
+
+    @root_validator(pre=True)
+    def validate_excess_fields(cls, values: Dict) -> Dict:
+        """Валидирует отсутствие лишних полей"""
+        excess_fields = set(values.keys()).difference({"data"})
+        if excess_fields:
+            raise ValueError(
+                "excess fields: {}".format(", ".join(excess_fields))
+            )
+        return values
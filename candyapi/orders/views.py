@@ -1,36 +1,49 @@
-import json
-from json import JSONDecodeError
-
 from pydantic import ValidationError
 
 from django.views import View
 from django.views.decorators.csrf import csrf_exempt
 from django.utils.decorators import method_decorator
-from django.http import (JsonResponse,
-                         HttpResponseBadRequest,
+from django.http import (HttpResponseBadRequest,
                          HttpRequest,
                          HttpResponse)
 from django.db import IntegrityError
 from django.core.exceptions import ObjectDoesNotExist
 
 from candyapi.utils import format_time
+from candyapi import codec
+from candyapi.codec import JsonResponse, JSONDecodeError
 from candyapi.responses import (InvalidJsonResponse,
                                 DatabaseErrorResponse,
-                                ValidationErrorsResponse)
+                                ValidationErrorsResponse,
+                                NOT_JSON_OBJECT_MESSAGE)
 
 from .validators import (OrderDataModel,
                          OrderListDataModel,
                          InvalidOrdersInData,
                          AssignDataModel,
-                         CompletionDataModel)
+                         AssignBatchDataModel,
+                         CompletionDataModel,
+                         CompletionBatchDataModel)
 from .models import Order
-from .logic import (assign,
+from .logic import (assign_response,
+                    assign_batch,
                     complete_order,
+                    complete_orders,
+                    import_orders_stream,
                     CompleteTimeError)
+from .group_commit import group_commit_enabled, complete_grouped
 
 from couriers.utils import parse_errors
 
 
+COMPLETION_NOT_FOUND_MESSAGE = (
+    "courier or order does not exist, order was never assigned, or already completed"
+)
+COMPLETION_TIME_MESSAGE = (
+    "comple_time can not be earlier than previos order complete_time (or assigned_time)"
+)
+
+
 class OrdersView(View):
     """Орабатывает запрос к /orders"""
 
@@ -44,9 +57,9 @@ class OrdersView(View):
     def post(self, request: HttpRequest) -> HttpResponse:
         """Обрабатывает запрос на дообавление заказов"""
         try:
-            data = json.loads(request.body.decode())
+            data = codec.loads(request.body)
             orders_list = OrderListDataModel(**data)
-            orders = Order.objects.create_from_list(orders_list.data)
+            orders = Order.objects.create_from_list(orders_list.orders)
             return JsonResponse(
                 status=201,
                 data={
@@ -77,6 +90,39 @@ class OrdersView(View):
             return InvalidJsonResponse()
 
 
+class OrdersImportView(View):
+    """
+    Обрабатывает запросы к /orders/import. Заказы передаются в формате
+    NDJSON (по одному объекту json на строку) и обрабатываются потоково,
+    без загрузки всего тела запроса в память
+    """
+
+    @method_decorator(csrf_exempt)
+    def dispatch(self, request, *args, **kwargs):
+        return super(OrdersImportView, self).dispatch(request, *args, **kwargs)
+
+    def post(self, request: HttpRequest) -> HttpResponse:
+        """Обрабатывает запрос на потоковое добавление заказов"""
+        try:
+            orders = import_orders_stream(request)
+            return JsonResponse(
+                status=201,
+                data={
+                    "orders": [
+                        {
+                            "id": order_id
+                        } for order_id in orders
+                    ]
+                }
+            )
+        except InvalidOrdersInData as e:
+            return ValidationErrorsResponse(errors={
+                "order": e.invaid_orders
+            })
+        except IntegrityError:
+            return DatabaseErrorResponse("attempt to add existing order")
+
+
 class AssignView(View):
     """Обрабатывает запрос на /orders/assign"""
 
@@ -89,22 +135,9 @@ class AssignView(View):
         Обрабатывает запрос на назнаяение заказов курьеру
         """
         try:
-            data = json.loads(request.body.decode())
+            data = codec.loads(request.body)
             courier_id = AssignDataModel(**data).courier_id
-            delievery = assign(courier_id)
-            if not delievery:
-                return JsonResponse(
-                    data={"orders": []}
-                )
-            delievery_data = {
-                "orders": [
-                    {
-                        "id": order.order_id
-                    } for order in delievery.orders.filter(delievered=False)
-                ],
-                "assign_time": format_time(delievery.assigned_time)
-            }
-            return JsonResponse(data=delievery_data)
+            return JsonResponse(data=assign_response(courier_id))
         except ValidationError as e:
             errors = parse_errors(e)
             return ValidationErrorsResponse({
@@ -118,6 +151,54 @@ class AssignView(View):
             return InvalidJsonResponse()
 
 
+class AssignBatchView(View):
+    """Обрабатывает запрос на /orders/assign/batch"""
+
+    @method_decorator(csrf_exempt)
+    def dispatch(self, request, *args, **kwargs):
+        return super(AssignBatchView, self).dispatch(request, *args, **kwargs)
+
+    def post(self, request: HttpRequest) -> HttpResponse:
+        """
+        Обрабатывает запрос на назначение заказов нескольким курьерам.
+        Для каждого курьера возвращает данные в формате ответа /orders/assign
+        """
+        try:
+            data = codec.loads(request.body)
+            courier_ids = AssignBatchDataModel(**data).courier_ids
+            delieveries = assign_batch(courier_ids)
+            active_orders = {}
+            for delievery_id, order_id in Order.objects.filter(
+                    delievery__in=[d for d in delieveries.values() if d],
+                    delievered=False
+            ).values_list("delievery_id", "order_id"):
+                active_orders.setdefault(delievery_id, []).append(order_id)
+            couriers_data = []
+            for courier_id, delievery in delieveries.items():
+                if not delievery:
+                    couriers_data.append({"courier_id": courier_id, "orders": []})
+                    continue
+                couriers_data.append({
+                    "courier_id": courier_id,
+                    "orders": [
+                        {
+                            "id": order_id
+                        } for order_id in active_orders.get(delievery.id, [])
+                    ],
+                    "assign_time": format_time(delievery.assigned_time)
+                })
+            return JsonResponse(data={"couriers": couriers_data})
+        except ValidationError as e:
+            errors = parse_errors(e)
+            return ValidationErrorsResponse({
+                **errors
+            })
+        except ObjectDoesNotExist as e:
+            return DatabaseErrorResponse(str(e))
+        except JSONDecodeError:
+            return InvalidJsonResponse()
+
+
 class CompletionView(View):
     """Обрабатывает запросы на /orders/complete"""
 
@@ -131,15 +212,18 @@ class CompletionView(View):
         """
         try:
             data = CompletionDataModel(
-                **json.loads(request.body.decode())
-            )
-            order = complete_order(
-                order_id=data.order_id,
-                courier_id=data.courier_id,
-                complete_time=data.complete_time
+                **codec.loads(request.body)
             )
+            if group_commit_enabled():
+                complete_grouped(data)
+            else:
+                complete_order(
+                    order_id=data.order_id,
+                    courier_id=data.courier_id,
+                    complete_time=data.complete_time
+                )
             return JsonResponse(data={
-                "order_id": order.order_id
+                "order_id": data.order_id
             })
         except ValidationError as e:
             errors = parse_errors(e)
@@ -147,12 +231,60 @@ class CompletionView(View):
                 **errors
             })
         except ObjectDoesNotExist:
-            return DatabaseErrorResponse(
-                "courier or order does not exist, order was never assigned, or already completed"
-            )
+            return DatabaseErrorResponse(COMPLETION_NOT_FOUND_MESSAGE)
         except CompleteTimeError:
-            return DatabaseErrorResponse(
-                "comple_time can not be earlier than previos order complete_time (or assigned_time)"
-            )
+            return DatabaseErrorResponse(COMPLETION_TIME_MESSAGE)
+        except JSONDecodeError:
+            return InvalidJsonResponse()
+
+
+class CompletionBatchView(View):
+    """Обрабатывает запросы на /orders/complete/batch"""
+
+    @method_decorator(csrf_exempt)
+    def dispatch(self, request, *args, **kwargs):
+        return super(CompletionBatchView, self).dispatch(request, *args, **kwargs)
+
+    def post(self, request: HttpRequest) -> HttpResponse:
+        """
+        Обрабатывает запрос на завершение нескольких заказов. Возвращает
+        результат для каждого завершения в порядке передачи: order_id
+        завершенного заказа или описание ошибки
+        """
+        try:
+            body = codec.loads(request.body)
+            if not isinstance(body, dict):
+                return ValidationErrorsResponse({
+                    "data": NOT_JSON_OBJECT_MESSAGE
+                })
+            data = CompletionBatchDataModel(**body)
+        except ValidationError as e:
+            errors = parse_errors(e)
+            return ValidationErrorsResponse({
+                **errors
+            })
         except JSONDecodeError:
             return InvalidJsonResponse()
+        valid = [
+            completion for completion in data.completions if completion is not None
+        ]
+        errors = iter(complete_orders(valid))
+        results = []
+        for index, completion in enumerate(data.completions):
+            if completion is None:
+                results.append({"validation_error": data.errors[index]})
+                continue
+            error = next(errors)
+            if error is None:
+                results.append({"order_id": completion.order_id})
+            elif isinstance(error, CompleteTimeError):
+                results.append({
+                    "order_id": completion.order_id,
+                    "error": COMPLETION_TIME_MESSAGE
+                })
+            else:
+                results.append({
+                    "order_id": completion.order_id,
+                    "error": COMPLETION_NOT_FOUND_MESSAGE
+                })
+        return JsonResponse(data={"results": results})
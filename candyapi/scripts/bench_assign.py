@@ -0,0 +1,110 @@
+"""
+Throughput of concurrent POST /orders/assign calls as concurrency grows.
+Creates its own couriers and orders in a separate id range, runs assign()
+from several threads (each with its own database connection) and removes
+the data afterwards. Meaningful on PostgreSQL: SQLite serialises writers.
+Usage: python manage.py runscript bench_assign
+"""
+import threading
+from time import perf_counter
+
+from django.db import connections, transaction, OperationalError
+
+from couriers.models import Courier
+from couriers.validators import CourierDataModel
+from orders.logic import assign
+from orders.models import Delievery, Order
+from utils.models import Region
+from utils.cache import clear_identity_caches
+
+FIRST_ID = 10 ** 9
+REGION = 10 ** 6
+COURIERS = 400
+ORDERS_PER_COURIER = 4
+CONCURRENCY = (1, 2, 4, 8, 16)
+
+
+@transaction.atomic
+def create_data():
+    Courier.objects.create_from_list([
+        CourierDataModel(
+            courier_id=FIRST_ID + number,
+            courier_type=("foot", "bike", "car")[number % 3],
+            regions=[REGION],
+            working_hours=["00:00-23:59"]
+        ) for number in range(COURIERS)
+    ])
+    Order.objects.create_from_list([
+        {
+            "order_id": FIRST_ID + number,
+            "weight": number % 20 / 2 + 0.5,
+            "region": REGION,
+            "delivery_hours": ["09:00-18:00"]
+        } for number in range(COURIERS * ORDERS_PER_COURIER)
+    ])
+
+
+def delete_data():
+    Delievery.objects.filter(courier_id__gte=FIRST_ID).delete()
+    Order.objects.filter(order_id__gte=FIRST_ID).delete()
+    Courier.objects.filter(courier_id__gte=FIRST_ID).delete()
+    Region.objects.filter(region_id=REGION).delete()
+    clear_identity_caches()
+
+
+def assign_all(threads: int) -> float:
+    courier_ids = [FIRST_ID + number for number in range(COURIERS)]
+    lock = threading.Lock()
+    retries = []
+
+    def worker():
+        try:
+            while True:
+                with lock:
+                    if not courier_ids:
+                        return
+                    courier_id = courier_ids.pop()
+                while True:
+                    try:
+                        assign(courier_id)
+                        break
+                    except OperationalError:
+                        retries.append(courier_id)
+        finally:
+            connections.close_all()
+
+    started = perf_counter()
+    workers = [threading.Thread(target=worker) for _ in range(threads)]
+    for thread in workers:
+        thread.start()
+    for thread in workers:
+        thread.join()
+    elapsed = perf_counter() - started
+    if retries:
+        print("  {} assigns retried after lock errors".format(len(retries)))
+    return elapsed
+
+
+def check_no_double_assign():
+    assigned = Order.objects.filter(
+        order_id__gte=FIRST_ID,
+        delievery__isnull=False
+    ).count()
+    empty = Delievery.objects.filter(
+        courier_id__gte=FIRST_ID,
+        orders__isnull=True
+    ).count()
+    print("  assigned orders: {}, empty deliveries: {}".format(assigned, empty))
+
+
+def run():
+    delete_data()
+    try:
+        for threads in CONCURRENCY:
+            create_data()
+            elapsed = assign_all(threads)
+            print("{:>2} threads: {:7.1f} assigns/s".format(threads, COURIERS / elapsed))
+            check_no_double_assign()
+            delete_data()
+    finally:
+        delete_data()
@@ -0,0 +1,154 @@
+"""
+Throughput of concurrent order completions: a commit per request against
+group commit (see orders.group_commit). Creates its own couriers with
+assigned deliveries in a separate id range, completes every order from
+several threads (each completing the orders of its own couriers in time
+order) and removes the data afterwards. The gain comes from fewer commits
+(fsync), so run it against a database with durable commits.
+Usage: python manage.py runscript bench_completion
+"""
+import threading
+from datetime import timedelta
+from time import perf_counter
+
+from django.db import connections, transaction, OperationalError
+
+from candyapi.utils import format_time
+from couriers.models import Courier
+from couriers.validators import CourierDataModel
+from orders.group_commit import CompletionBuffer
+from orders.logic import assign, complete_order
+from orders.models import Delievery, Order
+from orders.validators import CompletionDataModel
+from utils.models import Region
+from utils.cache import clear_identity_caches
+
+FIRST_ID = 10 ** 9
+REGION = 10 ** 6
+COURIERS = 200
+ORDERS_PER_COURIER = 4
+CONCURRENCY = (1, 4, 16)
+WINDOWS = (0.002, 0.005)
+MAX_SIZE = 100
+
+
+@transaction.atomic
+def create_couriers():
+    Courier.objects.create_from_list([
+        CourierDataModel(
+            courier_id=FIRST_ID + number,
+            courier_type="car",
+            regions=[REGION],
+            working_hours=["00:00-23:59"]
+        ) for number in range(COURIERS)
+    ])
+
+
+def create_deliveries():
+    Order.objects.create_from_list([
+        {
+            "order_id": FIRST_ID + number,
+            "weight": 12,
+            "region": REGION,
+            "delivery_hours": ["00:00-23:59"]
+        } for number in range(COURIERS * ORDERS_PER_COURIER)
+    ])
+    completions = []
+    for number in range(COURIERS):
+        courier_id = FIRST_ID + number
+        delievery = assign(courier_id)
+        order_ids = delievery.orders.values_list("order_id", flat=True)
+        completions.append([
+            CompletionDataModel(
+                courier_id=courier_id,
+                order_id=order_id,
+                complete_time=format_time(
+                    delievery.assigned_time + timedelta(minutes=minutes)
+                )
+            ) for minutes, order_id in enumerate(sorted(order_ids), start=1)
+        ])
+    return completions
+
+
+def delete_deliveries():
+    Delievery.objects.filter(courier_id__gte=FIRST_ID).delete()
+    Order.objects.filter(order_id__gte=FIRST_ID).delete()
+
+
+def delete_data():
+    delete_deliveries()
+    Courier.objects.filter(courier_id__gte=FIRST_ID).delete()
+    Region.objects.filter(region_id=REGION).delete()
+    clear_identity_caches()
+
+
+def complete_directly(completion: CompletionDataModel) -> None:
+    complete_order(
+        order_id=completion.order_id,
+        courier_id=completion.courier_id,
+        complete_time=completion.complete_time
+    )
+
+
+def complete_all(complete, threads: int) -> float:
+    courier_completions = create_deliveries()
+    lock = threading.Lock()
+    errors = []
+
+    def worker():
+        try:
+            while True:
+                with lock:
+                    if not courier_completions:
+                        return
+                    completions = courier_completions.pop()
+                for completion in completions:
+                    while True:
+                        try:
+                            complete(completion)
+                            break
+                        except OperationalError:
+                            errors.append(completion.order_id)
+        finally:
+            connections.close_all()
+
+    started = perf_counter()
+    workers = [threading.Thread(target=worker) for _ in range(threads)]
+    for thread in workers:
+        thread.start()
+    for thread in workers:
+        thread.join()
+    elapsed = perf_counter() - started
+    if errors:
+        print("  {} completions retried after lock errors".format(len(errors)))
+    left = Order.objects.filter(order_id__gte=FIRST_ID, delievered=False).count()
+    if left:
+        print("  {} orders left uncompleted".format(left))
+    delete_deliveries()
+    return elapsed
+
+
+def run():
+    delete_data()
+    completions = COURIERS * ORDERS_PER_COURIER
+    try:
+        create_couriers()
+        for threads in CONCURRENCY:
+            elapsed = complete_all(complete_directly, threads)
+            print("{:>2} threads, commit per request: {:8.1f} completions/s".format(
+                threads, completions / elapsed
+            ))
+            for window in WINDOWS:
+                buffer = CompletionBuffer(window=window, max_size=MAX_SIZE)
+
+                def complete_grouped(completion):
+                    error = buffer.submit(completion).result()
+                    if error is not None:
+                        raise error
+
+                elapsed = complete_all(complete_grouped, threads)
+                print("{:>2} threads, group commit {:.0f} ms: {:8.1f} completions/s".format(
+                    threads, window * 1000, completions / elapsed
+                ))
+    finally:
+        delete_data()
@@ -0,0 +1,53 @@
+"""
+Benchmark of orders packing strategies: capacity utilisation and solve time
+on generated candidate sets.
+Usage: python manage.py runscript bench_packing
+"""
+import random
+from time import perf_counter
+
+from couriers.models import Courier
+from orders.packing import GreedyPacker, KnapsackPacker, numpy
+from orders.utils import Candidate
+
+SETS = 200
+SIZES = (10, 50, 200, 1000)
+SEED = 42
+
+
+def generate_candidates(count: int, max_weight: float) -> list:
+    """
+    Candidates already filtered by courier capacity: weights are spread
+    over the whole capacity range with two decimal places
+    """
+    weights = [round(random.uniform(0.01, max_weight), 2) for _ in range(count)]
+    weights.sort(reverse=True)
+    return [Candidate(order_id, weight) for order_id, weight in enumerate(weights)]
+
+
+def measure(packer, sets: list, max_weight: float):
+    loaded = 0
+    started = perf_counter()
+    for candidates in sets:
+        loaded += sum(candidate.weight for candidate in packer.pack(candidates, max_weight))
+    elapsed = perf_counter() - started
+    return loaded / (max_weight * len(sets)) * 100, elapsed / len(sets) * 1000
+
+
+def run():
+    if numpy is None:
+        print("numpy is not installed, knapsack falls back to greedy")
+    random.seed(SEED)
+    packers = (("greedy", GreedyPacker()), ("knapsack", KnapsackPacker()))
+    for courier_type, max_weight in Courier.WEIGHT_MAP.items():
+        for size in SIZES:
+            sets = [generate_candidates(size, max_weight) for _ in range(SETS)]
+            results = [
+                "{}: {:5.1f}% {:7.3f} ms".format(name, *measure(packer, sets, max_weight))
+                for name, packer in packers
+            ]
+            print("{:<5} {:>5} candidates  {}".format(
+                courier_type,
+                size,
+                "  ".join(results)
+            ))
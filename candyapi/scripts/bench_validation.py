@@ -0,0 +1,86 @@
+"""
+Micro-benchmark of couriers and orders payload validation.
+Usage: python manage.py runscript bench_validation
+"""
+from timeit import timeit
+
+from couriers.validators import CouriersListDataModel, CourierDataModel
+from orders.validators import OrderListDataModel, OrderDataModel
+
+ITEMS = 10000
+REPEAT = 3
+
+
+def generate_couriers(count: int) -> dict:
+    return {
+        "data": [
+            {
+                "courier_id": courier_id,
+                "courier_type": ("foot", "bike", "car")[courier_id % 3],
+                "regions": [courier_id % 20 + 1, courier_id % 20 + 30],
+                "working_hours": ["09:00-13:00", "14:00-18:00"]
+            } for courier_id in range(1, count + 1)
+        ]
+    }
+
+
+def generate_orders(count: int) -> dict:
+    return {
+        "data": [
+            {
+                "order_id": order_id,
+                "weight": order_id % 50 / 2 + 0.01,
+                "region": order_id % 20 + 1,
+                "delivery_hours": ["10:00-12:00"]
+            } for order_id in range(1, count + 1)
+        ]
+    }
+
+
+def validate_twice(list_model, item_model, payload: dict) -> None:
+    """
+    Validation as it was done before validated models were kept:
+    list model validates items and then each item is validated again
+    """
+    validated = list_model(**payload)
+    [item_model(**item) for item in validated.data]
+
+
+def validate_once(list_model, payload: dict, attribute: str) -> None:
+    getattr(list_model(**payload), attribute)
+
+
+def report(name: str, before: float, after: float) -> None:
+    print("{:<10} before: {:8.1f} ms  after: {:8.1f} ms  per {} items".format(
+        name,
+        before / REPEAT * 1000,
+        after / REPEAT * 1000,
+        ITEMS
+    ))
+
+
+def run():
+    couriers = generate_couriers(ITEMS)
+    orders = generate_orders(ITEMS)
+    report(
+        "couriers",
+        timeit(
+            lambda: validate_twice(CouriersListDataModel, CourierDataModel, couriers),
+            number=REPEAT
+        ),
+        timeit(
+            lambda: validate_once(CouriersListDataModel, couriers, "couriers"),
+            number=REPEAT
+        )
+    )
+    report(
+        "orders",
+        timeit(
+            lambda: validate_twice(OrderListDataModel, OrderDataModel, orders),
+            number=REPEAT
+        ),
+        timeit(
+            lambda: validate_once(OrderListDataModel, orders, "orders"),
+            number=REPEAT
+        )
+    )
@@ -1,15 +1,21 @@
 from couriers.models import Courier
 from utils.models import Region, Interval
 from orders.models import Delievery, Order
+from django.core.cache import cache
+
+from utils.cache import clear_identity_caches
 
 
 def run():
     """
-    Deletes all data from database
+    Deletes all data from database and shared cache. Identity caches
+    of running gunicorn workers are reset on their next lookup
     """
     Courier.objects.all().delete()
     Order.objects.all().delete()
     Delievery.objects.all().delete()
     Region.objects.all().delete()
     Interval.objects.all().delete()
+    cache.clear()
+    clear_identity_caches()
     print("DATABASE CLEANED WITHOUT ERRORS")
@@ -0,0 +1,107 @@
+"""
+Загрузка строк в таблицы через COPY FROM STDIN (только PostgreSQL).
+Строки копируются во временную промежуточную таблицу, а затем
+переносятся в целевую таблицу одним INSERT ... SELECT, поэтому
+конфликты первичных ключей возбуждают обычный IntegrityError
+"""
+from io import StringIO
+from typing import Iterable, List, Sequence
+
+from django.conf import settings
+from django.db import connection, models
+
+
+def copy_available() -> bool:
+    """
+    Проверяет, включен ли импорт через COPY и поддерживает ли его БД.
+    На остальных БД импорт выполняется через ORM
+    """
+    return settings.IMPORT_BACKEND == "copy" and connection.vendor == "postgresql"
+
+
+def _format_value(value) -> str:
+    """
+    Форматирует значение для текстового формата COPY
+    """
+    if value is None:
+        return "\\N"
+    if isinstance(value, bool):
+        return "t" if value else "f"
+    return (
+        str(value)
+        .replace("\\", "\\\\")
+        .replace("\t", "\\t")
+        .replace("\n", "\\n")
+        .replace("\r", "\\r")
+    )
+
+
+def format_copy_rows(rows: Iterable[Sequence]) -> StringIO:
+    """
+    Формирует буфер с данными в текстовом формате COPY
+    """
+    buffer = StringIO()
+    for row in rows:
+        buffer.write("\t".join(_format_value(value) for value in row))
+        buffer.write("\n")
+    buffer.seek(0)
+    return buffer
+
+
+def copy_insert(objs: List[models.Model]) -> None:
+    """
+    Добавляет объекты одной модели в ее таблицу через промежуточную
+    временную таблицу. Копируются все поля, кроме автоинкрементного
+    первичного ключа. Должна вызываться внутри транзакции: временная
+    таблица удаляется при ее фиксации
+    """
+    model = type(objs[0])
+    fields = [
+        field for field in model._meta.concrete_fields
+        if not isinstance(field, models.AutoField)
+    ]
+    quote = connection.ops.quote_name
+    table = quote(model._meta.db_table)
+    staging = quote("staging_{}".format(model._meta.db_table))
+    columns = ", ".join(quote(field.column) for field in fields)
+    rows = (
+        [
+            field.get_db_prep_save(getattr(obj, field.attname), connection)
+            for field in fields
+        ] for obj in objs
+    )
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "CREATE TEMPORARY TABLE IF NOT EXISTS {staging} ON COMMIT DROP "
+            "AS SELECT {columns} FROM {table} WITH NO DATA".format(
+                staging=staging,
+                columns=columns,
+                table=table
+            )
+        )
+        cursor.execute("TRUNCATE {}".format(staging))
+        with connection.wrap_database_errors:
+            cursor.cursor.copy_expert(
+                "COPY {} ({}) FROM STDIN".format(staging, columns),
+                format_copy_rows(rows)
+            )
+        cursor.execute(
+            "INSERT INTO {table} ({columns}) SELECT {columns} FROM {staging}".format(
+                table=table,
+                columns=columns,
+                staging=staging
+            )
+        )
+
+
+def bulk_insert(objs: List[models.Model]) -> List[models.Model]:
+    """
+    Добавляет объекты одной модели в БД одним запросом: через COPY, если
+    он включен и доступен, иначе через bulk_create
+    """
+    if not objs:
+        return objs
+    if copy_available():
+        copy_insert(objs)
+        return objs
+    return type(objs[0])._default_manager.bulk_create(objs)
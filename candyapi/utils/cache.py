@@ -0,0 +1,190 @@
+"""
+Кеш соответствий ключ -> id для неизменяемых справочных таблиц
+(регионы и интервалы). Кеш живет в памяти процесса (воркера gunicorn).
+
+Строки справочников удаляются только при очистке БД (см.
+clear_identity_caches), которая увеличивает счетчик поколений в общем
+кеше django. Кеш процесса сбрасывается, как только видит новое значение
+счетчика, поэтому кеш работает только при общем кеше django (SHARED_CACHE).
+Счетчик читается из общего кеша не чаще раза в
+IDENTITY_CACHE_CHECK_INTERVAL секунд, поэтому кеши других процессов
+сбрасываются не сразу после очистки БД, а в пределах этого интервала
+"""
+import time
+from typing import Dict, Hashable, Iterable, Optional
+from collections import OrderedDict
+from threading import Lock
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction, DatabaseError
+
+IDENTITY_GENERATION_KEY = "utils:identity-generation"
+
+
+def identity_caches_enabled() -> bool:
+    return settings.SHARED_CACHE and settings.IDENTITY_CACHE_SIZE > 0
+
+
+def _shared_generation() -> int:
+    """
+    Возвращает счетчик поколений справочников. Если счетчика нет
+    (не создан, очищен или вытеснен из кеша), создается новое значение,
+    и кеши всех процессов сбрасываются
+    """
+    generation = cache.get(IDENTITY_GENERATION_KEY)
+    if generation is None:
+        cache.add(IDENTITY_GENERATION_KEY, time.time_ns(), timeout=None)
+        generation = cache.get(IDENTITY_GENERATION_KEY)
+    return generation
+
+
+class IdentityCache:
+    """
+    Ограниченный по размеру потокобезопасный кеш с вытеснением
+    давно не использованных записей (LRU). Хранит только соответствие
+    естественного ключа записи ее первичному ключу, поэтому записи
+    устаревают, только когда строки удаляются из БД. Записи сбрасываются
+    при изменении общего счетчика поколений справочников
+    """
+
+    def __init__(self, maxsize: int):
+        self.maxsize = maxsize
+        self._data = OrderedDict()
+        self._lock = Lock()
+        self._generation = None
+        self._checked_at = None
+
+    def __len__(self):
+        return len(self._data)
+
+    def _sync(self, force: bool = False) -> bool:
+        """
+        Сбрасывает записи, если счетчик поколений справочников изменился.
+        Счетчик перечитывается, только если с предыдущей проверки прошло
+        больше IDENTITY_CACHE_CHECK_INTERVAL секунд или передан force.
+        Возвращает False, если кеш выключен
+        """
+        if not identity_caches_enabled():
+            return False
+        now = time.monotonic()
+        checked_at = self._checked_at
+        if (not force and checked_at is not None
+                and now - checked_at < settings.IDENTITY_CACHE_CHECK_INTERVAL):
+            return True
+        generation = _shared_generation()
+        with self._lock:
+            if generation != self._generation:
+                self._data.clear()
+                self._generation = generation
+            self._checked_at = now
+        return True
+
+    def get(self, key: Hashable) -> Optional[int]:
+        """
+        Возвращает id по ключу или None, если ключа нет в кеше
+        """
+        if not self._sync():
+            return None
+        with self._lock:
+            value = self._data.get(key)
+            if value is not None:
+                self._data.move_to_end(key)
+            return value
+
+    def get_many(self, keys: Iterable[Hashable]) -> Dict[Hashable, int]:
+        """
+        Возвращает словарь ключ -> id для найденных в кеше ключей
+        """
+        found = {}
+        if not self._sync():
+            return found
+        with self._lock:
+            for key in keys:
+                value = self._data.get(key)
+                if value is not None:
+                    self._data.move_to_end(key)
+                    found[key] = value
+        return found
+
+    def put_many(
+            self,
+            mapping: Dict[Hashable, int],
+            generation: Optional[int] = None
+    ) -> None:
+        """
+        Добавляет записи в кеш, вытесняя самые старые при переполнении.
+        Если передан generation, записи добавляются, только если с тех пор
+        кеш не сбрасывался (счетчик поколений при этом перечитывается)
+        """
+        if not self._sync(force=generation is not None):
+            return
+        with self._lock:
+            if generation is not None and generation != self._generation:
+                return
+            for key, value in mapping.items():
+                self._data[key] = value
+                self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def put_on_commit(self, mapping: Dict[Hashable, int]) -> None:
+        """
+        Добавляет записи в кеш после фиксации текущей транзакции, чтобы
+        в кеш не попали id строк, которые могут быть откачены
+        """
+        if mapping and identity_caches_enabled():
+            mapping = dict(mapping)
+            generation = self._generation
+            transaction.on_commit(lambda: self.put_many(mapping, generation))
+
+    def clear(self) -> None:
+        """
+        Очищает записи. Счетчик поколений будет прочитан при следующем
+        обращении
+        """
+        with self._lock:
+            self._data.clear()
+            self._checked_at = None
+
+
+regions_cache = IdentityCache(maxsize=settings.IDENTITY_CACHE_SIZE)
+intervals_cache = IdentityCache(maxsize=settings.IDENTITY_CACHE_SIZE)
+
+
+def clear_identity_caches() -> None:
+    """
+    Очищает кеши. Должна вызываться после удаления регионов или
+    интервалов из БД: счетчик поколений увеличивается, и кеши других
+    процессов сбрасываются при следующем обращении
+    """
+    cache.set(IDENTITY_GENERATION_KEY, time.time_ns(), timeout=None)
+    regions_cache.clear()
+    intervals_cache.clear()
+
+
+def warm_up_identity_caches() -> None:
+    """
+    Заполняет кеши регионами и интервалами из БД. Вызывается при старте
+    воркера. Если БД недоступна или не мигрирована, кеши остаются
+    пустыми и заполняются по мере обращений
+    """
+    from .models import Region, Interval
+
+    try:
+        regions = Region.objects.values_list(
+            "region_id",
+            flat=True
+        )[:regions_cache.maxsize]
+        regions_cache.put_many({region_id: region_id for region_id in regions})
+        intervals = Interval.objects.values_list(
+            "start",
+            "end",
+            "id"
+        )[:intervals_cache.maxsize]
+        intervals_cache.put_many({
+            (start, end): interval_id for start, end, interval_id in intervals
+        })
+    except DatabaseError:
+        regions_cache.clear()
+        intervals_cache.clear()
@@ -1,7 +1,9 @@
-from typing import List
+from typing import List, Iterable, Dict, Tuple
 from django.db import models
 from django.core.exceptions import ObjectDoesNotExist
 
+from .cache import regions_cache, intervals_cache
+
 
 class RegionManager(models.Manager):
 
@@ -18,24 +20,61 @@ class RegionManager(models.Manager):
         Если в БД есть регион с переданный id, возвращает его. Если нет,
         создает и возвращает
         """
+        if regions_cache.get(region_id) is not None:
+            return self.model.from_db(self.db, ["region_id"], [region_id])
         try:
-            return self.get(region_id=region_id)
+            region = self.get(region_id=region_id)
         except ObjectDoesNotExist:
-            return self.create_region(region_id=region_id)
+            region = self.create_region(region_id=region_id)
+        regions_cache.put_on_commit({region_id: region_id})
+        return region
 
-    def create_from_list(self, regions: List[int]):
+    def resolve_ids(self, region_ids: Iterable[int]) -> Dict[int, int]:
         """
-        Возвращает список регионов, создавая недостающие
+        Пакетно находит регионы с переданными id, создавая недостающие.
+        Выполняет не более двух запросов вне зависимости от количества
+        регионов: выборку существующих и одну вставку отсутствующих.
+        Регионы, найденные в кеше процесса, в БД не запрашиваются.
+        Возвращает словарь region_id -> первичный ключ региона
         """
-        return list(
-            map(
-                self.create_or_find,
-                regions
+        requested = set(region_ids)
+        region_ids = requested.difference(
+            regions_cache.get_many(requested)
+        )
+        if not region_ids:
+            return {region_id: region_id for region_id in requested}
+        existing = set(
+            self.filter(region_id__in=region_ids).values_list(
+                "region_id",
+                flat=True
+            )
+        )
+        missing = region_ids.difference(existing)
+        if missing:
+            self.bulk_create(
+                [self.model(region_id=region_id) for region_id in missing],
+                ignore_conflicts=True
             )
+        regions_cache.put_on_commit(
+            {region_id: region_id for region_id in region_ids}
         )
+        return {region_id: region_id for region_id in requested}
+
+    def create_from_list(self, regions: List[int]):
+        """
+        Возвращает список регионов, создавая недостающие
+        """
+        ids = self.resolve_ids(regions)
+        return [
+            self.model.from_db(self.db, ["region_id"], [ids[region_id]])
+            for region_id in regions
+        ]
 
 
 class IntervalManager(models.Manager):
+    # сколько пар (start, end) сравнивается одним запросом в _fetch_ids
+    # (в SQLite количество параметров запроса ограничено)
+    FETCH_CHUNK_SIZE = 400
 
     @staticmethod
     def interval_string_to_start_end(interval_string: str) -> (int, int):
@@ -80,20 +119,104 @@ class IntervalManager(models.Manager):
         Если такой интервал уже есть в БД, возвращает. В противном случае,
         создает и возвращает
         """
+        start_seconds, end_seconds = self.interval_string_to_start_end(
+            interval_string
+        )
+        interval_id = intervals_cache.get((start_seconds, end_seconds))
+        if interval_id is not None:
+            return self._from_cache(start_seconds, end_seconds, interval_id)
         try:
-            start_seconds, end_seconds = self.interval_string_to_start_end(
-                interval_string
-            )
-            return self.get(start=start_seconds, end=end_seconds)
+            interval = self.get(start=start_seconds, end=end_seconds)
         except ObjectDoesNotExist:
             interval = self.create_interval(interval_string)
-            return interval
+        intervals_cache.put_on_commit({(start_seconds, end_seconds): interval.id})
+        return interval
+
+    def _from_cache(self, start: int, end: int, interval_id: int):
+        """
+        Создает объект интервала по данным из кеша без запроса к БД
+        """
+        return self.model.from_db(
+            self.db,
+            ["id", "start", "end"],
+            [interval_id, start, end]
+        )
+
+    def resolve_ids(
+            self,
+            intervals: Iterable[Tuple[int, int]]
+    ) -> Dict[Tuple[int, int], int]:
+        """
+        Пакетно находит интервалы по парам (start, end), создавая
+        недостающие. Выполняет фиксированное количество запросов вне
+        зависимости от количества интервалов. Интервалы, найденные в кеше
+        процесса, в БД не запрашиваются. Возвращает словарь
+        (start, end) -> id интервала
+        """
+        intervals = set(intervals)
+        cached = intervals_cache.get_many(intervals)
+        intervals = intervals.difference(cached)
+        if not intervals:
+            return cached
+        ids = self._fetch_ids(intervals)
+        missing = intervals.difference(ids)
+        if missing:
+            # при конкурентной вставке того же интервала другим процессом
+            # конфликт игнорируется, а id перечитывается из БД
+            self.bulk_create(
+                [self.model(start=start, end=end) for start, end in missing],
+                ignore_conflicts=True
+            )
+            ids.update(self._fetch_ids(missing))
+        intervals_cache.put_on_commit(ids)
+        return {**cached, **ids}
+
+    def _fetch_ids(
+            self,
+            intervals: Iterable[Tuple[int, int]]
+    ) -> Dict[Tuple[int, int], int]:
+        """
+        Выбирает id существующих интервалов из переданного непустого
+        множества пар (start, end). Пары обрабатываются пачками по
+        FETCH_CHUNK_SIZE (обычно одним запросом): из БД выбираются
+        интервалы с началом и концом из пачки, а пары целиком сравниваются
+        в python
+        """
+        intervals = sorted(set(intervals))
+        ids = {}
+        for offset in range(0, len(intervals), self.FETCH_CHUNK_SIZE):
+            chunk = set(intervals[offset:offset + self.FETCH_CHUNK_SIZE])
+            rows = self.filter(
+                start__in={start for start, _ in chunk},
+                end__in={end for _, end in chunk}
+            ).values_list("start", "end", "id")
+            ids.update({
+                (start, end): interval_id
+                for start, end, interval_id in rows
+                if (start, end) in chunk
+            })
+        return ids
+
+    def resolve_strings(self, interval_strings: Iterable[str]) -> Dict[str, int]:
+        """
+        Пакетно находит (создавая недостающие) интервалы по строкам
+        формата hh:mm-hh:mm. Возвращает словарь строка -> id интервала
+        """
+        bounds = {
+            interval_string: self.interval_string_to_start_end(interval_string)
+            for interval_string in set(interval_strings)
+        }
+        ids = self.resolve_ids(bounds.values())
+        return {
+            interval_string: ids[pair] for interval_string, pair in bounds.items()
+        }
 
     def create_from_list(self, intervals: List[str]):
         """Создает интервалы из списка"""
-        return list(
-            map(
-                self.create_or_find,
-                intervals
-            )
-        )
+        ids = self.resolve_strings(intervals)
+        return [
+            self._from_cache(
+                *self.interval_string_to_start_end(interval),
+                ids[interval]
+            ) for interval in intervals
+        ]
@@ -0,0 +1,121 @@
+from unittest import mock, skipUnless
+
+from django.db import connection, transaction, IntegrityError
+from django.test import SimpleTestCase, TestCase, override_settings
+
+from couriers.models import Courier
+from couriers.validators import CourierDataModel
+from orders.models import Order
+from utils import bulk_copy
+from utils.bulk_copy import copy_available, format_copy_rows
+
+
+class TestFormatCopyRows(SimpleTestCase):
+
+    def testFormat(self):
+        """
+        Tests values are escaped for COPY text format
+        """
+        buffer = format_copy_rows([
+            [1, 0.5, None, True],
+            [2, "tab\there", "new\nline", False],
+        ])
+        self.assertEqual(
+            buffer.read(),
+            "1\t0.5\t\\N\tt\n2\ttab\\there\tnew\\nline\tf\n"
+        )
+
+
+@override_settings(IMPORT_BACKEND="copy")
+class TestCopyFallback(TestCase):
+
+    def testFallbackToOrm(self):
+        """
+        Tests import uses ORM on databases without COPY support
+        """
+        with mock.patch.object(bulk_copy, "connection") as connection_mock, \
+                mock.patch.object(bulk_copy, "copy_insert") as copy_mock:
+            connection_mock.vendor = "sqlite"
+            self.assertFalse(copy_available())
+            Order.objects.create_from_list([
+                {
+                    "order_id": 1,
+                    "weight": 0.5,
+                    "region": 1,
+                    "delivery_hours": ["10:00-11:00"]
+                }
+            ])
+        copy_mock.assert_not_called()
+        self.assertEqual(Order.objects.get(order_id=1).intervals.count(), 1)
+
+
+@skipUnless(connection.vendor == "postgresql", "COPY requires PostgreSQL")
+@override_settings(IMPORT_BACKEND="copy")
+class TestCopyImport(TestCase):
+
+    COURIERS = [
+        {
+            "courier_id": 1,
+            "courier_type": "foot",
+            "regions": [1, 12],
+            "working_hours": ["11:35-14:05", "09:00-11:00"]
+        },
+        {
+            "courier_id": 2,
+            "courier_type": "car",
+            "regions": [12],
+            "working_hours": ["09:00-18:00"]
+        },
+    ]
+
+    def import_couriers(self, couriers):
+        with transaction.atomic():
+            return Courier.objects.create_from_list([
+                CourierDataModel(**courier) for courier in couriers
+            ])
+
+    def testImportThroughCopy(self):
+        """
+        Tests couriers and orders with their relations are loaded by COPY
+        """
+        self.assertTrue(copy_available())
+        with mock.patch.object(
+                bulk_copy,
+                "copy_insert",
+                wraps=bulk_copy.copy_insert
+        ) as copy_mock:
+            self.assertEqual(self.import_couriers(self.COURIERS), [1, 2])
+            with transaction.atomic():
+                Order.objects.create_from_list([
+                    {
+                        "order_id": 1,
+                        "weight": 0.5,
+                        "region": 12,
+                        "delivery_hours": ["10:00-11:00", "12:00-13:00"]
+                    }
+                ])
+        self.assertEqual(copy_mock.call_count, 5)
+        courier = Courier.objects.get(courier_id=1)
+        self.assertEqual(courier.courier_type, "foot")
+        self.assertEqual(courier.earnings, 0)
+        self.assertEqual(
+            sorted(courier.regions.values_list("region_id", flat=True)),
+            [1, 12]
+        )
+        self.assertEqual(courier.intervals.count(), 2)
+        order = Order.objects.get(order_id=1)
+        self.assertEqual(order.region_id, 12)
+        self.assertFalse(order.delievered)
+        self.assertEqual(order.intervals.count(), 2)
+
+    def testDuplicateIdRaisesIntegrityError(self):
+        """
+        Tests existing ids are rejected and nothing from the batch is saved
+        """
+        self.import_couriers(self.COURIERS[:1])
+        with self.assertRaises(IntegrityError):
+            self.import_couriers(self.COURIERS)
+        self.assertEqual(
+            list(Courier.objects.values_list("courier_id", flat=True)),
+            [1]
+        )
@@ -0,0 +1,124 @@
+from unittest.mock import patch
+
+from django.core.cache import cache
+from django.test import SimpleTestCase, TransactionTestCase, override_settings
+from django.db import transaction
+
+from utils.cache import (IdentityCache,
+                         IDENTITY_GENERATION_KEY,
+                         intervals_cache,
+                         regions_cache,
+                         clear_identity_caches,
+                         warm_up_identity_caches)
+from utils.models import Region, Interval
+
+
+@override_settings(SHARED_CACHE=True)
+class TestIdentityCache(SimpleTestCase):
+
+    def testEviction(self):
+        """
+        Tests least recently used keys are evicted when cache is full
+        """
+        cache = IdentityCache(maxsize=2)
+        cache.put_many({"a": 1, "b": 2})
+        cache.get("a")
+        cache.put_many({"c": 3})
+        self.assertEqual(len(cache), 2)
+        self.assertIsNone(cache.get("b"))
+        self.assertEqual(cache.get_many(["a", "b", "c"]), {"a": 1, "c": 3})
+
+    @override_settings(IDENTITY_CACHE_CHECK_INTERVAL=0)
+    def testSharedGenerationChanged(self):
+        """
+        Tests entries are dropped when another process wipes data
+        or the shared counter is lost
+        """
+        identity_cache = IdentityCache(maxsize=10)
+        identity_cache.put_many({"a": 1})
+        cache.set(IDENTITY_GENERATION_KEY, 1)
+        self.assertIsNone(identity_cache.get("a"))
+        identity_cache.put_many({"a": 1})
+        cache.delete(IDENTITY_GENERATION_KEY)
+        self.assertIsNone(identity_cache.get("a"))
+
+    @override_settings(IDENTITY_CACHE_CHECK_INTERVAL=60)
+    def testSharedGenerationCheckedOnInterval(self):
+        """
+        Tests the shared counter is not read on every lookup
+        """
+        identity_cache = IdentityCache(maxsize=10)
+        identity_cache.put_many({"a": 1})
+        with patch("utils.cache._shared_generation") as shared_generation:
+            self.assertEqual(identity_cache.get("a"), 1)
+            self.assertEqual(identity_cache.get_many(["a"]), {"a": 1})
+        shared_generation.assert_not_called()
+        identity_cache.clear()
+        cache.set(IDENTITY_GENERATION_KEY, 1)
+        identity_cache.get("a")
+        self.assertEqual(identity_cache._generation, 1)
+
+    def testStalePutIgnored(self):
+        """
+        Tests ids resolved before a wipe are not cached after it
+        """
+        identity_cache = IdentityCache(maxsize=10)
+        identity_cache.get("a")
+        generation = identity_cache._generation
+        clear_identity_caches()
+        identity_cache.put_many({"a": 1}, generation)
+        self.assertIsNone(identity_cache.get("a"))
+
+    @override_settings(SHARED_CACHE=False)
+    def testDisabledWithoutSharedCache(self):
+        """
+        Tests cache is not used without shared django cache
+        """
+        identity_cache = IdentityCache(maxsize=10)
+        identity_cache.put_many({"a": 1})
+        self.assertIsNone(identity_cache.get("a"))
+
+
+@override_settings(SHARED_CACHE=True)
+class TestCachedManagers(TransactionTestCase):
+
+    def setUp(self):
+        clear_identity_caches()
+
+    def tearDown(self):
+        clear_identity_caches()
+
+    def testResolveFromCache(self):
+        """
+        Tests committed intervals and regions are served from memory
+        """
+        Interval.objects.resolve_strings(["10:00-11:00"])
+        Region.objects.resolve_ids([1, 2])
+        with self.assertNumQueries(0):
+            ids = Interval.objects.resolve_strings(["10:00-11:00"])
+            Region.objects.resolve_ids([1, 2])
+            interval = Interval.objects.create_or_find("10:00-11:00")
+        self.assertEqual(ids["10:00-11:00"], interval.id)
+        self.assertEqual(str(interval), "10:00-11:00")
+
+    def testRolledBackNotCached(self):
+        """
+        Tests ids of rolled back rows do not get into cache
+        """
+        try:
+            with transaction.atomic():
+                Interval.objects.resolve_strings(["10:00-11:00"])
+                raise RuntimeError()
+        except RuntimeError:
+            pass
+        self.assertEqual(len(intervals_cache), 0)
+
+    def testWarmUp(self):
+        """
+        Tests caches are filled from database
+        """
+        Region.objects.create_region(5)
+        interval = Interval.objects.create_interval("10:00-11:00")
+        warm_up_identity_caches()
+        self.assertEqual(regions_cache.get(5), 5)
+        self.assertEqual(intervals_cache.get((36000, 39600)), interval.id)
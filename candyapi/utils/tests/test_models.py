@@ -45,6 +45,46 @@ class TestInterval(TestCase):
             2
         )
 
+    def testResolveIds(self):
+        """
+        Tests batched resolving of existing and missing intervals
+        """
+        existing = Interval.objects.create_interval("11:00-12:00")
+        with self.assertNumQueries(3):
+            ids = Interval.objects.resolve_ids([(39600, 43200), (39600, 46800)])
+        self.assertEqual(ids[(39600, 43200)], existing.id)
+        self.assertEqual(
+            ids[(39600, 46800)],
+            Interval.objects.get(start=39600, end=46800).id
+        )
+        with self.assertNumQueries(1):
+            Interval.objects.resolve_strings(["11:00-12:00", "11:00-13:00"])
+
+    def testFetchExactPairs(self):
+        """
+        Tests only exact (start, end) pairs are selected
+        """
+        first = Interval.objects.create(start=1, end=4)
+        Interval.objects.create(start=2, end=3)
+        self.assertEqual(
+            Interval.objects._fetch_ids({(1, 4), (2, 4), (1, 3)}),
+            {(1, 4): first.id}
+        )
+
+    def testResolveManyIds(self):
+        """
+        Tests resolving more distinct intervals than fit in one query
+        """
+        pairs = [(start, start + 60) for start in range(1200)]
+        ids = Interval.objects.resolve_ids(pairs)
+        self.assertEqual(len(ids), 1200)
+        self.assertEqual(Interval.objects.count(), 1200)
+        self.assertEqual(Interval.objects.resolve_ids(pairs), ids)
+        self.assertEqual(
+            ids[(5, 65)],
+            Interval.objects.get(start=5, end=65).id
+        )
+
     def testIntervalToString(self):
         """
         Tests if interval coverts to string correctly
@@ -64,6 +104,18 @@ class TestRegion(TestCase):
             1
         )
 
+    def testResolveIds(self):
+        """
+        Tests batched resolving of existing and missing regions
+        """
+        Region.objects.create_region(1)
+        with self.assertNumQueries(2):
+            ids = Region.objects.resolve_ids([1, 2, 42])
+        self.assertEqual(ids, {1: 1, 2: 2, 42: 42})
+        self.assertEqual(Region.objects.count(), 3)
+        with self.assertNumQueries(1):
+            Region.objects.resolve_ids([1, 2])
+
     def testCreateFromList(self):
         regions_list = [1, 2, 42]
         regions = Region.objects.create_from_list(regions_list)